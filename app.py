@@ -1,18 +1,27 @@
 """PassportFiligraneApp - UI and state management for the watermarking application."""
 
 import flet as ft
+import flet.canvas as cv
 import base64
-import io
 import os
 import stat
 import threading
+import time
 import traceback
-
-from PIL import Image
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+import profiling
+from cache import ResultCache, hash_bytes, is_result_cache_enabled, make_cache_key
+from encoding import ENCODER_PROFILES, IMAGE_FORMAT_EXTENSIONS, normalize_image_format, supported_image_formats
+from inputs import MappedFile, probe_image
+from thumbnails import ThumbnailCache, ThumbnailRenderer
 from watermark import WatermarkParams, apply_watermark
 from constants import (
-    MAX_PDF_PAGES,
+    DEFAULT_ENCODER_PROFILE,
     EXPORT_FILENAME_PREFIX,
+    PREVIEW_DEBOUNCE_SECONDS,
+    THUMBNAIL_STRIP_RADIUS,
     BG_PRIMARY, BG_SECONDARY,
     ACCENT_PINK, ACCENT_PINK_LIGHT, ACCENT_GREEN, ACCENT_YELLOW, ACCENT_PURPLE, ACCENT_CYAN,
     TEXT_WHITE, TEXT_MUTED, TEXT_WARNING,
@@ -22,7 +31,6 @@ from utils import (
     sanitize_path_for_log,
     detect_file_type,
     validate_file_size,
-    validate_image_dimensions,
 )
 
 LOG_PATH = get_log_path()
@@ -43,9 +51,28 @@ class PassportFiligraneApp:
         self.current_file_type: str | None = None
         self.num_pages: int = 0
         self.current_filename: str = ""
+        self.current_file_path: str | None = None
+        self._source_digest: str | None = None  # of the bytes loaded, for result-cache keys
+        self._pdf_source: bytes | None = None  # the loaded PDF's bytes, backing pdf_doc
+        self.result_cache: ResultCache | None = ResultCache() if is_result_cache_enabled() else None
         self.update_timer: threading.Timer | None = None
         self._preview_lock = threading.Lock()
 
+        # Multi-page PDF preview: the viewed page's unwatermarked raster is kept so
+        # parameter changes only re-composite; thumbnails are rendered lazily.
+        self.current_page: int = 0
+        self._preview_base = None  # (page_num, PIL image) of the viewed page
+        self._preview_size: tuple[float, float] | None = None  # on-screen preview area
+        self._loupe_center: tuple[float, float] | None = None  # page points
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_renderer: ThumbnailRenderer | None = None
+
+        # Background export state: one export at a time, cancellable between pages.
+        self._export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        self._export_future: Future | None = None
+        self._export_cancel = None  # pdf_processing.CancelToken of the running export
+        self._export_started: float = 0.0
+
         self.setup_ui()
 
     # -------------------------------------------------------------------------
@@ -115,6 +142,17 @@ class PassportFiligraneApp:
             value="PDF", visible=False, on_change=lambda _: self.page.update()
         )
 
+        self.encoder_profile_dropdown = ft.Dropdown(
+            label="Encoder profile", label_style=ft.TextStyle(color=TEXT_WHITE, size=14),
+            options=[ft.dropdown.Option(name, name.capitalize()) for name in ENCODER_PROFILES],
+            value=DEFAULT_ENCODER_PROFILE, visible=False, on_change=self.update_preview,
+        )
+
+        self.max_size_field = ft.TextField(
+            label="Max file size (MB)", hint_text="No limit", value="", color=TEXT_WHITE,
+            keyboard_type=ft.KeyboardType.NUMBER, visible=False,
+        )
+
         self.save_button = ft.ElevatedButton(
             "Save file", icon=ft.icons.SAVE,
             on_click=self.on_save_button_click, bgcolor=ft.colors.GREEN_700,
@@ -163,6 +201,25 @@ class PassportFiligraneApp:
             visible=False
         )
 
+    def _create_export_progress(self) -> None:
+        """Create the progress bar, ETA text and Cancel button shown during an export."""
+        self.export_progress_bar = ft.ProgressBar(value=0, color=ACCENT_GREEN, bgcolor=BG_PRIMARY)
+        self.export_progress_text = ft.Text("", size=12, color=TEXT_MUTED)
+        self.cancel_export_button = ft.TextButton(
+            "Cancel", icon=ft.icons.CANCEL, on_click=self.on_cancel_export,
+        )
+        self.export_progress_container = ft.Column(
+            controls=[
+                self.export_progress_bar,
+                ft.Row(
+                    controls=[self.export_progress_text, self.cancel_export_button],
+                    alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                ),
+            ],
+            spacing=4,
+            visible=False,
+        )
+
     def _create_select_file_button(self) -> ft.ElevatedButton:
         """Create the 'Select a file' button used in both empty state and controls panel."""
         return ft.ElevatedButton(
@@ -229,14 +286,64 @@ class PassportFiligraneApp:
         self.file_info_text = ft.Text("", size=12, color=TEXT_MUTED, italic=True, visible=False)
         # preview_image.visible defaults to True; visibility is controlled by parent preview_container
         self.preview_image = ft.Image(src_base64="", fit="contain")
+        # The canvas reports the preview area size so taps can be mapped to page points.
         self.preview_container = ft.Container(
-            content=self.preview_image,
+            content=cv.Canvas(
+                content=ft.GestureDetector(
+                    content=ft.Container(content=self.preview_image, alignment=ft.alignment.center, expand=True),
+                    on_tap_down=self.on_preview_tap,
+                ),
+                expand=True,
+                on_resize=self._on_preview_resize,
+            ),
             alignment=ft.alignment.center,
             expand=True, visible=False,
         )
+        self._create_loupe()
         self.empty_state_container = self._create_empty_state()
         self.loading_indicator = self._create_loading_indicator()
 
+    def _create_loupe(self) -> None:
+        """Create the loupe toggle and the overlay showing a region at export DPI."""
+        self.loupe_switch = ft.Switch(
+            label="Loupe", value=False, active_color=ACCENT_CYAN,
+            on_change=self.on_loupe_toggle, visible=False,
+        )
+        self.loupe_label = ft.Text("", size=12, color=TEXT_MUTED)
+        self.loupe_image = ft.Image(src_base64="", fit="contain")
+        self.loupe_container = ft.Container(
+            content=ft.Column(
+                controls=[self.loupe_label, ft.Container(content=self.loupe_image, expand=True)],
+                spacing=4,
+            ),
+            width=320, height=340, right=0, bottom=0, padding=8,
+            bgcolor=BG_SECONDARY, border=ft.border.all(2, ACCENT_CYAN),
+            border_radius=ft.border_radius.all(8), visible=False,
+        )
+
+    def _create_page_navigation(self) -> None:
+        """Create the page navigation row and thumbnail strip for PDF previews."""
+        self.prev_page_button = ft.IconButton(
+            icon=ft.icons.CHEVRON_LEFT, on_click=lambda e: self.go_to_page(self.current_page - 1),
+        )
+        self.next_page_button = ft.IconButton(
+            icon=ft.icons.CHEVRON_RIGHT, on_click=lambda e: self.go_to_page(self.current_page + 1),
+        )
+        self.page_label = ft.Text("", size=12, color=TEXT_MUTED)
+        self.thumbnail_strip = ft.Row(controls=[], spacing=8, alignment=ft.MainAxisAlignment.CENTER)
+        self.page_navigation = ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[self.prev_page_button, self.page_label, self.next_page_button],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                ),
+                self.thumbnail_strip,
+            ],
+            spacing=4,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            visible=False,
+        )
+
     def _build_layout(self) -> None:
         """Assemble all controls into the two-panel layout."""
         controls_panel = ft.Container(
@@ -254,10 +361,13 @@ class PassportFiligraneApp:
                     self.vector_mode_warning,
                     self.dpi_container,
                     ft.Divider(height=20, color="transparent"),
-                    self._create_select_file_button(),
+                    self.select_file_button,
                     self.file_info_text,
                     self.export_format_dropdown,
+                    self.encoder_profile_dropdown,
+                    self.max_size_field,
                     self.save_button,
+                    self.export_progress_container,
                 ],
                 spacing=12,
                 scroll=ft.ScrollMode.AUTO,
@@ -268,15 +378,23 @@ class PassportFiligraneApp:
         preview_panel = ft.Container(
             content=ft.Column(
                 controls=[
-                    ft.Text("Preview", size=18, weight=ft.FontWeight.BOLD, color=TEXT_WHITE),
+                    ft.Row(
+                        controls=[
+                            ft.Text("Preview", size=18, weight=ft.FontWeight.BOLD, color=TEXT_WHITE),
+                            self.loupe_switch,
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
                     ft.Stack(
                         controls=[
                             self.empty_state_container,
                             self.loading_indicator,
                             self.preview_container,
+                            self.loupe_container,
                         ],
                         expand=True,
                     ),
+                    self.page_navigation,
                 ],
                 spacing=12,
                 expand=True,
@@ -292,6 +410,9 @@ class PassportFiligraneApp:
         self._create_watermark_controls()
         self._create_mode_controls()
         self._create_export_controls()
+        self._create_page_navigation()
+        self._create_export_progress()
+        self.select_file_button = self._create_select_file_button()
         self._build_layout()
 
     # -------------------------------------------------------------------------
@@ -327,6 +448,10 @@ class PassportFiligraneApp:
         self.secure_mode_switch.visible = False
         self.vector_mode_warning.visible = False
         self.dpi_container.visible = False
+        self.page_navigation.visible = False
+        self.loupe_switch.visible = False
+        self.loupe_switch.value = False
+        self._hide_loupe()
 
     def _update_save_button_text(self) -> None:
         if self.current_file_type == "pdf" and (self.export_format_dropdown.value or "").startswith("Images"):
@@ -344,18 +469,109 @@ class PassportFiligraneApp:
             orientation=self.orientation_dropdown.value,
         )
 
-    def _apply_watermark_to_pdf(self):
+    def _selected_dpi(self) -> int:
+        return int(list(self.dpi_segmented_button.selected)[0])
+
+    def _selected_encoder_profile(self) -> str:
+        return self.encoder_profile_dropdown.value or DEFAULT_ENCODER_PROFILE
+
+    def _selected_max_bytes(self) -> int | None:
+        """Return the export size limit in bytes (1 MB = 1,000,000 bytes), or None."""
+        value = (self.max_size_field.value or "").strip().replace(",", ".")
+        if not value:
+            return None
+        try:
+            megabytes = float(value)
+        except ValueError:
+            megabytes = 0
+        if megabytes <= 0:
+            raise ValueError("Max file size must be a positive number of MB.")
+        return int(megabytes * 1000 * 1000)
+
+    def _selected_image_format(self) -> str:
+        """Return the Pillow format of the selected export ("Images (PNG)" -> "PNG").
+
+        PDF exports of image files embed a JPEG.
+        """
+        value = self.export_format_dropdown.value or "JPG"
+        if value.startswith("Images ("):
+            value = value[len("Images ("):-1]
+        return "JPEG" if value == "PDF" else normalize_image_format(value)
+
+    def _result_cache_key(self, output_format: str, max_bytes: int | None = None) -> str | None:
+        """Return the result-cache key for the current file and settings, or None if caching is off."""
+        if self.result_cache is None or self._source_digest is None:
+            return None
+        if self.current_file_type == "pdf":
+            mode = "secure" if self.secure_mode_switch.value else "vector"
+        else:
+            mode = "image"
+        return make_cache_key(
+            self._source_digest, self._get_watermark_params(), mode, output_format,
+            dpi=self._selected_dpi() if mode == "secure" else None,
+            encoder_profile=self._selected_encoder_profile(), max_bytes=max_bytes,
+        )
+
+    def _cache_lookup(self, key: str | None) -> bytes | None:
+        return self.result_cache.get(key) if key else None
+
+    def _cache_store(self, key: str | None, data: bytes) -> None:
+        """Store an output in the result cache. Cache failures never break an export."""
+        if not key:
+            return
+        try:
+            self.result_cache.put(key, data)
+        except OSError:
+            pass
+
+    def _cache_store_file(self, key: str | None, path: str) -> None:
+        if not key:
+            return
+        try:
+            with open(path, "rb") as f:
+                self._cache_store(key, f.read())
+        except OSError:
+            pass
+
+    @staticmethod
+    def _write_output(path: str, data: bytes) -> None:
+        """Write data to path; nothing is left at path if writing fails."""
+        from pdf_processing import atomic_output
+
+        with metrics.timer("save"), atomic_output(path) as tmp_path, open(tmp_path, "wb") as f:
+            f.write(data)
+        metrics.count("bytes_written", len(data))
+
+    def _apply_watermark_to_pdf(self, on_page_done=None, cancel=None, max_bytes=None):
+        """Watermark the loaded PDF into a new document the caller must close.
+
+        The loaded document is never modified: vector mode stamps a private
+        copy opened from the source bytes, so repeated exports start clean.
+        """
         from pdf_processing import (
             apply_vector_watermark_to_pdf,
             apply_secure_raster_watermark_to_pdf,
+            check_pdf_page_limit,
+            load_pdf,
         )
         params = self._get_watermark_params()
         if self.secure_mode_switch.value:
-            dpi = int(list(self.dpi_segmented_button.selected)[0])
-            return apply_secure_raster_watermark_to_pdf(self.pdf_doc, params, dpi=dpi)
+            dpi = self._selected_dpi()
+            check_pdf_page_limit(self.pdf_doc, secure=True, dpi=dpi)
+            with profiling.profile_operation("secure_apply", self.current_file_path):
+                return apply_secure_raster_watermark_to_pdf(
+                    self.pdf_doc, params, dpi=dpi, on_page_done=on_page_done, cancel=cancel,
+                    profile=self._selected_encoder_profile(), max_bytes=max_bytes,
+                )
         else:
-            apply_vector_watermark_to_pdf(self.pdf_doc, params)
-            return self.pdf_doc
+            doc, _ = load_pdf(self._pdf_source)
+            try:
+                with profiling.profile_operation("vector_apply", self.current_file_path):
+                    apply_vector_watermark_to_pdf(doc, params, on_page_done=on_page_done, cancel=cancel)
+            except BaseException:
+                doc.close()
+                raise
+            return doc
 
     def set_controls_disabled(self, disabled: bool) -> None:
         self.watermark_text.disabled = disabled
@@ -372,24 +588,23 @@ class PassportFiligraneApp:
 
     def update_export_options(self, file_type: str) -> None:
         """Update export dropdown options based on file type."""
+        image_formats = [IMAGE_FORMAT_EXTENSIONS[f].upper() for f in supported_image_formats()]
         if file_type == "image":
             self.export_format_dropdown.options = [
-                ft.dropdown.Option("JPG", "JPG"),
-                ft.dropdown.Option("PNG", "PNG"),
-                ft.dropdown.Option("PDF", "PDF"),
+                ft.dropdown.Option(fmt, fmt) for fmt in (*image_formats, "PDF")
             ]
             self.export_format_dropdown.value = "JPG"
             self.export_format_dropdown.visible = True
         elif file_type == "pdf":
-            self.export_format_dropdown.options = [
-                ft.dropdown.Option("PDF", "PDF"),
-                ft.dropdown.Option("Images (JPG)", "Images (JPG)"),
-                ft.dropdown.Option("Images (PNG)", "Images (PNG)"),
+            self.export_format_dropdown.options = [ft.dropdown.Option("PDF", "PDF")] + [
+                ft.dropdown.Option(f"Images ({fmt})", f"Images ({fmt})") for fmt in image_formats
             ]
             self.export_format_dropdown.value = "PDF"
             self.export_format_dropdown.visible = True
         else:
             self.export_format_dropdown.visible = False
+        self.encoder_profile_dropdown.visible = self.export_format_dropdown.visible
+        self.max_size_field.visible = self.export_format_dropdown.visible
 
         self.page.update()
 
@@ -398,10 +613,232 @@ class PassportFiligraneApp:
         is_vector = not self.secure_mode_switch.value
         self.vector_mode_warning.visible = is_pdf and is_vector
 
+    # -------------------------------------------------------------------------
+    # Background export
+    # -------------------------------------------------------------------------
+
+    def is_exporting(self) -> bool:
+        return self._export_future is not None and not self._export_future.done()
+
+    def wait_for_export(self, timeout: float | None = None) -> None:
+        """Block until the running export (if any) has finished."""
+        if self._export_future is not None:
+            self._export_future.result(timeout=timeout)
+
+    def _set_exporting(self, running: bool) -> None:
+        """Lock the controls and show the progress row while an export runs."""
+        self.export_progress_container.visible = running
+        self.export_progress_bar.value = 0 if running else None
+        self.export_progress_text.value = "Starting..." if running else ""
+        self.cancel_export_button.disabled = not running
+        self.select_file_button.disabled = running
+        self.export_format_dropdown.disabled = running
+        self.encoder_profile_dropdown.disabled = running
+        self.max_size_field.disabled = running
+        self.loupe_switch.disabled = running
+        self.prev_page_button.disabled = running or self.current_page == 0
+        self.next_page_button.disabled = running or self.current_page >= self.num_pages - 1
+        self.set_controls_disabled(running)
+
+    def _start_export(self, job, error_prefix: str) -> None:
+        """Run job(progress, cancel) on the export executor.
+
+        Args:
+            job: Callable receiving a progress(done, total) function and the
+                export's CancelToken, and returning the success message.
+            error_prefix: Prefix of the error snackbar message.
+        """
+        from pdf_processing import CancelToken
+
+        if self.is_exporting():
+            return
+        self._export_cancel = CancelToken()
+        self._export_started = time.perf_counter()
+        self._set_exporting(True)
+        self._export_future = self._export_executor.submit(
+            self._run_export, job, self._export_cancel, error_prefix,
+        )
+
+    def _run_export(self, job, cancel, error_prefix: str) -> None:
+        from pdf_processing import OperationCancelled
+
+        try:
+            # Pauses preview and thumbnail rendering, which share the document.
+            with self._preview_lock:
+                message = job(self._report_export_progress, cancel)
+        except OperationCancelled:
+            self._set_exporting(False)
+            self._show_success("Export cancelled.")
+        except Exception as ex:
+            self._set_exporting(False)
+            self._show_error(f"{error_prefix}: {ex}")
+        else:
+            self._set_exporting(False)
+            self._show_success(message)
+
+    def _report_export_progress(self, done: int, total: int) -> None:
+        """Update the progress bar with the page rate and ETA."""
+        elapsed = time.perf_counter() - self._export_started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.export_progress_bar.value = done / total if total else None
+        if rate > 0 and done < total:
+            eta = (total - done) / rate
+            self.export_progress_text.value = f"{done}/{total} pages · {rate:.1f}/s · ETA {eta:.0f}s"
+        else:
+            self.export_progress_text.value = f"{done}/{total} pages"
+        self.page.update()
+
+    # -------------------------------------------------------------------------
+    # PDF page navigation
+    # -------------------------------------------------------------------------
+
+    def _start_thumbnails(self) -> None:
+        """(Re)start background thumbnail rendering for the loaded PDF."""
+        from pdf_processing import render_page_thumbnail
+
+        self._stop_thumbnails()
+        self.thumbnail_renderer = ThumbnailRenderer(
+            lambda page_num: render_page_thumbnail(self.pdf_doc, page_num),
+            self.num_pages,
+            self.thumbnail_cache,
+            self._preview_lock,
+            on_ready=self._on_thumbnail_ready,
+        )
+        self.thumbnail_renderer.start()
+
+    def _stop_thumbnails(self) -> None:
+        if self.thumbnail_renderer is not None:
+            self.thumbnail_renderer.stop()
+            self.thumbnail_renderer = None
+        self.thumbnail_cache.clear()
+
+    def _strip_pages(self) -> range:
+        first = max(0, self.current_page - THUMBNAIL_STRIP_RADIUS)
+        return range(first, min(self.num_pages, self.current_page + THUMBNAIL_STRIP_RADIUS + 1))
+
+    def _create_thumbnail(self, page_num: int) -> ft.Container:
+        data = self.thumbnail_cache.get(page_num)
+        if data is None:
+            content = ft.Text(str(page_num + 1), size=12, color=TEXT_MUTED)
+        else:
+            content = ft.Image(src_base64=base64.b64encode(data).decode("utf-8"), fit="contain")
+        selected = page_num == self.current_page
+        return ft.Container(
+            content=content,
+            width=56, height=72,
+            alignment=ft.alignment.center,
+            bgcolor=BG_SECONDARY,
+            border=ft.border.all(2, ACCENT_PINK if selected else BG_SECONDARY),
+            border_radius=ft.border_radius.all(4),
+            data=page_num,
+            on_click=lambda e, n=page_num: self.go_to_page(n),
+        )
+
+    def _update_page_navigation(self) -> None:
+        """Refresh the page label, arrow states and thumbnail strip."""
+        multi_page = self.current_file_type == "pdf" and self.num_pages > 1
+        self.page_navigation.visible = multi_page
+        if not multi_page:
+            return
+        self.page_label.value = f"Page {self.current_page + 1} / {self.num_pages}"
+        self.prev_page_button.disabled = self.current_page == 0
+        self.next_page_button.disabled = self.current_page >= self.num_pages - 1
+        self.thumbnail_strip.controls = [self._create_thumbnail(n) for n in self._strip_pages()]
+
+    def _on_thumbnail_ready(self, page_num: int, data: bytes) -> None:
+        if page_num in self._strip_pages():
+            self._update_page_navigation()
+            self.page.update()
+
+    def go_to_page(self, page_num: int) -> None:
+        """Show page_num in the preview; only that page is rendered and composited."""
+        if self.current_file_type != "pdf" or self.pdf_doc is None:
+            return
+        page_num = max(0, min(page_num, self.num_pages - 1))
+        if page_num == self.current_page:
+            return
+        self.current_page = page_num
+        self._hide_loupe()
+        if self.thumbnail_renderer is not None:
+            self.thumbnail_renderer.focus(page_num)
+        self._update_page_navigation()
+        self.update_preview()
+
+    # -------------------------------------------------------------------------
+    # Loupe (region preview at export DPI)
+    # -------------------------------------------------------------------------
+
+    def _on_preview_resize(self, e) -> None:
+        self._preview_size = (e.width, e.height)
+
+    def _preview_point_to_page(self, x: float, y: float) -> tuple[float, float] | None:
+        """Map a tap in the preview area to page points, or None if it misses the page.
+
+        The preview raster is rendered at 72 DPI, so its pixels are page points;
+        it is shown scaled to fit ("contain") and centred in the preview area.
+        """
+        if self._preview_size is None or self._preview_base is None:
+            return None
+        area_w, area_h = self._preview_size
+        img_w, img_h = self._preview_base[1].size
+        scale = min(area_w / img_w, area_h / img_h)
+        left = (area_w - img_w * scale) / 2
+        top = (area_h - img_h * scale) / 2
+        px, py = (x - left) / scale, (y - top) / scale
+        if not (0 <= px <= img_w and 0 <= py <= img_h):
+            return None
+        return px, py
+
+    def _render_loupe(self) -> None:
+        """Render the loupe region of the current page. Caller holds _preview_lock."""
+        from pdf_processing import generate_pdf_loupe, loupe_clip, secure_page_dpi
+
+        page = self.pdf_doc.load_page(self.current_page)
+        dpi = round(secure_page_dpi(page, self._selected_dpi()))
+        clip = loupe_clip(page, self._loupe_center)
+        data = generate_pdf_loupe(self.pdf_doc, self.current_page, self._get_watermark_params(), dpi, clip)
+        self.loupe_image.src_base64 = base64.b64encode(data).decode("utf-8")
+        self.loupe_label.value = f"{dpi} DPI · page {self.current_page + 1}"
+        self.loupe_container.visible = True
+
+    def _hide_loupe(self) -> None:
+        self._loupe_center = None
+        self.loupe_container.visible = False
+
+    def on_loupe_toggle(self, e=None) -> None:
+        if not self.loupe_switch.value:
+            self._hide_loupe()
+        self.page.update()
+
+    def on_preview_tap(self, e) -> None:
+        """Show the tapped region at the selected DPI while the loupe is on."""
+        if not self.loupe_switch.value or self.current_file_type != "pdf" or self.pdf_doc is None:
+            return
+        if self.is_exporting():
+            return
+        point = self._preview_point_to_page(e.local_x, e.local_y)
+        if point is None:
+            return
+        self._loupe_center = point
+        with self._preview_lock:
+            try:
+                self._render_loupe()
+            except Exception as ex:
+                self._show_error(f"Loupe error: {ex}")
+                return
+        self.page.update()
+
     # -------------------------------------------------------------------------
     # Event handlers
     # -------------------------------------------------------------------------
 
+    def on_cancel_export(self, e=None) -> None:
+        if self.is_exporting():
+            self._export_cancel.cancel()
+            self.cancel_export_button.disabled = True
+            self.export_progress_text.value = "Cancelling..."
+            self.page.update()
+
     def on_secure_mode_change(self, e) -> None:
         self.dpi_container.visible = self.secure_mode_switch.value
         self._update_vector_warning_visibility()
@@ -424,20 +861,33 @@ class PassportFiligraneApp:
             self.update_timer.cancel()
 
         def do_update():
-            from pdf_processing import generate_pdf_preview
+            from pdf_processing import render_preview_base, composite_preview
 
             with self._preview_lock:
                 try:
                     params = self._get_watermark_params()
                     file_type = self.current_file_type
 
-                    if file_type == "image" and self.original_image_bytes:
-                        fmt = self.export_format_dropdown.value if self.export_format_dropdown.value in ["JPG", "PNG"] else "JPG"
-                        self.watermarked_image_bytes = apply_watermark(
-                            self.original_image_bytes, params, output_format=fmt
-                        )
-                    elif file_type == "pdf" and self.pdf_doc:
-                        self.watermarked_image_bytes = generate_pdf_preview(self.pdf_doc, params)
+                    with metrics.timer("preview"), \
+                            profiling.profile_operation("preview", self.current_file_path):
+                        if file_type == "image" and self.original_image_bytes:
+                            fmt = self._selected_image_format()
+                            # The preview cannot display AVIF; it is encoded when saving.
+                            self.watermarked_image_bytes = apply_watermark(
+                                self.original_image_bytes, params,
+                                output_format="JPEG" if fmt == "AVIF" else fmt,
+                                profile=self._selected_encoder_profile(),
+                            )
+                        elif file_type == "pdf" and self.pdf_doc:
+                            page_num = self.current_page
+                            if self._preview_base is None or self._preview_base[0] != page_num:
+                                self._preview_base = (page_num, render_preview_base(self.pdf_doc, page_num))
+                            self.watermarked_image_bytes = composite_preview(self._preview_base[1], params)
+                            if self._loupe_center is not None:
+                                self._render_loupe()
+                            if self.thumbnail_renderer is None and self.num_pages > 1:
+                                # Visible page first; the rest of the strip fills in behind it.
+                                self._start_thumbnails()
 
                     if self.watermarked_image_bytes:
                         self.preview_image.src_base64 = base64.b64encode(self.watermarked_image_bytes).decode("utf-8")
@@ -447,22 +897,31 @@ class PassportFiligraneApp:
                 except Exception as ex:
                     self._show_error(f"Preview update error: {ex}")
 
-        self.update_timer = threading.Timer(0.5, do_update)
+        self.update_timer = threading.Timer(PREVIEW_DEBOUNCE_SECONDS, do_update)
         self.update_timer.start()
 
+    def _set_source_digest(self, data: bytes) -> None:
+        """Hash the loaded bytes for result-cache keys (only if the cache is on)."""
+        self._source_digest = hash_bytes(data) if self.result_cache is not None else None
+
     def _load_image(self, file_path: str) -> None:
-        """Load and validate an image file into state."""
-        with open(file_path, "rb") as f:
-            content = f.read()
-        try:
-            img = Image.open(io.BytesIO(content))
-            img.verify()
-            img = Image.open(io.BytesIO(content))
-            validate_image_dimensions(img)
-        except Exception:
-            self._show_error("Unable to read this image file.")
-            return
-        self.original_image_bytes = content
+        """Load and validate an image file into state.
+
+        The file is memory-mapped only while it is validated (from its header)
+        and copied. The app keeps the private copy: a long-lived mapping would
+        crash the next decode (SIGBUS) if the file were truncated or rewritten,
+        e.g. by exporting over it, and would lock the file on Windows.
+        """
+        with MappedFile(file_path) as mapped:
+            try:
+                probe_image(mapped.buffer)
+            except Exception:
+                self._show_error("Unable to read this image file.")
+                return
+            self.original_image_bytes = bytes(mapped.buffer)
+        self._pdf_source = None
+        self._set_source_digest(self.original_image_bytes)
+        self._stop_thumbnails()
         self.pdf_doc = None
         self.file_info_text.value = "Image loaded"
         self.update_export_options("image")
@@ -470,19 +929,32 @@ class PassportFiligraneApp:
 
     def _load_pdf(self, file_path: str) -> None:
         """Load and validate a PDF file into state. Closes existing pdf_doc."""
+        self._stop_thumbnails()
+        self._preview_base = None
+        self.current_page = 0
+        self._hide_loupe()
+
         # Close existing document before opening new one (fixes document leak)
         if self.pdf_doc is not None:
             self.pdf_doc.close()
             self.pdf_doc = None
 
-        from pdf_processing import load_pdf
+        from pdf_processing import load_pdf, pdf_page_limit
 
-        self.pdf_doc, self.num_pages = load_pdf(file_path)
+        self.original_image_bytes = None
+        # Opened from a private copy: the cache key and every later render and
+        # export see the same content, even if the file changes on disk.
+        with open(file_path, "rb") as f:
+            self._pdf_source = f.read()
+        self._set_source_digest(self._pdf_source)
+        self.pdf_doc, self.num_pages = load_pdf(self._pdf_source)
 
-        if self.num_pages > MAX_PDF_PAGES:
+        # Secure Mode has a tighter, DPI-dependent limit, checked at export time.
+        max_pages = pdf_page_limit(self.pdf_doc)
+        if self.num_pages > max_pages:
             self._show_error(
                 f"PDF too large ({self.num_pages} pages). "
-                f"Maximum allowed is {MAX_PDF_PAGES} pages."
+                f"Maximum allowed is {max_pages} pages."
             )
             self.pdf_doc.close()
             self.pdf_doc = None
@@ -493,12 +965,14 @@ class PassportFiligraneApp:
 
         self.dpi_container.visible = self.secure_mode_switch.value
         self.secure_mode_switch.visible = True
+        self.loupe_switch.visible = True
         self.file_info_text.value = f"PDF loaded: {self.num_pages} page(s)"
         self.update_export_options("pdf")
 
     def _finalize_file_load(self) -> None:
         """Common finalization after a successful file load."""
         self.file_info_text.visible = True
+        self._update_page_navigation()
         self._set_preview_visibility(loading=True)
         self.set_controls_disabled(False)
         self.update_preview()
@@ -512,6 +986,8 @@ class PassportFiligraneApp:
             return
 
         self.current_filename = os.path.basename(file_path)
+        self.current_file_path = file_path
+        self._source_digest = None
 
         try:
             validate_file_size(file_path)
@@ -546,49 +1022,132 @@ class PassportFiligraneApp:
             self.page.update()
 
     def on_save_result(self, e: ft.FilePickerResultEvent) -> None:
-        from pdf_processing import save_watermarked_pdf
-
         if not e.path:
             return
+        if self.current_file_type == "pdf" and self.pdf_doc:
+            self._start_export(
+                lambda progress, cancel: self._export_pdf_file(e.path, progress, cancel),
+                error_prefix="Error while saving",
+            )
+            return
         try:
             if self.current_file_type == "image":
-                if self.export_format_dropdown.value == "PDF":
-                    from pdf_processing import save_image_as_pdf
-                    save_image_as_pdf(self.watermarked_image_bytes, e.path)
-                else:
-                    with open(e.path, "wb") as f:
-                        f.write(self.watermarked_image_bytes)
-            elif self.current_file_type == "pdf" and self.pdf_doc:
-                save_watermarked_pdf(self._apply_watermark_to_pdf(), e.path)
+                with profiling.profile_operation("image_export", self.current_file_path):
+                    self._export_image_file(e.path)
 
             self._show_success(f"File saved: {os.path.basename(e.path)}")
         except Exception as ex:
             self._show_error(f"Error while saving: {ex}")
 
-    def on_dir_result(self, e: ft.FilePickerResultEvent) -> None:
-        from pdf_processing import save_pdf_as_images
+    def _export_image_file(self, path: str) -> None:
+        """Save the watermarked image to path in the selected export format."""
+        max_bytes = self._selected_max_bytes()
+        if self.export_format_dropdown.value == "PDF":
+            from pdf_processing import pdf_image_budget, save_image_as_pdf
+            key = self._result_cache_key("PDF", max_bytes)
+            cached = self._cache_lookup(key)
+            if cached is not None:
+                self._write_output(path, cached)
+            else:
+                if max_bytes is None:
+                    save_image_as_pdf(self.watermarked_image_bytes, path)
+                else:
+                    data = apply_watermark(
+                        self.original_image_bytes, self._get_watermark_params(),
+                        profile=self._selected_encoder_profile(),
+                        max_bytes=pdf_image_budget(max_bytes),
+                    )
+                    # Keep the original page size if the image was downscaled to fit.
+                    info = probe_image(self.original_image_bytes)
+                    save_image_as_pdf(data, path, page_size=(info.width, info.height))
+                self._cache_store_file(key, path)
+        else:
+            data = self.watermarked_image_bytes
+            if self._selected_image_format() == "AVIF" or max_bytes is not None:
+                data = apply_watermark(
+                    self.original_image_bytes, self._get_watermark_params(),
+                    output_format=self._selected_image_format(),
+                    profile=self._selected_encoder_profile(), max_bytes=max_bytes,
+                )
+            self._write_output(path, data)
+
+    def _export_pdf_file(self, path: str, progress, cancel) -> str:
+        """Export job: watermark the loaded PDF and save it to path."""
+        from pdf_processing import save_watermarked_pdf
 
-        if e.path and self.current_file_type == "pdf" and self.pdf_doc:
+        max_bytes = self._selected_max_bytes()
+        key = self._result_cache_key("PDF", max_bytes)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            self._write_output(path, cached)
+        else:
+            total = self.num_pages + 1
+            doc = self._apply_watermark_to_pdf(
+                on_page_done=lambda i, n, elapsed: progress(i, total), cancel=cancel, max_bytes=max_bytes,
+            )
             try:
-                doc_to_save = self._apply_watermark_to_pdf()
-                fmt = self.export_format_dropdown.value
-                img_fmt = "PNG" if "PNG" in fmt else "JPEG"
-                base_name = os.path.splitext(self.current_filename)[0] if self.current_filename else "export"
-                ext = "png" if img_fmt == "PNG" else "jpg"
-                save_pdf_as_images(doc_to_save, e.path, base_name, img_format=img_fmt)
-
-                if self.num_pages > 1:
-                    success_msg = f"'{base_name}_page_001.{ext}' and {self.num_pages-1} more exported to: {os.path.basename(e.path)}"
-                else:
-                    success_msg = f"'{base_name}_page_001.{ext}' exported to: {os.path.basename(e.path)}"
-                self._show_success(success_msg)
-            except Exception as ex:
-                self._show_error(f"Error while exporting images: {ex}")
+                with profiling.profile_operation("save", self.current_file_path):
+                    save_watermarked_pdf(doc, path)
+            finally:
+                doc.close()
+            if max_bytes is not None and os.path.getsize(path) > max_bytes:
+                # Only reachable in vector mode, whose output size cannot be reduced.
+                os.remove(path)
+                raise ValueError("the watermarked PDF exceeds the max file size; enable Secure Mode to fit it")
+            self._cache_store_file(key, path)
+        return f"File saved: {os.path.basename(path)}"
+
+    def on_dir_result(self, e: ft.FilePickerResultEvent) -> None:
+        if not (e.path and self.current_file_type == "pdf" and self.pdf_doc):
+            return
+        img_fmt = self._selected_image_format()
+        base_name = os.path.splitext(self.current_filename)[0] if self.current_filename else "export"
+        ext = IMAGE_FORMAT_EXTENSIONS[img_fmt]
+        self._start_export(
+            lambda progress, cancel: self._export_pdf_images(e.path, base_name, img_fmt, ext, progress, cancel),
+            error_prefix="Error while exporting images",
+        )
+
+    def _export_pdf_images(
+        self, dir_path: str, base_name: str, img_fmt: str, ext: str, progress, cancel,
+    ) -> str:
+        """Export job: watermark the loaded PDF and write one image per page."""
+        from pdf_processing import load_pdf, save_pdf_as_images
+
+        max_bytes = self._selected_max_bytes()
+        # Image export reuses the cached watermarked PDF: the expensive
+        # part (vector/secure watermarking) is shared with PDF export.
+        key = self._result_cache_key("PDF")
+        cached = self._cache_lookup(key)
+        total = self.num_pages if cached is not None else 2 * self.num_pages
+        if cached is not None:
+            doc_to_save, _ = load_pdf(cached)
+        else:
+            doc_to_save = self._apply_watermark_to_pdf(
+                on_page_done=lambda i, n, elapsed: progress(i, total), cancel=cancel,
+            )
+
+        offset = total - self.num_pages
+        try:
+            if cached is None and key:
+                self._cache_store(key, doc_to_save.tobytes())
+            with profiling.profile_operation("image_export", self.current_file_path):
+                save_pdf_as_images(
+                    doc_to_save, dir_path, base_name, img_format=img_fmt,
+                    on_page_done=lambda i, n, elapsed: progress(offset + i, total), cancel=cancel,
+                    profile=self._selected_encoder_profile(), max_bytes=max_bytes,
+                )
+        finally:
+            doc_to_save.close()
+
+        if self.num_pages > 1:
+            return f"'{base_name}_page_001.{ext}' and {self.num_pages-1} more exported to: {os.path.basename(dir_path)}"
+        return f"'{base_name}_page_001.{ext}' exported to: {os.path.basename(dir_path)}"
 
     def on_save_button_click(self, e) -> None:
         fmt = self.export_format_dropdown.value
         if self.current_file_type == "pdf":
-            if fmt == "Images (JPG)" or fmt == "Images (PNG)":
+            if (fmt or "").startswith("Images ("):
                 self.save_dir_picker.get_directory_path()
             else:
                 self.save_file_picker.save_file(
@@ -596,20 +1155,16 @@ class PassportFiligraneApp:
                     allowed_extensions=["pdf"]
                 )
         elif self.current_file_type == "image":
-            if fmt == "PNG":
-                self.save_file_picker.save_file(
-                    file_name=f"{EXPORT_FILENAME_PREFIX}.png",
-                    allowed_extensions=["png"]
-                )
-            elif fmt == "PDF":
+            if fmt == "PDF":
                 self.save_file_picker.save_file(
                     file_name=f"{EXPORT_FILENAME_PREFIX}.pdf",
                     allowed_extensions=["pdf"]
                 )
             else:
+                ext = IMAGE_FORMAT_EXTENSIONS[self._selected_image_format()]
                 self.save_file_picker.save_file(
-                    file_name=f"{EXPORT_FILENAME_PREFIX}.jpg",
-                    allowed_extensions=["jpg", "jpeg"]
+                    file_name=f"{EXPORT_FILENAME_PREFIX}.{ext}",
+                    allowed_extensions=["jpg", "jpeg"] if ext == "jpg" else [ext]
                 )
         else:
             self.save_file_picker.save_file(
@@ -0,0 +1,300 @@
+"""asyncio facade over the watermarking engines.
+
+The engines are CPU-bound and blocking; these coroutines run them on a
+thread pool owned by an AsyncEngine, so the event loop stays responsive:
+
+    params = WatermarkParams(text="COPY", opacity=30, font_size=36, spacing=150)
+    jpeg = await watermark_image(photo_bytes, params)
+    pdf = await watermark_pdf(pdf_bytes, params, secure=True, dpi=300)
+    async for page_pdf in iter_pdf_pages(pdf_bytes, params, secure=True):
+        ...
+
+Each engine admits at most max_in_flight jobs whose estimated working memory
+(from the cost model in constants.py) fits in memory_budget; other callers
+wait. Cancelling the awaiting task cancels the job through a
+pdf_processing.CancelToken, so a PDF stops between pages (or bands); an image
+is a single unit of work and runs to completion. Its slot is released only
+once the engine has actually stopped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import fitz
+
+from constants import (
+    ASYNC_MAX_IN_FLIGHT,
+    ASYNC_MEMORY_BUDGET_BYTES,
+    ASYNC_PAGES_AHEAD,
+    PDF_PAGE_WINDOW,
+    RASTER_OUTPUT_BYTES_PER_PIXEL,
+    RASTER_WORKING_BYTES_PER_PIXEL,
+    SECURE_BAND_MAX_PIXELS,
+)
+from encoding import EncoderProfile
+from inputs import probe_image
+from pdf_processing import (
+    CancelToken,
+    OperationCancelled,
+    apply_secure_raster_watermark_to_pdf,
+    apply_vector_watermark_to_pdf,
+    check_pdf_page_limit,
+    load_pdf,
+    watermarked_pdf_bytes,
+)
+from watermark import WatermarkParams, apply_watermark
+
+PdfSource = str | bytes | bytearray | memoryview
+
+
+def estimate_image_memory(width: int, height: int, source_bytes: int = 0) -> int:
+    """Estimated peak working memory (bytes) of watermarking one image."""
+    return source_bytes + width * height * RASTER_WORKING_BYTES_PER_PIXEL
+
+
+def estimate_pdf_memory(doc: fitz.Document, secure: bool, dpi: int, source_bytes: int = 0,
+                        pages_held: int | None = None) -> int:
+    """Estimated peak working memory (bytes) of watermarking a PDF.
+
+    Vector mode holds the source and one serialized copy. Secure mode holds
+    PDF_PAGE_WINDOW rasters (or bands) of the largest page, plus the encoded
+    images of pages_held output pages (default: all of them).
+    """
+    if not secure:
+        return 3 * source_bytes
+    max_area = max((page.rect.width * page.rect.height for page in doc), default=0)
+    pixels = max(1.0, max_area * (dpi / 72) ** 2)
+    working = PDF_PAGE_WINDOW * min(pixels, SECURE_BAND_MAX_PIXELS) * RASTER_WORKING_BYTES_PER_PIXEL
+    held = doc.page_count if pages_held is None else min(pages_held, doc.page_count)
+    return int(source_bytes + working + held * pixels * RASTER_OUTPUT_BYTES_PER_PIXEL)
+
+
+def _watermark_document(doc: fitz.Document, params: WatermarkParams, secure: bool, dpi: int,
+                        profile, max_bytes: int | None, cancel: CancelToken) -> bytes:
+    """Watermark doc (vector: in place) and return the output PDF bytes."""
+    if not secure:
+        apply_vector_watermark_to_pdf(doc, params, cancel=cancel)
+        data = watermarked_pdf_bytes(doc)
+        if max_bytes is not None and len(data) > max_bytes:
+            raise ValueError(f"Watermarked PDF exceeds {max_bytes} bytes; use secure mode to fit it.")
+        return data
+    out = apply_secure_raster_watermark_to_pdf(doc, params, dpi=dpi, cancel=cancel, profile=profile,
+                                               max_bytes=max_bytes)
+    try:
+        return watermarked_pdf_bytes(out)
+    finally:
+        out.close()
+
+
+def _watermark_pages(doc: fitz.Document, params: WatermarkParams, secure: bool, dpi: int, profile,
+                     cancel: CancelToken, emit) -> None:
+    """Watermark doc one page at a time, passing each as a one-page PDF to emit."""
+    for page_num in range(doc.page_count):
+        cancel.raise_if_cancelled()
+        with fitz.open() as page_doc:
+            page_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
+            emit(_watermark_document(page_doc, params, secure, dpi, profile, None, cancel))
+
+
+class AsyncEngine:
+    """Runs the blocking engines on its own thread pool under concurrency limits.
+
+    Args:
+        max_in_flight: Maximum number of jobs running at once.
+        memory_budget: Maximum total estimated working memory of running jobs.
+            A job estimated above the whole budget is refused with ValueError;
+            otherwise it waits until enough running jobs have finished.
+
+    An engine may be reused across event loops, but by one loop at a time.
+    """
+
+    def __init__(self, max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+                 memory_budget: int = ASYNC_MEMORY_BUDGET_BYTES):
+        self.max_in_flight = max_in_flight
+        self.memory_budget = memory_budget
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="filigrane-async")
+        self._changed: asyncio.Condition | None = None
+        self._loop = None
+        self._in_flight = 0
+        self._reserved = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def reserved_bytes(self) -> int:
+        return self._reserved
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # asyncio primitives are bound to one loop.
+            self._changed, self._loop = asyncio.Condition(), loop
+        return self._changed
+
+    @asynccontextmanager
+    async def _admit(self, cost: int):
+        if cost > self.memory_budget:
+            raise ValueError(
+                f"Job needs an estimated {cost / 2**20:.0f} MB, above the "
+                f"{self.memory_budget / 2**20:.0f} MB memory budget."
+            )
+        changed = self._condition()
+        async with changed:
+            await changed.wait_for(
+                lambda: self._in_flight < self.max_in_flight and self._reserved + cost <= self.memory_budget
+            )
+            self._in_flight += 1
+            self._reserved += cost
+        try:
+            yield
+        finally:
+            async with changed:
+                self._in_flight -= 1
+                self._reserved -= cost
+                changed.notify_all()
+
+    async def _run(self, func, *args, cancel: CancelToken | None = None):
+        """Run func(*args) on the pool; on cancellation, cancel it and wait for it to stop."""
+        future = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if cancel is not None:
+                cancel.cancel()
+            await asyncio.wait([future])  # The job may still be using the inputs.
+            if not future.cancelled():
+                future.exception()  # Retrieved: OperationCancelled is the expected outcome.
+            raise
+
+    async def watermark_image(self, data: bytes | memoryview, params: WatermarkParams,
+                              output_format: str = "JPEG", profile: str | EncoderProfile | None = None,
+                              max_bytes: int | None = None) -> bytes:
+        """Async apply_watermark (see watermark.apply_watermark)."""
+        info = probe_image(data)
+        async with self._admit(estimate_image_memory(info.width, info.height, len(data))):
+            return await self._run(apply_watermark, data, params, output_format, profile, max_bytes)
+
+    async def watermark_pdf(self, source: PdfSource, params: WatermarkParams, secure: bool = False,
+                            dpi: int = 450, profile: str | EncoderProfile | None = None,
+                            max_bytes: int | None = None) -> bytes:
+        """Watermark a PDF (path or bytes) in vector or secure mode and return the PDF bytes.
+
+        Raises:
+            PdfLoadError: If the PDF cannot be opened (see pdf_processing.load_pdf).
+            ValueError: If the PDF exceeds the page limit or the memory budget.
+        """
+        doc, _ = await asyncio.to_thread(load_pdf, source)
+        try:
+            check_pdf_page_limit(doc, secure=secure, dpi=dpi)
+            cost = estimate_pdf_memory(doc, secure, dpi, _source_size(source))
+            cancel = CancelToken()
+            async with self._admit(cost):
+                return await self._run(_watermark_document, doc, params, secure, dpi, profile, max_bytes,
+                                       cancel, cancel=cancel)
+        finally:
+            doc.close()
+
+    async def iter_pdf_pages(self, source: PdfSource, params: WatermarkParams, secure: bool = False,
+                             dpi: int = 450, profile: str | EncoderProfile | None = None) -> AsyncIterator[bytes]:
+        """Yield each watermarked page as a one-page PDF, as soon as it is ready.
+
+        At most ASYNC_PAGES_AHEAD pages are produced ahead of the consumer.
+        Closing the iterator early (e.g. a break inside
+        ``async with contextlib.aclosing(...)``) or cancelling the consuming
+        task stops the engine before its next page.
+        """
+        loop = asyncio.get_running_loop()
+        doc, _ = await asyncio.to_thread(load_pdf, source)
+        pages: asyncio.Queue = asyncio.Queue(maxsize=ASYNC_PAGES_AHEAD)
+        cancel = CancelToken()
+
+        def emit(page: bytes) -> None:
+            put = asyncio.run_coroutine_threadsafe(pages.put(page), loop)
+            while True:
+                try:
+                    return put.result(timeout=0.1)
+                except TimeoutError:
+                    if cancel.cancelled:
+                        put.cancel()
+                        raise OperationCancelled() from None
+
+        try:
+            check_pdf_page_limit(doc, secure=secure, dpi=dpi)
+            cost = estimate_pdf_memory(doc, secure, dpi, _source_size(source), pages_held=ASYNC_PAGES_AHEAD + 1)
+            async with self._admit(cost):
+                job = asyncio.ensure_future(self._run(_watermark_pages, doc, params, secure, dpi, profile,
+                                                      cancel, emit, cancel=cancel))
+                try:
+                    while True:
+                        getter = asyncio.ensure_future(pages.get())
+                        done, _ = await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+                        if getter in done:
+                            yield getter.result()
+                            continue
+                        getter.cancel()
+                        while not pages.empty():
+                            yield pages.get_nowait()
+                        job.result()  # Raises the engine's error, if any.
+                        return
+                finally:
+                    if not job.done():
+                        cancel.cancel()
+                        job.cancel()
+                        await asyncio.wait([job])
+        finally:
+            doc.close()
+
+    def close(self) -> None:
+        """Shut down the thread pool (running jobs finish first)."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncEngine":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.to_thread(self.close)
+
+
+def _source_size(source: PdfSource) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+_default_engine: AsyncEngine | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """Return the module-level engine used by the functions below, creating it on first use."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = AsyncEngine()
+    return _default_engine
+
+
+def configure(max_in_flight: int = ASYNC_MAX_IN_FLIGHT, memory_budget: int = ASYNC_MEMORY_BUDGET_BYTES) -> None:
+    """Replace the module-level engine with one using these limits."""
+    global _default_engine
+    if _default_engine is not None:
+        _default_engine.close()
+    _default_engine = AsyncEngine(max_in_flight, memory_budget)
+
+
+async def watermark_image(data: bytes | memoryview, params: WatermarkParams, **kwargs) -> bytes:
+    """AsyncEngine.watermark_image on the module-level engine."""
+    return await get_engine().watermark_image(data, params, **kwargs)
+
+
+async def watermark_pdf(source: PdfSource, params: WatermarkParams, **kwargs) -> bytes:
+    """AsyncEngine.watermark_pdf on the module-level engine."""
+    return await get_engine().watermark_pdf(source, params, **kwargs)
+
+
+def iter_pdf_pages(source: PdfSource, params: WatermarkParams, **kwargs) -> AsyncIterator[bytes]:
+    """AsyncEngine.iter_pdf_pages on the module-level engine."""
+    return get_engine().iter_pdf_pages(source, params, **kwargs)
@@ -0,0 +1,403 @@
+"""Headless batch watermarking with file-level parallelism."""
+
+from __future__ import annotations
+
+import glob
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import metrics
+import profiling
+from constants import DEFAULT_ENCODER_PROFILE, EXPORT_FILENAME_PREFIX
+from encoding import IMAGE_FORMAT_EXTENSIONS, normalize_image_format
+from inputs import MappedFile, probe_image
+from pdf_processing import (
+    apply_secure_raster_watermark_to_pdf,
+    apply_vector_watermark_to_pdf,
+    check_pdf_page_limit,
+    image_to_pdf_bytes,
+    iter_pdf_as_images,
+    load_pdf,
+    pdf_image_budget,
+    save_image_as_pdf,
+    save_pdf_as_images,
+    save_watermarked_pdf,
+    watermarked_pdf_bytes,
+)
+from utils import detect_buffer_type, detect_file_type, validate_data_size, validate_file_size
+from watermark import WatermarkParams, apply_watermark
+
+
+@dataclass(frozen=True)
+class BatchOptions:
+    """Immutable container for batch job settings shared by every file.
+
+    Attributes:
+        params: Watermark rendering parameters.
+        output_dir: Directory receiving the watermarked outputs.
+        secure: Use secure raster mode for PDFs instead of vector mode.
+        dpi: Render resolution for secure mode (300, 450, or 600).
+        image_format: Output for image inputs: "JPG", "PNG", "WEBP", "AVIF" or "PDF".
+        pdf_format: Output for PDF inputs: "PDF", or an image format for one
+            image per page.
+        encoder_profile: Encoder profile name (see encoding.ENCODER_PROFILES).
+        max_bytes: Optional size limit of every output file. Image outputs and
+            secure PDFs are fitted to it; a vector PDF over the limit fails.
+    """
+    params: WatermarkParams
+    output_dir: str
+    secure: bool = False
+    dpi: int = 450
+    image_format: str = "JPG"
+    pdf_format: str = "PDF"
+    encoder_profile: str = DEFAULT_ENCODER_PROFILE
+    max_bytes: int | None = None
+
+
+@dataclass
+class FileResult:
+    """Outcome of watermarking a single input file."""
+    source: str
+    outputs: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+    input_bytes: int = 0
+    error: str | None = None
+    metrics: dict | None = None  # metrics.snapshot() of a worker process, if collected
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchSummary:
+    """Aggregate throughput and latency figures for a batch run."""
+    results: list[FileResult]
+    wall_seconds: float
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def files_per_second(self) -> float:
+        return self.succeeded / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        if self.wall_seconds <= 0:
+            return 0.0
+        total = sum(r.input_bytes for r in self.results if r.ok)
+        return total / (1024 * 1024) / self.wall_seconds
+
+    def latency_percentile(self, pct: float) -> float:
+        """Return the per-file latency (seconds) at the given percentile."""
+        latencies = sorted(r.seconds for r in self.results if r.ok)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, max(0, round(pct / 100 * len(latencies)) - 1))
+        return latencies[index]
+
+    def format_report(self) -> str:
+        """Render a human-readable summary block."""
+        lines = [
+            f"Files: {len(self.results)} ({self.succeeded} ok, {self.failed} failed)",
+            f"Wall time: {self.wall_seconds:.2f}s",
+            f"Throughput: {self.files_per_second:.2f} files/s, "
+            f"{self.megabytes_per_second:.2f} MB/s",
+            f"Latency: p50={self.latency_percentile(50) * 1000:.0f}ms "
+            f"p95={self.latency_percentile(95) * 1000:.0f}ms "
+            f"max={self.latency_percentile(100) * 1000:.0f}ms",
+        ]
+        for r in self.results:
+            if not r.ok:
+                lines.append(f"FAILED {os.path.basename(r.source)}: {r.error}")
+        return "\n".join(lines)
+
+
+def expand_inputs(patterns: list[str], manifest: str | None = None) -> list[str]:
+    """Expand glob patterns and manifest entries into a sorted, de-duplicated list.
+
+    The manifest is a text file with one path or glob per line; blank lines
+    and lines starting with '#' are ignored. Relative entries are resolved
+    against the manifest's directory.
+    """
+    entries = list(patterns)
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                entries.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+
+    files: set[str] = set()
+    for entry in entries:
+        matches = glob.glob(os.path.expanduser(entry), recursive=True)
+        files.update(m for m in matches if os.path.isfile(m))
+    return sorted(files)
+
+
+def output_stems(sources: list[str]) -> list[str]:
+    """Return the output stem of each source, relative to the output directory.
+
+    Sources keep their directory relative to the deepest directory holding
+    them all, so same-named files from different folders do not overwrite
+    each other. Sources that would still share a stem (e.g. photo.jpg and
+    photo.png) get their extension appended (photo_jpg, photo_png), then a
+    counter if that is not enough.
+    """
+    if not sources:
+        return []
+    dirs = [os.path.dirname(os.path.abspath(source)) for source in sources]
+    try:
+        root = os.path.commonpath(dirs)
+    except ValueError:  # Different drives: keep the names flat.
+        root = None
+    stems = []
+    for source, directory in zip(sources, dirs):
+        stem = os.path.splitext(os.path.basename(source))[0]
+        if root is not None:
+            stem = os.path.normpath(os.path.join(os.path.relpath(directory, root), stem))
+        stems.append(stem)
+
+    # Compared case-insensitively, for case-insensitive file systems.
+    counts = Counter(stem.lower() for stem in stems)
+    for i, source in enumerate(sources):
+        if counts[stems[i].lower()] > 1:
+            stems[i] += "_" + os.path.splitext(source)[1].lstrip(".").lower()
+    seen: set[str] = set()
+    for i, stem in enumerate(stems):
+        unique, n = stem, 2
+        while unique.lower() in seen:
+            unique, n = f"{stem}_{n}", n + 1
+        seen.add(unique.lower())
+        stems[i] = unique
+    return stems
+
+
+def _output_path(options: BatchOptions, stem: str, ext: str) -> str:
+    path = os.path.join(options.output_dir, f"{stem}_{EXPORT_FILENAME_PREFIX}.{ext}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def _process_image(source: str, options: BatchOptions, stem: str) -> list[str]:
+    with profiling.profile_operation("image_export", source):
+        return _export_image(source, options, stem)
+
+
+def _watermark_image(data, options: BatchOptions) -> tuple[str, bytes, tuple[int, int]]:
+    """Watermark an image buffer; return (output extension, output bytes, original size)."""
+    fmt = options.image_format.upper()
+    # PDF output embeds a JPEG of the watermarked image.
+    img_fmt = "JPEG" if fmt == "PDF" else normalize_image_format(fmt)
+    max_bytes = options.max_bytes
+    if fmt == "PDF" and max_bytes is not None:
+        max_bytes = pdf_image_budget(max_bytes)
+    info = probe_image(data)
+    watermarked = apply_watermark(data, options.params, output_format=img_fmt,
+                                  profile=options.encoder_profile, max_bytes=max_bytes)
+    ext = "pdf" if fmt == "PDF" else IMAGE_FORMAT_EXTENSIONS[img_fmt]
+    return ext, watermarked, (info.width, info.height)
+
+
+def _export_image(source: str, options: BatchOptions, stem: str) -> list[str]:
+    with MappedFile(source) as mapped:
+        ext, watermarked, size = _watermark_image(mapped.buffer, options)
+    output_path = _output_path(options, stem, ext)
+    if ext == "pdf":
+        # Keep the original page size if the image was downscaled to fit.
+        save_image_as_pdf(watermarked, output_path, page_size=size)
+    else:
+        with metrics.timer("save"), open(output_path, "wb") as f:
+            f.write(watermarked)
+        metrics.count("bytes_written", len(watermarked))
+    return [output_path]
+
+
+def _watermark_pdf(doc, options: BatchOptions, source: str):
+    """Watermark a loaded PDF per options; return the output document (doc itself in vector mode)."""
+    check_pdf_page_limit(doc, secure=options.secure, dpi=options.dpi)
+    if options.secure:
+        with profiling.profile_operation("secure_apply", source):
+            return apply_secure_raster_watermark_to_pdf(
+                doc, options.params, dpi=options.dpi, profile=options.encoder_profile,
+                max_bytes=options.max_bytes if options.pdf_format.upper() == "PDF" else None,
+            )
+    with profiling.profile_operation("vector_apply", source):
+        apply_vector_watermark_to_pdf(doc, options.params)
+    return doc
+
+
+def _check_pdf_size(size: int, options: BatchOptions) -> None:
+    # Only reachable in vector mode, whose output size cannot be reduced.
+    if options.max_bytes is not None and size > options.max_bytes:
+        raise ValueError(
+            f"Watermarked PDF exceeds {options.max_bytes} bytes; use secure mode to fit it."
+        )
+
+
+def _process_pdf(source: str, options: BatchOptions, stem: str) -> list[str]:
+    doc, num_pages = load_pdf(source)
+    out_doc = doc
+    try:
+        out_doc = _watermark_pdf(doc, options, source)
+        fmt = options.pdf_format.upper()
+        if fmt == "PDF":
+            output_path = _output_path(options, stem, "pdf")
+            with profiling.profile_operation("save", source):
+                save_watermarked_pdf(out_doc, output_path)
+            try:
+                _check_pdf_size(os.path.getsize(output_path), options)
+            except ValueError:
+                os.remove(output_path)
+                raise
+            return [output_path]
+
+        img_fmt = normalize_image_format(fmt)
+        ext = IMAGE_FORMAT_EXTENSIONS[img_fmt]
+        output_dir = os.path.join(options.output_dir, os.path.dirname(stem))
+        base_name = os.path.basename(stem)
+        with profiling.profile_operation("image_export", source):
+            save_pdf_as_images(out_doc, output_dir, base_name, img_format=img_fmt,
+                               profile=options.encoder_profile, max_bytes=options.max_bytes)
+        return [
+            os.path.join(output_dir, f"{base_name}_page_{i+1:03d}.{ext}")
+            for i in range(num_pages)
+        ]
+    finally:
+        if out_doc is not doc:
+            out_doc.close()
+        doc.close()
+
+
+def watermark_bytes(data: bytes | memoryview, options: BatchOptions,
+                    name: str = "document") -> list[tuple[str, bytes]]:
+    """In-memory counterpart of process_file: nothing is read from or written to disk.
+
+    The input type is detected from the data itself; options.output_dir is
+    ignored. Raises on failure, with the same exceptions as the file-based
+    pipeline (e.g. pdf_processing.ProtectedPdfError, InvalidPdfError).
+
+    Returns:
+        (file name, contents) of each output, named as process_file would
+        name the files for an input called name.
+    """
+    validate_data_size(len(data))
+    file_type = detect_buffer_type(data)
+    if file_type == "image":
+        ext, watermarked, size = _watermark_image(data, options)
+        if ext == "pdf":
+            watermarked = image_to_pdf_bytes(watermarked, page_size=size)
+        return [(f"{name}_{EXPORT_FILENAME_PREFIX}.{ext}", watermarked)]
+    if file_type != "pdf":
+        raise ValueError("Unsupported file format.")
+
+    doc, _ = load_pdf(data)
+    out_doc = doc
+    try:
+        out_doc = _watermark_pdf(doc, options, name)
+        fmt = options.pdf_format.upper()
+        if fmt == "PDF":
+            with profiling.profile_operation("save", name):
+                pdf = watermarked_pdf_bytes(out_doc)
+            _check_pdf_size(len(pdf), options)
+            return [(f"{name}_{EXPORT_FILENAME_PREFIX}.pdf", pdf)]
+
+        img_fmt = normalize_image_format(fmt)
+        ext = IMAGE_FORMAT_EXTENSIONS[img_fmt]
+        with profiling.profile_operation("image_export", name):
+            pages = iter_pdf_as_images(out_doc, img_format=img_fmt, profile=options.encoder_profile,
+                                       max_bytes=options.max_bytes)
+            return [(f"{name}_page_{i+1:03d}.{ext}", page) for i, page in enumerate(pages)]
+    finally:
+        if out_doc is not doc:
+            out_doc.close()
+        doc.close()
+
+
+def process_file(source: str, options: BatchOptions, stem: str | None = None) -> FileResult:
+    """Watermark one file and report the outcome. Never raises.
+
+    Outputs are named after stem (see output_stems), by default the source's
+    file name without extension.
+
+    Runs in a worker process when the batch uses more than one job, so
+    it only takes picklable arguments and returns a picklable result.
+    """
+    result = FileResult(source=source)
+    start = time.perf_counter()
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(source))[0]
+    try:
+        validate_file_size(source)
+        result.input_bytes = os.path.getsize(source)
+        file_type = detect_file_type(source)
+        if file_type == "image":
+            result.outputs = _process_image(source, options, stem)
+        elif file_type == "pdf":
+            result.outputs = _process_pdf(source, options, stem)
+        else:
+            raise ValueError("Unsupported file format.")
+    except Exception as ex:
+        result.error = str(ex) or type(ex).__name__
+    result.seconds = time.perf_counter() - start
+    metrics.count("files" if result.ok else "files_failed")
+    return result
+
+
+def _init_worker(collect_metrics: bool, profile: bool) -> None:
+    if collect_metrics:
+        metrics.enable()
+    if profile:
+        profiling.enable()
+
+
+def _process_file_in_worker(source: str, options: BatchOptions, stem: str) -> FileResult:
+    """process_file for a pool worker: its metrics travel back with the result."""
+    if not metrics.is_enabled():
+        return process_file(source, options, stem)
+    metrics.REGISTRY.reset()
+    result = process_file(source, options, stem)
+    result.metrics = metrics.REGISTRY.snapshot()
+    return result
+
+
+def run_batch(sources: list[str], options: BatchOptions, jobs: int = 1) -> BatchSummary:
+    """Watermark every source file, optionally across a process pool.
+
+    Args:
+        sources: Input file paths.
+        options: Settings shared by every file.
+        jobs: Number of worker processes. 1 processes files inline. Metrics
+            collected by the workers are merged into this process's registry.
+
+    Outputs mirror the sources' folders under options.output_dir, and
+    sources with the same name are disambiguated (see output_stems), so no
+    output overwrites another.
+
+    Returns:
+        BatchSummary with one FileResult per source, in input order.
+    """
+    os.makedirs(options.output_dir, exist_ok=True)
+    stems = output_stems(sources)
+    start = time.perf_counter()
+    if jobs <= 1 or len(sources) <= 1:
+        results = [process_file(s, options, stem) for s, stem in zip(sources, stems)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(metrics.is_enabled(), profiling.is_enabled())) as pool:
+            results = list(pool.map(_process_file_in_worker, sources, [options] * len(sources), stems))
+        for result in results:
+            if result.metrics is not None:
+                metrics.REGISTRY.merge(result.metrics)
+    return BatchSummary(results=results, wall_seconds=time.perf_counter() - start)
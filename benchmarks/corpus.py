@@ -0,0 +1,291 @@
+"""Deterministic synthetic input corpus for benchmarks and load tests.
+
+generate_corpus() writes representative inputs, fully determined by a seed:
+
+- scan_<dpi>dpi.pdf: photocopied A4 pages embedded as grayscale JPEG scans
+- contract.pdf: text-heavy vector contract
+- mixed.pdf: text, photo, chart and scanned pages in rotation
+- oversized.pdf: an A0 plan with vector line work (banded in secure mode)
+- photo_<w>x<h>.jpg / .png: continuous-tone photos, 4K up to 20K pixels wide
+
+Nothing is downloaded. The same seed and scale give byte-identical files
+(PDFs are written without a random /ID), so runs are comparable across
+machines. Files are cached under <tmp>/filigrane-corpus/<version>-<scale>-<seed>
+and reused as long as the manifest lists them all.
+
+Usage:
+    python benchmarks/corpus.py [--scale small|medium|large] [--seed 0] [--dir PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter, ImageFont  # noqa: E402
+
+CORPUS_VERSION = 1  # Bump when generated content changes, so stale caches are not reused.
+A4 = (595, 842)
+A0 = (2384, 3370)
+_NOISE_TILE = 256
+_WORDS = (
+    "the parties agree that this agreement shall be governed by applicable law and any dispute "
+    "arising under it passport number issued date of birth holder signature authority valid until "
+    "article section clause schedule annex tenant landlord payment deposit notice term renewal"
+).split()
+
+
+@dataclass(frozen=True)
+class CorpusScale:
+    """How much of each kind of input to generate."""
+    scan_dpis: tuple[int, ...]
+    scan_pages: int
+    contract_pages: int
+    mixed_pages: int
+    oversized_pages: int
+    image_sizes: tuple[tuple[int, int], ...]  # each written as JPEG and PNG
+
+
+SCALES = {
+    "small": CorpusScale((150, 300), 2, 10, 4, 1, ((3840, 2160),)),
+    "medium": CorpusScale((150, 300, 600), 4, 50, 12, 2, ((3840, 2160), (7680, 4320))),
+    "large": CorpusScale(
+        (150, 300, 600), 20, 300, 60, 4, ((3840, 2160), (7680, 4320), (12000, 8000), (20000, 10000)),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class CorpusItem:
+    """One generated input file."""
+    name: str
+    kind: str  # "scan", "text", "mixed", "oversized" or "image"
+    path: str
+    pages: int = 1
+    width: int = 0  # pixels (images) or points (PDF pages)
+    height: int = 0
+
+
+# --- Building blocks (all driven by an explicit random.Random) ---
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _noise(rng: random.Random, size: tuple[int, int], mode: str = "L") -> Image.Image:
+    """Seeded grain: one random tile repeated over size (Pillow's effect_noise is unseeded)."""
+    bands = len(mode)
+    tile = Image.frombytes(mode, (_NOISE_TILE, _NOISE_TILE), rng.randbytes(_NOISE_TILE * _NOISE_TILE * bands))
+    noise = Image.new(mode, size)
+    for y in range(0, size[1], _NOISE_TILE):
+        for x in range(0, size[0], _NOISE_TILE):
+            noise.paste(tile, (x, y))
+    return noise
+
+
+def photo(rng: random.Random, width: int, height: int) -> Image.Image:
+    """Continuous-tone photo: soft colour shapes, drawn small and upscaled, plus grain."""
+    small = (max(1, width // 8), max(1, height // 8))
+    img = Image.new("RGB", small, tuple(rng.randrange(40, 200) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(24):
+        x, y = rng.randrange(small[0]), rng.randrange(small[1])
+        w, h = rng.randrange(small[0] // 8 + 1, small[0] // 2 + 2), rng.randrange(small[1] // 8 + 1, small[1] // 2 + 2)
+        draw.ellipse((x - w, y - h, x + w, y + h), fill=tuple(rng.randrange(256) for _ in range(3)))
+    img = img.filter(ImageFilter.GaussianBlur(max(1, small[0] // 30)))
+    img = img.resize((width, height), Image.Resampling.BICUBIC)
+    return Image.blend(img, _noise(rng, (width, height), "RGB"), 0.08)
+
+
+def scan_page(rng: random.Random, dpi: int) -> Image.Image:
+    """A photocopied A4 text page at dpi: off-white paper, dark text, grain and blur."""
+    scale = dpi / 72
+    size = (round(A4[0] * scale), round(A4[1] * scale))
+    img = Image.new("L", size, rng.randrange(225, 245))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=max(8, round(10 * scale)))
+    margin, line = round(56 * scale), round(15 * scale)
+    for y in range(margin, size[1] - margin, line):
+        draw.text((margin, y), _sentence(rng, rng.randrange(6, 12)), font=font, fill=rng.randrange(20, 60))
+    img = img.filter(ImageFilter.GaussianBlur(scale / 4))
+    return Image.blend(img, _noise(rng, size), 0.1)
+
+
+def _encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _pdf_bytes(doc: fitz.Document) -> bytes:
+    return doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def _text_page(doc: fitz.Document, rng: random.Random, title: str) -> fitz.Page:
+    page = doc.new_page(width=A4[0], height=A4[1])
+    page.insert_text((56, 60), title, fontsize=16)
+    for i in range(46):
+        page.insert_text((56, 90 + i * 15), _sentence(rng, rng.randrange(8, 13)), fontsize=9)
+    return page
+
+
+def _chart_page(doc: fitz.Document, rng: random.Random) -> None:
+    page = doc.new_page(width=A4[0], height=A4[1])
+    page.insert_text((60, 100), "Quarterly figures", fontsize=24)
+    for i in range(16):
+        height = rng.randrange(40, 340)
+        color = tuple(rng.random() for _ in range(3))
+        page.draw_rect(fitz.Rect(60 + i * 30, 700 - height, 80 + i * 30, 700), color=None, fill=color)
+    page.draw_line((50, 700), (560, 700), width=1.5)
+
+
+def _scan_into(doc: fitz.Document, rng: random.Random, dpi: int) -> None:
+    page = doc.new_page(width=A4[0], height=A4[1])
+    page.insert_image(page.rect, stream=_encode(scan_page(rng, dpi), "JPEG", quality=75))
+
+
+def build_scan_pdf(rng: random.Random, dpi: int, pages: int) -> bytes:
+    doc = fitz.open()
+    for _ in range(pages):
+        _scan_into(doc, rng, dpi)
+    return _pdf_bytes(doc)
+
+
+def build_contract_pdf(rng: random.Random, pages: int) -> bytes:
+    doc = fitz.open()
+    for n in range(pages):
+        _text_page(doc, rng, f"Article {n + 1}")
+    return _pdf_bytes(doc)
+
+
+def build_mixed_pdf(rng: random.Random, pages: int) -> bytes:
+    """Pages rotate through text, text with a photo, a vector chart and a 200 DPI scan."""
+    doc = fitz.open()
+    for n in range(pages):
+        kind = n % 4
+        if kind == 0:
+            _text_page(doc, rng, f"Section {n + 1}")
+        elif kind == 1:
+            page = _text_page(doc, rng, "Identity document")
+            page.insert_image(fitz.Rect(56, 420, 540, 762), stream=_encode(photo(rng, 1240, 877), "JPEG", quality=85))
+        elif kind == 2:
+            _chart_page(doc, rng)
+        else:
+            _scan_into(doc, rng, 200)
+    return _pdf_bytes(doc)
+
+
+def build_oversized_pdf(rng: random.Random, pages: int) -> bytes:
+    """A0 plans: a dense grid of vector lines and labels."""
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page(width=A0[0], height=A0[1])
+        for x in range(40, A0[0] - 40, 60):
+            page.draw_line((x, 40), (x + rng.randrange(-30, 30), A0[1] - 40), width=0.5)
+        for y in range(40, A0[1] - 40, 60):
+            page.draw_line((40, y), (A0[0] - 40, y + rng.randrange(-30, 30)), width=0.5)
+        for _ in range(200):
+            page.insert_text((rng.randrange(60, A0[0] - 200), rng.randrange(60, A0[1] - 20)),
+                             f"Room {rng.randrange(1, 999)}", fontsize=12)
+        page.insert_text((80, A0[1] - 80), f"Floor plan, sheet {n + 1}", fontsize=48)
+    return _pdf_bytes(doc)
+
+
+# --- Corpus on disk ---
+
+def default_corpus_dir(scale: str, seed: int) -> str:
+    return os.path.join(tempfile.gettempdir(), "filigrane-corpus", f"v{CORPUS_VERSION}-{scale}-{seed}")
+
+
+def _items(scale: CorpusScale, directory: str) -> list[tuple[CorpusItem, object]]:
+    """(item, builder(rng) -> bytes) pairs, in generation order."""
+    def pdf(name, kind, pages, size, build):
+        return CorpusItem(name, kind, os.path.join(directory, name), pages, *size), build
+
+    items = [
+        pdf(f"scan_{dpi}dpi.pdf", "scan", scale.scan_pages, A4,
+            lambda rng, dpi=dpi: build_scan_pdf(rng, dpi, scale.scan_pages))
+        for dpi in scale.scan_dpis
+    ]
+    items.append(pdf("contract.pdf", "text", scale.contract_pages, A4,
+                     lambda rng: build_contract_pdf(rng, scale.contract_pages)))
+    items.append(pdf("mixed.pdf", "mixed", scale.mixed_pages, A4,
+                     lambda rng: build_mixed_pdf(rng, scale.mixed_pages)))
+    items.append(pdf("oversized.pdf", "oversized", scale.oversized_pages, A0,
+                     lambda rng: build_oversized_pdf(rng, scale.oversized_pages)))
+    for width, height in scale.image_sizes:
+        for fmt, ext in (("JPEG", "jpg"), ("PNG", "png")):
+            name = f"photo_{width}x{height}.{ext}"
+            items.append((
+                CorpusItem(name, "image", os.path.join(directory, name), 1, width, height),
+                lambda rng, w=width, h=height, f=fmt: _encode(photo(rng, w, h), f, **({"quality": 90} if f == "JPEG" else {})),
+            ))
+    return items
+
+
+def generate_corpus(
+    scale: str | CorpusScale = "small", seed: int = 0, directory: str | None = None
+) -> list[CorpusItem]:
+    """Generate (or reuse) the corpus and return its items.
+
+    Each file is built from its own random.Random(f"{seed}:{name}"), so files
+    do not depend on each other and a custom scale reproduces the files it
+    shares with a standard one.
+
+    Args:
+        scale: Name in SCALES, or a CorpusScale.
+        seed: Seed of every random choice.
+        directory: Cache directory; defaults to default_corpus_dir(). Files are
+            reused when the manifest written after a complete run lists them.
+    """
+    scale_name = scale if isinstance(scale, str) else "custom"
+    spec = SCALES[scale] if isinstance(scale, str) else scale
+    directory = directory or default_corpus_dir(scale_name, seed)
+    manifest_path = os.path.join(directory, "manifest.json")
+    items = _items(spec, directory)
+
+    expected = {"version": CORPUS_VERSION, "seed": seed, "scale": asdict(spec)}
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if {k: manifest.get(k) for k in expected} == json.loads(json.dumps(expected)) and \
+                all(os.path.exists(item.path) for item, _ in items):
+            return [item for item, _ in items]
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    for item, build in items:
+        data = build(random.Random(f"{seed}:{item.name}"))
+        tmp_path = item.path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, item.path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({**expected, "items": [asdict(item) for item, _ in items]}, f, indent=2)
+    return [item for item, _ in items]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", help="Output directory (default: a cache under the temp directory).")
+    args = parser.parse_args()
+
+    for item in generate_corpus(args.scale, args.seed, args.dir):
+        size = os.path.getsize(item.path)
+        print(f"{item.kind:<10}{item.pages:>5} p {size / 1024 / 1024:>9.1f} MB  {item.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Encode time and output size for every encoder profile and image format.
+
+Each sample (a watermarked photo and a watermarked document page rendered at
+150 DPI) is encoded with every profile in encoding.ENCODER_PROFILES and every
+format supported by the installed Pillow; the best of --repeat runs is shown.
+
+Usage:
+    python benchmarks/encoder_profiles.py [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from encoding import ENCODER_PROFILES, encode_pil_image, supported_image_formats  # noqa: E402
+from watermark import WatermarkParams, apply_watermark_to_pil_image  # noqa: E402
+
+PARAMS = WatermarkParams(text="COPY - BENCHMARK", opacity=30, font_size=36, spacing=150, color="Gray")
+
+
+def _photo() -> Image.Image:
+    """Continuous-tone stand-in for a passport photo (2000 x 1400)."""
+    width, height = 2000, 1400
+    img = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = (i * 157) % width, (i * 97) % height
+        draw.ellipse((x, y, x + width // 3, y + height // 4), fill=(40 + i * 15, 120, 200 - i * 10))
+    img = img.filter(ImageFilter.GaussianBlur(width // 40))
+    return Image.blend(img, Image.effect_noise((width, height), 18).convert("RGB"), 0.15)
+
+
+def _document() -> Image.Image:
+    """An A4 text page rendered at 150 DPI."""
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(48):
+        page.insert_text((56, 60 + i * 15), f"Article {i}. The parties agree to the terms set out below.", fontsize=10)
+    pix = page.get_pixmap(dpi=150, alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def _best_of(repeat: int, func) -> tuple[float, bytes]:
+    best, result = float("inf"), b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = {"photo": _photo(), "document": _document()}
+    header = f"{'sample':<10}{'format':<7}" + "".join(f"{name:>22}" for name in ENCODER_PROFILES)
+    print(header)
+    print(f"{'':<17}" + "".join(f"{'ms':>10}{'KB':>12}" for _ in ENCODER_PROFILES))
+    print("-" * len(header))
+    for sample_name, source in samples.items():
+        img = apply_watermark_to_pil_image(source.convert("RGBA"), PARAMS).convert("RGB")
+        for fmt in supported_image_formats():
+            cells = []
+            for profile in ENCODER_PROFILES:
+                seconds, data = _best_of(args.repeat, lambda: encode_pil_image(img, fmt, profile))
+                cells.append(f"{seconds * 1000:>10.0f}{len(data) / 1024:>12.0f}")
+            print(f"{sample_name:<10}{fmt:<7}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Preview latency under replayed slider drags.
+
+Drives PassportFiligraneApp headless (ft.Page is a MagicMock, as in
+tests/conftest.py) and replays slider event streams against it at their
+recorded timing: each event sets a control value and calls its on_change
+handler, as Flet does. An image counts as displayed when the render thread
+calls page.update() after producing new preview bytes, so the measured path
+is the debounce Timer, apply_watermark or the PDF composite, base64 and
+page.update; the Flet transport to the client is not included.
+
+Reported per input and stream:
+- p50/p95/p99/max latency: from each event to the first displayed image
+  rendered from control values that include it
+- renders: preview renders run; debounced: events whose own render was
+  cancelled by a later event (events - renders)
+- wasted: renders that were already stale when displayed, because a newer
+  event arrived while they were running
+
+Streams are JSON files, {"events": [{"t": seconds, "control": name, "value": v}]}
+with control one of opacity, font_size, spacing, text; the ones in
+benchmarks/streams/ are replayed by default. Inputs default to a 4K photo and
+a 4-page mixed PDF from the benchmark corpus.
+
+Usage:
+    python benchmarks/preview_latency.py [--input FILE ...] [--stream PATH ...] [--debounce 0.5] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+import flet as ft  # noqa: E402
+
+import app as app_module  # noqa: E402
+from benchmarks import corpus  # noqa: E402
+
+STREAM_DIR = os.path.join(BENCHMARKS_DIR, "streams")
+CONTROLS = {
+    "opacity": "opacity_slider",
+    "font_size": "font_size_slider",
+    "spacing": "spacing_slider",
+    "text": "watermark_text",
+}
+
+
+def load_stream(path: str) -> list[dict]:
+    """Return the events of a stream file, validated and sorted by time."""
+    with open(path, encoding="utf-8") as f:
+        events = json.load(f)["events"]
+    for event in events:
+        if event["control"] not in CONTROLS:
+            raise ValueError(f"{path}: unknown control {event['control']!r}")
+    return sorted(events, key=lambda event: event["t"])
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def make_app() -> app_module.PassportFiligraneApp:
+    page = MagicMock(spec=ft.Page)
+    page.overlay = []
+    page.controls = []
+    return app_module.PassportFiligraneApp(page)
+
+
+def open_input(app: app_module.PassportFiligraneApp, path: str) -> None:
+    """Load a file the way the file picker does and wait for its first preview."""
+    event = MagicMock()
+    event.files = [MagicMock(path=path)]
+    app.on_file_result(event)
+    if app.current_file_type is None:
+        raise ValueError(f"Could not open {path}")
+    app.update_timer.join()
+
+
+class _Probe:
+    """Timestamps events, renders and displayed previews of one replay.
+
+    Renders are detected through _get_watermark_params, which each preview
+    render calls once (under _preview_lock) before rendering. The lock here
+    makes "which events does this render include" exact: a control value and
+    its event index are published together.
+    """
+
+    def __init__(self, app):
+        self.lock = threading.Lock()
+        self.event_times: list[float] = []
+        self.renders = 0
+        self.displays: list[tuple[float, int, int]] = []  # (time, last included event, last event)
+        self._local = threading.local()
+
+        get_params = app._get_watermark_params
+        page_update = app.page.update
+
+        def tracked_params():
+            with self.lock:
+                params = get_params()
+                if isinstance(threading.current_thread(), threading.Timer):
+                    self.renders += 1
+                    self._local.included = len(self.event_times) - 1
+                    self._local.previous = app.watermarked_image_bytes
+            return params
+
+        def tracked_update(*args, **kwargs):
+            included = getattr(self._local, "included", None)
+            # A failed render leaves the bytes in place and reports through page.update too.
+            if included is not None and app.watermarked_image_bytes is not self._local.previous:
+                now = time.perf_counter()
+                self._local.included = None
+                with self.lock:
+                    self.displays.append((now, included, len(self.event_times) - 1))
+            return page_update(*args, **kwargs)
+
+        app._get_watermark_params = tracked_params
+        app.page.update = tracked_update
+
+    def apply(self, app, event: dict) -> None:
+        control = getattr(app, CONTROLS[event["control"]])
+        with self.lock:
+            control.value = event["value"]
+            self.event_times.append(time.perf_counter())
+        control.on_change(None)
+
+    def summary(self) -> dict:
+        latencies = []
+        for index, sent in enumerate(self.event_times):
+            shown = next((t for t, included, _ in self.displays if included >= index), None)
+            if shown is not None:
+                latencies.append(shown - sent)
+        result = {
+            "events": len(self.event_times),
+            "renders": self.renders,
+            "displays": len(self.displays),
+            "debounced": len(self.event_times) - self.renders,
+            "wasted": sum(1 for _, included, latest in self.displays if latest > included),
+            "never_shown": len(self.event_times) - len(latencies),
+        }
+        if latencies:
+            for q in (50, 95, 99):
+                result[f"p{q}_ms"] = percentile(latencies, q) * 1000
+            result["max_ms"] = max(latencies) * 1000
+        return result
+
+
+def replay(app: app_module.PassportFiligraneApp, events: list[dict], speed: float = 1.0) -> dict:
+    """Replay events against a loaded app at their recorded timing; return the summary."""
+    probe = _Probe(app)
+    start = time.perf_counter()
+    for event in events:
+        delay = start + event["t"] / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        probe.apply(app, event)
+    if app.update_timer is not None:
+        app.update_timer.join()  # The last event's render waits for any running one.
+    return probe.summary()
+
+
+def measure(path: str, events: list[dict], debounce: float | None = None, speed: float = 1.0) -> dict:
+    """Open path in a fresh headless app and replay one stream against it."""
+    saved = app_module.PREVIEW_DEBOUNCE_SECONDS
+    if debounce is not None:
+        app_module.PREVIEW_DEBOUNCE_SECONDS = debounce
+    app = make_app()
+    try:
+        open_input(app, path)
+        return replay(app, events, speed)
+    finally:
+        app_module.PREVIEW_DEBOUNCE_SECONDS = saved
+        app._stop_thumbnails()
+        if app.pdf_doc is not None:
+            app.pdf_doc.close()
+
+
+def default_inputs(directory: str) -> list[str]:
+    """Write the default inputs (4K photo, 4-page mixed PDF) into directory."""
+    photo_path = os.path.join(directory, "photo_3840x2160.jpg")
+    corpus.photo(random.Random("preview:photo"), 3840, 2160).save(photo_path, format="JPEG", quality=90)
+    pdf_path = os.path.join(directory, "mixed.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(corpus.build_mixed_pdf(random.Random("preview:mixed"), 4))
+    return [photo_path, pdf_path]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", action="append", help="Image or PDF to preview (repeatable).")
+    parser.add_argument("--stream", action="append", help="Stream JSON to replay (repeatable).")
+    parser.add_argument("--debounce", type=float, default=None,
+                        help=f"Override the preview debounce (default {app_module.PREVIEW_DEBOUNCE_SECONDS}s).")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor (2 = twice as fast).")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args(argv)
+
+    streams = args.stream or sorted(glob.glob(os.path.join(STREAM_DIR, "*.json")))
+    with tempfile.TemporaryDirectory(prefix="filigrane-preview-") as tmp:
+        inputs = args.input or default_inputs(tmp)
+        results = {}
+        if not args.json:
+            print(f"{'input / stream':<46}{'events':>7}{'renders':>8}{'wasted':>7}"
+                  f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+            print("-" * 95)
+        for path in inputs:
+            for stream in streams:
+                key = f"{os.path.basename(path)} / {os.path.splitext(os.path.basename(stream))[0]}"
+                result = results[key] = measure(path, load_stream(stream), args.debounce, args.speed)
+                if not args.json:
+                    print(f"{key:<46}{result['events']:>7}{result['renders']:>8}{result['wasted']:>7}"
+                          f"{result.get('p50_ms', 0):>9.0f}{result.get('p95_ms', 0):>9.0f}"
+                          f"{result.get('p99_ms', 0):>9.0f}", flush=True)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
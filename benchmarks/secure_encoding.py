@@ -0,0 +1,160 @@
+"""Compare per-page content-aware encoding with JPEG-only secure output.
+
+For each page of a small synthetic corpus (text contract, colour chart, photo,
+photocopied scan, UI screenshot), the watermarked secure raster is encoded
+with the classifier's choice and with JPEG 95, then reports output bytes,
+encode time and "viewer open" time (reopening the saved PDF and rendering the
+page at screen resolution).
+
+Usage:
+    python benchmarks/secure_encoding.py [--dpi 300]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from encoding import ENCODING_JPEG, encode_image, insert_encoded_image  # noqa: E402
+from pdf_processing import (  # noqa: E402
+    _render_secure_page,
+    _scale_params_for_dpi,
+    apply_watermark_to_pil_image,
+    is_grayscale_page,
+)
+from watermark import WatermarkParams  # noqa: E402
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets")
+PARAMS = WatermarkParams(text="COPY - BENCHMARK", opacity=30, font_size=36, spacing=150, color="Gray")
+VIEW_DPI = 110
+
+
+def _png(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _jpeg(img: Image.Image, quality: int = 80) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def _photo(width: int, height: int) -> Image.Image:
+    """Continuous-tone stand-in for a photo: blurred colour blobs plus sensor noise."""
+    img = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = (i * 97) % width, (i * 61) % height
+        draw.ellipse((x, y, x + width // 3, y + height // 4), fill=(40 + i * 15, 120, 200 - i * 10))
+    img = img.filter(ImageFilter.GaussianBlur(width // 40))
+    noise = Image.effect_noise((width, height), 18).convert("RGB")
+    return Image.blend(img, noise, 0.15)
+
+
+def build_corpus() -> list[tuple[str, fitz.Document]]:
+    """Return (name, single-page document) pairs covering typical inputs."""
+    corpus = []
+
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(48):
+        page.insert_text((56, 60 + i * 15), f"Article {i}. The parties agree to the terms set out below.", fontsize=10)
+    corpus.append(("text contract", doc))
+
+    doc = fitz.open()
+    page = doc.new_page()
+    colors = [(0.85, 0.2, 0.2), (0.2, 0.55, 0.85), (0.3, 0.7, 0.3), (0.95, 0.7, 0.1)]
+    for i in range(16):
+        height = 40 + (i * 37) % 300
+        page.draw_rect(fitz.Rect(60 + i * 30, 700 - height, 80 + i * 30, 700), color=None, fill=colors[i % 4])
+    page.draw_line((50, 700), (560, 700), width=1.5)
+    page.insert_text((60, 100), "Quarterly figures", fontsize=24)
+    corpus.append(("colour chart", doc))
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=_jpeg(_photo(1240, 1754), quality=90))
+    corpus.append(("photo", doc))
+
+    scan = Image.new("L", (1240, 1754), 238)
+    draw = ImageDraw.Draw(scan)
+    for i in range(60):
+        draw.text((120, 100 + i * 26), "Photocopied passport page - line %d" % i, fill=35)
+    scan = Image.blend(scan, Image.effect_noise(scan.size, 25), 0.12)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=_jpeg(scan, quality=75))
+    corpus.append(("photocopy scan", doc))
+
+    screenshot = os.path.join(ASSETS_DIR, "demo_secure.png")
+    if os.path.exists(screenshot):
+        with Image.open(screenshot) as img:
+            stream = _png(img.convert("RGB"))
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=stream)
+        corpus.append(("UI screenshot", doc))
+
+    return corpus
+
+
+def measure(page: fitz.Page, dpi: int, encoding: str | None) -> tuple[str, int, float, float]:
+    """Return (encoding used, PDF bytes, encode ms, view ms) for one page."""
+    img = _render_secure_page(page, dpi, is_grayscale_page(page))
+    watermarked = apply_watermark_to_pil_image(img, _scale_params_for_dpi(PARAMS, dpi))
+
+    start = time.perf_counter()
+    encoded = encode_image(watermarked, encoding)
+    encode_ms = (time.perf_counter() - start) * 1000
+
+    out = fitz.open()
+    out_page = out.new_page(width=page.rect.width, height=page.rect.height)
+    insert_encoded_image(out_page, out_page.rect, encoded)
+    data = out.tobytes()
+
+    start = time.perf_counter()
+    viewer = fitz.open("pdf", data)
+    viewer[0].get_pixmap(dpi=VIEW_DPI)
+    view_ms = (time.perf_counter() - start) * 1000
+    return encoded.encoding, len(data), encode_ms, view_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    header = f"{'page':<16}{'auto':>9}{'KB':>8}{'enc ms':>8}{'view ms':>9}   {'jpeg KB':>8}{'enc ms':>8}{'view ms':>9}"
+    print(f"Secure encoding at {args.dpi} DPI")
+    print(header)
+    print("-" * len(header))
+    totals = [0, 0.0, 0.0, 0, 0.0, 0.0]
+    for name, doc in build_corpus():
+        page = doc[0]
+        auto = measure(page, args.dpi, None)
+        jpeg = measure(page, args.dpi, ENCODING_JPEG)
+        row = [auto[1], auto[2], auto[3], jpeg[1], jpeg[2], jpeg[3]]
+        totals = [a + b for a, b in zip(totals, row)]
+        print(
+            f"{name:<16}{auto[0]:>9}{auto[1] // 1024:>8}{auto[2]:>8.0f}{auto[3]:>9.0f}"
+            f"   {jpeg[1] // 1024:>8}{jpeg[2]:>8.0f}{jpeg[3]:>9.0f}"
+        )
+    print("-" * len(header))
+    print(
+        f"{'total':<16}{'':>9}{totals[0] // 1024:>8}{totals[1]:>8.0f}{totals[2]:>9.0f}"
+        f"   {totals[3] // 1024:>8}{totals[4]:>8.0f}{totals[5]:>9.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Benchmark suite with JSON baselines and a regression gate.
+
+Cases cover apply_watermark across image sizes and spacings, vector mode
+across page counts, secure mode at 300/450/600 DPI, save_pdf_as_images, and
+the PDF preview path (first render and re-composite). Each case runs in its
+own interpreter so its peak RSS is not inflated by earlier cases; inputs are
+built before measuring, then the operation is run once to warm up and
+--repeat times measured. Inputs come from the seeded builders in
+benchmarks/corpus.py, so every run measures the same bytes. Reported: best
+wall time, best CPU time (all threads of the process) and peak RSS growth
+over the post-setup baseline.
+
+--quick runs a reduced set (well under a minute) meant for every commit; the
+default runs the full set. Results are compared against a JSON baseline
+(benchmarks/baselines/<quick|full>.json by default, or --baseline) and the
+exit code is 1 if any case is slower or bigger than the baseline by more
+than --threshold. Baselines are machine-specific: record them with
+--save-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/suite.py --quick [--save-baseline] [--threshold 0.25]
+    python benchmarks/suite.py [--case secure] [--repeat 3] [--baseline path.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+import fitz  # noqa: E402
+
+from benchmarks import corpus  # noqa: E402
+from watermark import WatermarkParams, apply_watermark  # noqa: E402
+
+PARAMS = WatermarkParams(text="COPY - BENCHMARK", opacity=30, font_size=36, spacing=150, color="Gray")
+BASELINE_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+DEFAULT_THRESHOLD = 0.25  # allowed slowdown / growth before a case fails
+# Peak RSS and times below these are noise, and never count as regressions.
+RSS_NOISE_MB = 8.0
+TIME_NOISE_SECONDS = 0.01
+
+QUICK_CASES = [
+    ("apply_watermark", {"size": [1000, 750], "spacing": 150}),
+    ("vector", {"pages": 10}),
+    ("secure", {"dpi": 300, "pages": 2}),
+    ("save_pdf_as_images", {"pages": 4, "format": "JPEG"}),
+    ("preview", {"base": "render"}),
+    ("preview", {"base": "cached"}),
+]
+FULL_CASES = [
+    *[("apply_watermark", {"size": size, "spacing": spacing})
+      for size in ([1000, 750], [2000, 1500], [4000, 3000]) for spacing in (80, 150, 300)],
+    *[("vector", {"pages": pages}) for pages in (10, 50, 200)],
+    *[("secure", {"dpi": dpi, "pages": 4}) for dpi in (300, 450, 600)],
+    ("save_pdf_as_images", {"pages": 10, "format": "JPEG"}),
+    ("save_pdf_as_images", {"pages": 10, "format": "PNG"}),
+    ("preview", {"base": "render"}),
+    ("preview", {"base": "cached"}),
+]
+
+
+# --- Inputs ---
+
+def _photo_jpeg(width: int, height: int) -> bytes:
+    img = corpus.photo(random.Random(f"suite:photo:{width}x{height}"), width, height)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _document(pages: int) -> bytes:
+    """Mixed A4 pages: text, text with a photo, a vector chart and a 200 DPI scan."""
+    return corpus.build_mixed_pdf(random.Random(f"suite:mixed:{pages}"), pages)
+
+
+# --- Cases: setup(params) returns the operation to measure ---
+
+def _setup_apply_watermark(params: dict):
+    data = _photo_jpeg(*params["size"])
+    wm = replace(PARAMS, spacing=params["spacing"])
+    return lambda: apply_watermark(data, wm)
+
+
+def _setup_vector(params: dict):
+    from pdf_processing import apply_vector_watermark_to_pdf
+    data = _document(params["pages"])
+
+    def run():
+        with fitz.open("pdf", data) as doc:  # Vector mode modifies the document.
+            apply_vector_watermark_to_pdf(doc, PARAMS)
+            return doc.tobytes()
+    return run
+
+
+def _setup_secure(params: dict):
+    from pdf_processing import apply_secure_raster_watermark_to_pdf
+    doc = fitz.open("pdf", _document(params["pages"]))
+
+    def run():
+        out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=params["dpi"])
+        out.close()
+    return run
+
+
+def _setup_save_pdf_as_images(params: dict):
+    from pdf_processing import save_pdf_as_images
+    doc = fitz.open("pdf", _document(params["pages"]))
+    output_dir = tempfile.mkdtemp(prefix="filigrane-bench-")
+    return lambda: save_pdf_as_images(doc, output_dir, "page", img_format=params["format"])
+
+
+def _setup_preview(params: dict):
+    from pdf_processing import composite_preview, generate_pdf_preview, render_preview_base
+    doc = fitz.open("pdf", _document(2))
+    if params["base"] == "cached":  # Slider drag: the page raster is reused.
+        base = render_preview_base(doc, 1)
+        return lambda: composite_preview(base, PARAMS)
+    return lambda: generate_pdf_preview(doc, PARAMS, 1)
+
+
+CASES = {
+    "apply_watermark": _setup_apply_watermark,
+    "vector": _setup_vector,
+    "secure": _setup_secure,
+    "save_pdf_as_images": _setup_save_pdf_as_images,
+    "preview": _setup_preview,
+}
+
+
+def case_id(name: str, params: dict) -> str:
+    """Stable identifier of a case, e.g. "secure[dpi=300,pages=2]"."""
+    def fmt(value):
+        return "x".join(map(str, value)) if isinstance(value, list) else str(value)
+    return f"{name}[{','.join(f'{k}={fmt(v)}' for k, v in sorted(params.items()))}]"
+
+
+# --- Measurement ---
+
+def _rss_kb(field: str) -> int | None:
+    """Return VmRSS/VmHWM of this process in KB (Linux), or None."""
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+    except (OSError, StopIteration):
+        return None
+
+
+def _peak_rss_kb() -> int:
+    peak = _rss_kb("VmHWM")
+    if peak is not None:
+        return peak
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def measure_case(name: str, params: dict, repeat: int) -> dict:
+    """Set up one case in this process and return its measurements."""
+    run = CASES[name](params)
+    baseline_kb = _rss_kb("VmRSS") or _peak_rss_kb()
+    run()  # Warm-up: fonts, codecs, allocator pools
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        run()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+    return {
+        "wall_s": min(wall),
+        "cpu_s": min(cpu),
+        "peak_rss_mb": max(0, _peak_rss_kb() - baseline_kb) / 1024,
+    }
+
+
+def run_case_isolated(name: str, params: dict, repeat: int) -> dict:
+    """Run measure_case in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", name, json.dumps(params),
+         "--repeat", str(repeat)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_suite(cases: list[tuple[str, dict]], repeat: int, on_result=None) -> dict[str, dict]:
+    """Measure every case (each in its own process); returns {case_id: measurements}."""
+    results = {}
+    for name, params in cases:
+        results[case_id(name, params)] = run_case_isolated(name, params, repeat)
+        if on_result is not None:
+            on_result(case_id(name, params), results[case_id(name, params)])
+    return results
+
+
+# --- Baselines ---
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Return one message per metric that regressed beyond threshold (fractional).
+
+    Cases missing from the baseline are not compared. Differences smaller
+    than the noise floors (TIME_NOISE_SECONDS, RSS_NOISE_MB) never fail.
+    """
+    regressions = []
+    for cid, measured in results.items():
+        reference = baseline.get(cid)
+        if reference is None:
+            continue
+        for metric, noise in (("wall_s", TIME_NOISE_SECONDS), ("cpu_s", TIME_NOISE_SECONDS),
+                              ("peak_rss_mb", RSS_NOISE_MB)):
+            old, new = reference[metric], measured[metric]
+            if new > old * (1 + threshold) and new - old > noise:
+                growth = f"+{(new / old - 1):.0%}" if old else "new"
+                regressions.append(f"{cid} {metric}: {old:.3f} -> {new:.3f} ({growth})")
+    return regressions
+
+
+def load_baseline(path: str) -> dict[str, dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["cases"]
+
+
+def save_baseline(path: str, results: dict[str, dict], repeat: int) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "repeat": repeat,
+            "cases": results,
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Reduced case set for every commit.")
+    parser.add_argument("--repeat", type=int, default=None, help="Measured runs per case (default 3, quick 2).")
+    parser.add_argument("--case", help="Only run cases whose id contains this text.")
+    parser.add_argument("--baseline", help="Baseline JSON (default benchmarks/baselines/<quick|full>.json).")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed regression as a fraction (0.25 = 25%% slower or bigger).")
+    parser.add_argument("--measure", nargs=2, metavar=("CASE", "PARAMS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    repeat = args.repeat or (2 if args.quick else 3)
+    if args.measure:
+        name, params = args.measure
+        print(json.dumps(measure_case(name, json.loads(params), repeat)))
+        return 0
+
+    cases = QUICK_CASES if args.quick else FULL_CASES
+    if args.case:
+        cases = [c for c in cases if args.case in case_id(*c)]
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, "quick.json" if args.quick else "full.json")
+
+    print(f"{'case':<52}{'wall ms':>10}{'cpu ms':>10}{'peak MB':>10}")
+    print("-" * 82)
+    results = run_suite(cases, repeat, on_result=lambda cid, m: print(
+        f"{cid:<52}{m['wall_s'] * 1000:>10.1f}{m['cpu_s'] * 1000:>10.1f}{m['peak_rss_mb']:>10.1f}", flush=True,
+    ))
+
+    if args.save_baseline:
+        save_baseline(baseline_path, results, repeat)
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; record one with --save-baseline.")
+        return 0
+    regressions = compare(results, load_baseline(baseline_path), args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
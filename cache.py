@@ -0,0 +1,171 @@
+"""Content-addressed, size-bounded on-disk cache of watermarked outputs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+from dataclasses import asdict
+
+import metrics
+from constants import DEFAULT_ENCODER_PROFILE, RESULT_CACHE_ENV_VAR, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_VERSION
+from utils import get_cache_dir
+from watermark import WatermarkParams
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_ENTRY_SUFFIX = ".bin"
+
+
+def is_result_cache_enabled() -> bool:
+    """Return True only when the cache has been switched on via the environment (opt-in)."""
+    value = os.environ.get(RESULT_CACHE_ENV_VAR, "0").strip().lower()
+    return value in ("1", "true", "on", "yes")
+
+
+def hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes | memoryview) -> str:
+    """Return the SHA-256 hex digest of an in-memory document (same value as hash_file)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _normalize_params(params: WatermarkParams) -> dict:
+    """Return params with UI float/int differences removed (30.0 and 30 hash alike)."""
+    normalized = asdict(params)
+    for field_name in ("opacity", "font_size", "spacing"):
+        normalized[field_name] = int(round(float(normalized[field_name])))
+    return normalized
+
+
+def make_cache_key(
+    source_digest: str,
+    params: WatermarkParams,
+    mode: str,
+    output_format: str,
+    dpi: int | None = None,
+    encoder_profile: str = DEFAULT_ENCODER_PROFILE,
+    max_bytes: int | None = None,
+) -> str:
+    """Build the cache key for one (input, settings) combination.
+
+    Args:
+        source_digest: hash_file() or hash_bytes() digest of the input document.
+        params: Watermark parameters.
+        mode: Processing mode ("image", "vector" or "secure").
+        output_format: Output format name (e.g. "PDF", "JPG").
+        dpi: Render resolution; only meaningful in secure mode.
+        encoder_profile: Encoder profile the output was encoded with.
+        max_bytes: Size limit the output was fitted to, if any.
+    """
+    payload = json.dumps(
+        {
+            "version": RESULT_CACHE_VERSION,
+            "source": source_digest,
+            "params": _normalize_params(params),
+            "mode": mode,
+            "format": output_format.upper(),
+            "dpi": dpi if mode == "secure" else None,
+            "encoder": encoder_profile.lower(),
+            "max_bytes": max_bytes,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Least-recently-used cache of output bytes stored as private files.
+
+    Entries live in a 0700 directory as 0600 files named after their key.
+    Reads refresh an entry's modification time, which drives eviction once the
+    total size exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.directory = directory or get_cache_dir()
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached bytes for key, or None on a miss."""
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                metrics.count("cache_misses")
+                return None
+        metrics.count("cache_hits")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store data under key, then evict old entries beyond the size budget."""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._entry_path(key))
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def size_bytes(self) -> int:
+        """Return the total size of all cached entries."""
+        with self._lock:
+            return sum(size for _, size, _ in self._entries())
+
+    def clear(self) -> None:
+        """Delete every cached entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
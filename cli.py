@@ -0,0 +1,166 @@
+"""Headless command-line entry point for Passport Filigrane.
+
+Usage:
+    python -m cli batch "scans/*.jpg" docs/*.pdf -o out/ --text "COPY" --jobs 4
+    python -m cli serve --port 8790 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+import metrics
+import profiling
+from constants import (
+    DEFAULT_ENCODER_PROFILE,
+    PIL_COLOR_MAP,
+    SERVICE_DEFAULT_HOST,
+    SERVICE_DEFAULT_PORT,
+    SERVICE_JOB_TIMEOUT_SECONDS,
+    SERVICE_QUEUE_SIZE,
+)
+from encoding import ENCODER_PROFILES, IMAGE_FORMAT_EXTENSIONS, supported_image_formats
+from watermark import WatermarkParams
+
+ORIENTATION_CHOICES = {
+    "ascending": "Ascending (↗)",
+    "descending": "Descending (↘)",
+}
+
+
+def _add_watermark_arguments(parser: argparse.ArgumentParser) -> None:
+    """Register the WatermarkParams fields as command-line options."""
+    group = parser.add_argument_group("watermark")
+    group.add_argument("--text", default="COPY", help="Watermark text (max 200 characters).")
+    group.add_argument("--opacity", type=int, default=30, help="Opacity in percent (0-100).")
+    group.add_argument("--font-size", type=int, default=36, help="Font size in points.")
+    group.add_argument("--spacing", type=int, default=150, help="Grid spacing in points.")
+    group.add_argument("--color", choices=sorted(PIL_COLOR_MAP), default="White")
+    group.add_argument("--orientation", choices=sorted(ORIENTATION_CHOICES), default="ascending")
+
+
+def _params_from_args(args: argparse.Namespace) -> WatermarkParams:
+    return WatermarkParams(
+        text=args.text,
+        opacity=args.opacity,
+        font_size=args.font_size,
+        spacing=args.spacing,
+        color=args.color,
+        orientation=ORIENTATION_CHOICES[args.orientation],
+    )
+
+
+def _image_format_choices() -> list[str]:
+    """Return the image formats offered on the command line ("JPG" rather than "JPEG")."""
+    return [IMAGE_FORMAT_EXTENSIONS[f].upper() for f in supported_image_formats()]
+
+
+def _byte_size(value: str) -> int:
+    """Parse a size such as "2M", "500K" or "150000" (K = 1000 bytes, M = 1000 K)."""
+    text = value.strip().upper().removesuffix("B")
+    multiplier = {"K": 1000, "M": 1000 * 1000}.get(text[-1:], 1)
+    try:
+        size = float(text[:-1] if multiplier > 1 else text) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}") from None
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}")
+    return int(size)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the batch and serve subcommands."""
+    parser = argparse.ArgumentParser(prog="filigrane", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Watermark many files without the GUI.")
+    batch.add_argument("inputs", nargs="*", help="Input files or glob patterns.")
+    batch.add_argument("--manifest", help="Text file listing one input path or glob per line.")
+    batch.add_argument("-o", "--output-dir", required=True, help="Directory for watermarked files.")
+    batch.add_argument("--jobs", type=int, default=1, help="Number of worker processes.")
+    batch.add_argument("--secure", action="store_true", help="Use secure raster mode for PDFs.")
+    batch.add_argument("--dpi", type=int, choices=(300, 450, 600), default=450)
+    batch.add_argument("--image-format", choices=(*_image_format_choices(), "PDF"), default="JPG",
+                       type=str.upper, help="Output format for image inputs.")
+    batch.add_argument("--pdf-format", choices=("PDF", *_image_format_choices()), default="PDF",
+                       type=str.upper, help="Output format for PDF inputs.")
+    batch.add_argument("--encoder-profile", choices=sorted(ENCODER_PROFILES),
+                       default=DEFAULT_ENCODER_PROFILE, type=str.lower,
+                       help="Encoder speed/size trade-off.")
+    batch.add_argument("--max-size", type=_byte_size, metavar="SIZE",
+                       help="Fit every output file under SIZE (e.g. 2M, 500K) by lowering "
+                            "quality and, if needed, resolution.")
+    batch.add_argument("--metrics-out", metavar="PATH",
+                       help="Collect stage timings and counters and write them to PATH "
+                            "(Prometheus text if PATH ends in .prom, JSON otherwise).")
+    batch.add_argument("--profile", action="store_true",
+                       help="Write a cProfile/tracemalloc dump of every operation "
+                            "to the profiles directory next to the log file.")
+    _add_watermark_arguments(batch)
+    batch.set_defaults(handler=_run_batch_command)
+
+    serve = subparsers.add_parser("serve", help="Run the local HTTP watermarking service.")
+    serve.add_argument("--host", default=SERVICE_DEFAULT_HOST, help="Address to listen on.")
+    serve.add_argument("--port", type=int, default=SERVICE_DEFAULT_PORT)
+    serve.add_argument("--unix-socket", metavar="PATH", help="Listen on a Unix socket instead of TCP.")
+    serve.add_argument("--workers", type=int, default=2, help="Number of warm worker processes.")
+    serve.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE,
+                       help="Jobs waiting for a worker before requests are refused with 503.")
+    serve.add_argument("--timeout", type=float, default=SERVICE_JOB_TIMEOUT_SECONDS,
+                       help="Seconds a job may run before its worker is killed (504).")
+    serve.add_argument("--metrics", action="store_true",
+                       help="Collect stage timings from the workers and expose them at /metrics.")
+    serve.set_defaults(handler=_run_serve_command)
+
+    return parser
+
+
+def _run_batch_command(args: argparse.Namespace) -> int:
+    from batch import BatchOptions, expand_inputs, run_batch
+
+    sources = expand_inputs(args.inputs, args.manifest)
+    if not sources:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+
+    options = BatchOptions(
+        params=_params_from_args(args),
+        output_dir=args.output_dir,
+        secure=args.secure,
+        dpi=args.dpi,
+        image_format=args.image_format,
+        pdf_format=args.pdf_format,
+        encoder_profile=args.encoder_profile,
+        max_bytes=args.max_size,
+    )
+    if args.metrics_out:
+        metrics.enable()
+    if args.profile:
+        profiling.enable()
+    summary = run_batch(sources, options, jobs=max(1, args.jobs))
+    print(summary.format_report())
+    if args.metrics_out:
+        metrics.write_metrics(args.metrics_out)
+    if args.profile:
+        print(f"Profiles written to: {profiling.get_profile_dir()}")
+    return 0 if summary.failed == 0 else 1
+
+
+def _run_serve_command(args: argparse.Namespace) -> int:
+    from service import serve
+
+    if args.metrics:
+        metrics.enable()
+    serve(host=args.host, port=args.port, unix_socket=args.unix_socket, workers=max(1, args.workers),
+          queue_size=max(1, args.queue_size), job_timeout=args.timeout)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,83 @@
 
 # --- Security / input validation limits ---
 MAX_FILE_SIZE_BYTES = 100 * 1024 * 1024  # 100 MB
-MAX_PDF_PAGES = 50
 MAX_IMAGE_DIMENSION = 20000  # pixels per side
 
+# --- PDF page budget ---
+# The PDF page limit is derived from these budgets (see pdf_processing.pdf_page_limit)
+# rather than a fixed page count: pages are processed in a sliding window, so only
+# the output document grows with page count.
+PDF_MEMORY_BUDGET_BYTES = 4 * 1024 * 1024 * 1024  # 4 GB
+PDF_TIME_BUDGET_SECONDS = 900
+PDF_PAGE_WINDOW = 4  # rendered pages in flight at once
+# Cost model (conservative, measured on A4 text and scan pages)
+VECTOR_SECONDS_PER_PAGE = 0.06
+RASTER_SECONDS_PER_MEGAPIXEL = 0.03
+RASTER_WORKING_BYTES_PER_PIXEL = 10  # RGB pixmap + RGB frame + watermarked copy + coverage mask
+RASTER_OUTPUT_BYTES_PER_PIXEL = 0.25  # JPEG stream kept in the output document
+# Secure pages above this many pixels are rendered in horizontal bands, so the
+# working memory of one page is bounded. 48 MP keeps A4/Letter/Legal at 600 DPI whole.
+SECURE_BAND_MAX_PIXELS = 48 * 1000 * 1000
+# A page is treated as a scan when one embedded image covers at least this
+# fraction of it; secure mode then never renders above the scan's resolution.
+SCAN_PAGE_COVERAGE = 0.98
+# Pages whose colour channels differ by at most GRAYSCALE_TOLERANCE (0-255) in a
+# GRAYSCALE_PROBE_DPI render are rasterized, watermarked and encoded as grayscale.
+# The probe is reduced further for large pages to stay under GRAYSCALE_PROBE_MAX_PIXELS.
+GRAYSCALE_PROBE_DPI = 36
+GRAYSCALE_PROBE_MAX_PIXELS = 250 * 1000
+GRAYSCALE_TOLERANCE = 12
+
+# --- Result cache ---
+# Off by default so watermarked outputs never pile up on disk unasked; set
+# PASSPORT_FILIGRANE_RESULT_CACHE=1 to opt in.
+RESULT_CACHE_ENV_VAR = "PASSPORT_FILIGRANE_RESULT_CACHE"
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB, least recently used evicted first
+# Bump when engine output changes so stale entries are never served.
+RESULT_CACHE_VERSION = 2
+
+# --- Metrics ---
+# Set PASSPORT_FILIGRANE_METRICS=1 to collect stage timings and counters (see
+# metrics.py); collection is off by default.
+METRICS_ENV_VAR = "PASSPORT_FILIGRANE_METRICS"
+METRICS_PREFIX = "filigrane"  # Prometheus metric name prefix
+METRICS_APP_FILE_NAME = "metrics.json"  # the app's metrics, written next to the log file on exit
+# Histogram bucket upper bounds in seconds, from one stamp render to a 600 DPI page.
+METRICS_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# --- Profiling ---
+# Set PASSPORT_FILIGRANE_PROFILE=1 (or pass --profile to the CLI) to write a
+# cProfile/tracemalloc dump per operation next to the log file (see profiling.py).
+PROFILE_ENV_VAR = "PASSPORT_FILIGRANE_PROFILE"
+PROFILE_DIR_NAME = "profiles"
+PROFILE_TOP_ALLOCATIONS = 25  # allocation sites listed in each .json report
+
+# --- asyncio API (see async_api.py) ---
+ASYNC_MAX_IN_FLIGHT = 2  # jobs running at once; further awaits wait for a slot
+ASYNC_MEMORY_BUDGET_BYTES = 2 * 1024 * 1024 * 1024  # estimated working memory of running jobs
+ASYNC_PAGES_AHEAD = 2  # pages produced ahead of a slow async-iterator consumer
+
+# --- Local service (see service.py) ---
+SERVICE_DEFAULT_HOST = "127.0.0.1"
+SERVICE_DEFAULT_PORT = 8790
+SERVICE_QUEUE_SIZE = 16  # jobs waiting for a free worker before requests are refused (503)
+SERVICE_JOB_TIMEOUT_SECONDS = 300  # a worker still busy after this is killed and replaced
+SERVICE_RETRY_AFTER_SECONDS = 2  # Retry-After sent with 503 responses
+SERVICE_WORKER_START_SECONDS = 60  # a worker not warmed up after this is killed (and retried)
+SERVICE_RESPAWN_DELAY_SECONDS = 5  # pause between attempts to restart a worker that failed to start
+
+# --- Preview ---
+# Quiet time after the last control change before the preview is re-rendered;
+# benchmarks/preview_latency.py measures its effect on slider drags.
+PREVIEW_DEBOUNCE_SECONDS = 0.5
+
+# --- PDF preview thumbnails ---
+THUMBNAIL_ZOOM = 0.2  # ~119x168 px for an A4 page
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 32 MB, least recently used evicted first
+THUMBNAIL_PREFETCH_RADIUS = 8  # pages rendered ahead/behind the current page
+THUMBNAIL_STRIP_RADIUS = 3  # thumbnails shown either side of the current page
+LOUPE_SIZE_POINTS = 96  # side of the square region inspected by the loupe (1.33 in)
+
 # --- Export filename prefix ---
 EXPORT_FILENAME_PREFIX = "export_filigree"
 
@@ -14,6 +88,43 @@ JPEG_EXPORT_QUALITY = 90
 # Secure raster mode renders pages at high DPI; higher quality preserves
 # watermark fidelity before the intentional rasterization step.
 JPEG_SECURE_QUALITY = 95
+# The "fast" encoder profile: Pillow exposes no cheaper JPEG DCT, so fast
+# JPEG saves work by quantizing harder (fewer coefficients to entropy-code,
+# smaller files to write and embed), with baseline Huffman tables.
+JPEG_FAST_QUALITY = 85
+JPEG_FAST_SECURE_QUALITY = 92
+# The "smallest" encoder profile pairs these with optimized, progressive JPEG.
+JPEG_SMALLEST_QUALITY = 85
+JPEG_SMALLEST_SECURE_QUALITY = 92
+# Secure pages are encoded per content (see encoding.py): JPEG for continuous
+# tone, lossless Flate for text/line art (where it is smaller than JPEG 95), and
+# 1-bit Flate for two-colour pages. A page is text/line art when at most
+# MAX_TONAL_FRACTION of neighbouring pixel pairs in a subsample differ by
+# 1..TONAL_DELTA levels.
+SECURE_ENCODING_SAMPLE_PIXELS = 256 * 1024
+SECURE_ENCODING_TONAL_DELTA = 16
+SECURE_ENCODING_MAX_TONAL_FRACTION = 0.05
+SECURE_FLATE_LEVEL = 6
+# Encoder profile used when none is chosen: "fast", "balanced" or "smallest"
+# (see encoding.ENCODER_PROFILES).
+DEFAULT_ENCODER_PROFILE = "balanced"
+
+# --- Size-budgeted export ---
+# Exports given a byte budget (e.g. a 2 MB portal limit) search the quality
+# between FIT_MIN_QUALITY and the profile's quality, guided by a size model
+# built from trial encodes of a FIT_TRIAL_PIXELS downscale. A fit within
+# FIT_TOLERANCE of the budget ends the search early. If the lowest quality
+# is still too large (or the format is lossless), the image is downscaled
+# instead, down to FIT_MIN_DIMENSION pixels per side.
+FIT_TRIAL_PIXELS = 256 * 1024
+FIT_MIN_QUALITY = 40
+FIT_TOLERANCE = 0.08
+FIT_MAX_ENCODES = 6  # full-size encodes per resolution
+FIT_DOWNSCALE_MARGIN = 0.95  # aim below the budget when downscaling (bytes ~ pixels)
+FIT_MIN_DIMENSION = 64
+# Bytes kept back from a PDF's budget for its structure (catalog, xref, page objects).
+FIT_PDF_OVERHEAD_BYTES = 4 * 1024
+FIT_PDF_PAGE_OVERHEAD_BYTES = 512
 
 # --- Watermark color maps ---
 # For PyMuPDF vector watermarks (float 0.0-1.0 per channel)
@@ -38,6 +149,12 @@ WATERMARK_ORIENTATION_MAP = {
     "Descending (↘)": -45,  # Clockwise rotation
 }
 
+# --- Watermark render caches (see watermark.py) ---
+# Loaded fonts (one per size) and rotated text stamps (one per text, size,
+# opacity and orientation) are kept between jobs, least recently used evicted first.
+FONT_CACHE_SIZE = 32
+STAMP_CACHE_SIZE = 64
+
 # --- UI colors ---
 BG_PRIMARY = "#0f172a"
 BG_SECONDARY = "#1e293b"
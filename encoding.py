@@ -0,0 +1,496 @@
+"""Image encoders: named encoder profiles for exports, byte-budgeted encoding,
+and content-aware encoding of secure raster pages (JPEG, Flate or bilevel)."""
+
+from __future__ import annotations
+
+import io
+import math
+import warnings
+import zlib
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import BinaryIO, Callable
+
+import fitz
+from PIL import Image, ImageChops, features
+
+from constants import (
+    DEFAULT_ENCODER_PROFILE,
+    FIT_DOWNSCALE_MARGIN,
+    FIT_MAX_ENCODES,
+    FIT_MIN_DIMENSION,
+    FIT_MIN_QUALITY,
+    FIT_TOLERANCE,
+    FIT_TRIAL_PIXELS,
+    JPEG_EXPORT_QUALITY,
+    JPEG_FAST_QUALITY,
+    JPEG_FAST_SECURE_QUALITY,
+    JPEG_SECURE_QUALITY,
+    JPEG_SMALLEST_QUALITY,
+    JPEG_SMALLEST_SECURE_QUALITY,
+    SECURE_ENCODING_SAMPLE_PIXELS,
+    SECURE_ENCODING_TONAL_DELTA,
+    SECURE_ENCODING_MAX_TONAL_FRACTION,
+    SECURE_FLATE_LEVEL,
+)
+
+ENCODING_JPEG = "jpeg"  # photos and scans: continuous tone
+ENCODING_FLATE = "flate"  # text and line art: flat areas and sharp edges, lossless
+ENCODING_BILEVEL = "bilevel"  # exactly two colours, 1 bit per pixel, lossless
+
+# Pillow format name -> file extension, for every format an export can produce.
+IMAGE_FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "AVIF": "avif"}
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """Named speed/size trade-off applied by every image encoder.
+
+    Attributes:
+        name: Profile name, as accepted by the API, CLI and UI.
+        jpeg_quality: JPEG quality for exported images.
+        secure_jpeg_quality: JPEG quality for continuous-tone secure raster pages.
+        jpeg_subsampling: Pillow chroma subsampling (0 = 4:4:4, 2 = 4:2:0, -1 = libjpeg default).
+        jpeg_optimize: Compute optimal Huffman tables (smaller, slower).
+        jpeg_progressive: Write progressive JPEGs (smaller for large images, slower).
+        png_compress_level: zlib level for PNG exports (0-9).
+        flate_level: zlib level for lossless secure raster pages (0-9).
+        webp_quality: Lossy WebP quality.
+        webp_method: WebP effort, 0 (fastest) to 6 (smallest).
+        avif_quality: AVIF quality.
+        avif_speed: AVIF encoder speed, 0 (smallest) to 10 (fastest).
+    """
+    name: str
+    jpeg_quality: int
+    secure_jpeg_quality: int
+    jpeg_subsampling: int
+    jpeg_optimize: bool
+    jpeg_progressive: bool
+    png_compress_level: int
+    flate_level: int
+    webp_quality: int
+    webp_method: int
+    avif_quality: int
+    avif_speed: int
+
+
+ENCODER_PROFILES = {
+    # Lower JPEG quality than "balanced": baseline JPEG is already the cheapest
+    # encoding Pillow offers, so quality is the only JPEG cost left to cut.
+    "fast": EncoderProfile(
+        "fast", JPEG_FAST_QUALITY, JPEG_FAST_SECURE_QUALITY, jpeg_subsampling=2,
+        jpeg_optimize=False, jpeg_progressive=False, png_compress_level=1, flate_level=1,
+        webp_quality=85, webp_method=0, avif_quality=70, avif_speed=10,
+    ),
+    # Matches the encoders' historical settings (Pillow defaults, JPEG 90/95).
+    "balanced": EncoderProfile(
+        "balanced", JPEG_EXPORT_QUALITY, JPEG_SECURE_QUALITY, jpeg_subsampling=-1,
+        jpeg_optimize=False, jpeg_progressive=False, png_compress_level=6,
+        flate_level=SECURE_FLATE_LEVEL, webp_quality=85, webp_method=4, avif_quality=70, avif_speed=8,
+    ),
+    "smallest": EncoderProfile(
+        "smallest", JPEG_SMALLEST_QUALITY, JPEG_SMALLEST_SECURE_QUALITY, jpeg_subsampling=2,
+        jpeg_optimize=True, jpeg_progressive=True, png_compress_level=9, flate_level=9, webp_quality=80, webp_method=6,
+        avif_quality=60, avif_speed=6,
+    ),
+}
+
+
+def get_encoder_profile(profile: str | EncoderProfile | None = None) -> EncoderProfile:
+    """Resolve a profile name (None for the default profile) to an EncoderProfile."""
+    if isinstance(profile, EncoderProfile):
+        return profile
+    name = (profile or DEFAULT_ENCODER_PROFILE).lower()
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile!r}.")
+    return ENCODER_PROFILES[name]
+
+
+@lru_cache(maxsize=None)
+def supported_image_formats() -> tuple[str, ...]:
+    """Return the export formats this Pillow build can write, in menu order."""
+    formats = ["JPEG", "PNG"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # Older Pillow warns about the unknown "avif" feature.
+        for name in ("WEBP", "AVIF"):
+            if features.check(name.lower()):
+                formats.append(name)
+    return tuple(formats)
+
+
+def normalize_image_format(image_format: str) -> str:
+    """Map a format name ("jpg", "JPEG", "webp", ...) to its Pillow name.
+
+    Raises:
+        ValueError: If the format is unknown or not supported by this Pillow build.
+    """
+    name = image_format.upper()
+    name = "JPEG" if name == "JPG" else name
+    if name not in supported_image_formats():
+        raise ValueError(f"Unsupported image format: {image_format}.")
+    return name
+
+
+def save_image(
+    img: Image.Image,
+    fp: str | BinaryIO,
+    image_format: str = "JPEG",
+    profile: str | EncoderProfile | None = None,
+) -> None:
+    """Encode img to a path or binary file with an encoder profile's settings.
+
+    Args:
+        img: Image in a mode the format accepts (RGB or L for JPEG)
+        fp: Output path or binary file object
+        image_format: "JPEG"/"JPG", "PNG", "WEBP" or "AVIF"
+        profile: Profile name or EncoderProfile (default profile if None)
+    """
+    fmt = normalize_image_format(image_format)
+    settings = get_encoder_profile(profile)
+    if fmt == "JPEG":
+        img.save(
+            fp, "JPEG", quality=settings.jpeg_quality, subsampling=settings.jpeg_subsampling,
+            optimize=settings.jpeg_optimize, progressive=settings.jpeg_progressive,
+        )
+    elif fmt == "PNG":
+        img.save(fp, "PNG", compress_level=settings.png_compress_level)
+    elif fmt == "WEBP":
+        img.save(fp, "WEBP", quality=settings.webp_quality, method=settings.webp_method)
+    else:
+        img.save(fp, "AVIF", quality=settings.avif_quality, speed=settings.avif_speed)
+
+
+def encode_pil_image(
+    img: Image.Image, image_format: str = "JPEG", profile: str | EncoderProfile | None = None
+) -> bytes:
+    """Encode img with save_image() and return the bytes."""
+    buf = io.BytesIO()
+    save_image(img, buf, image_format, profile)
+    return buf.getvalue()
+
+
+# Encodes an image at a quality (None for lossless formats) and returns the bytes.
+QualityEncoder = Callable[[Image.Image, "int | None"], bytes]
+
+
+@dataclass(frozen=True)
+class FittedImage:
+    """An encoding that fits a byte budget, as returned by fit_image().
+
+    Attributes:
+        data: Encoded bytes, at most the requested budget.
+        width: Pixel width of the encoded image (smaller than the source if downscaled).
+        height: Pixel height of the encoded image.
+        quality: Quality used, or None for a lossless format.
+        encodes: Number of full-size encodes performed (trial encodes excluded).
+    """
+    data: bytes
+    width: int
+    height: int
+    quality: int | None
+    encodes: int
+
+
+class _SizeModel:
+    """Predicts the encoded size of an image at any quality.
+
+    Built from trial encodes of a downscaled copy, scaled up by the pixel ratio,
+    and interpolated linearly in log space. A downscale is denser per pixel than
+    the full image, so every full-size encode is recorded (measure): between two
+    measured qualities the measurements are interpolated, elsewhere the trial
+    curve is shifted onto the nearest measurement.
+    """
+
+    def __init__(self, img: Image.Image, encode: QualityEncoder, qualities: list[int]):
+        trial, ratio = img, 1.0
+        if img.width * img.height > FIT_TRIAL_PIXELS:
+            scale = math.sqrt(FIT_TRIAL_PIXELS / (img.width * img.height))
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            trial = img.resize(size, Image.Resampling.BILINEAR)
+            ratio = img.width * img.height / (size[0] * size[1])
+        self.trial: list[tuple[int, float]] = []
+        for quality in sorted(set(qualities)):
+            log_size = math.log(len(encode(trial, quality)) * ratio)
+            if self.trial:
+                log_size = max(log_size, self.trial[-1][1])  # Size never drops with quality.
+            self.trial.append((quality, log_size))
+        self.measured: dict[int, float] = {}
+
+    @staticmethod
+    def _interpolate(points: list[tuple[int, float]], quality: int) -> float:
+        if len(points) == 1:
+            return points[0][1]
+        for (q0, s0), (q1, s1) in zip(points, points[1:]):
+            if quality <= q1:
+                break
+        return s0 + (s1 - s0) * (quality - q0) / (q1 - q0)  # Outer segments extrapolate.
+
+    def _log_size(self, quality: int) -> float:
+        if quality in self.measured:
+            return self.measured[quality]
+        below = [q for q in self.measured if q <= quality]
+        above = [q for q in self.measured if q >= quality]
+        if below and above:
+            q0, q1 = max(below), min(above)
+            return self._interpolate([(q0, self.measured[q0]), (q1, self.measured[q1])], quality)
+        trial = self._interpolate(self.trial, quality)
+        if not self.measured:
+            return trial
+        nearest = min(self.measured, key=lambda q: abs(q - quality))
+        return trial + self.measured[nearest] - self._interpolate(self.trial, nearest)
+
+    def size(self, quality: int) -> float:
+        """Predicted encoded bytes at quality."""
+        return math.exp(self._log_size(quality))
+
+    def measure(self, quality: int, size: int) -> None:
+        """Record a full-size encode."""
+        self.measured[quality] = math.log(size)
+
+    def quality_for(self, max_bytes: int, low: int, high: int) -> int:
+        """Highest quality in [low, high] predicted to fit max_bytes (low if none)."""
+        target = math.log(max_bytes)
+        return next((q for q in range(high, low, -1) if self._log_size(q) <= target), low)
+
+
+def _fit_quality(
+    img: Image.Image, max_bytes: int, encode: QualityEncoder, max_quality: int
+) -> tuple[tuple[bytes, int] | None, float, int]:
+    """Search the highest quality in [FIT_MIN_QUALITY, max_quality] fitting max_bytes.
+
+    Returns:
+        ((data, quality) or None if nothing fits, size at the lowest quality,
+        full-size encodes). The size at the lowest quality (measured, or
+        predicted) tells how far to downscale when nothing fits.
+    """
+    floor = min(FIT_MIN_QUALITY, max_quality)
+    low, high = floor, max_quality
+    model = _SizeModel(img, encode, [floor, (floor + high) // 2, high])
+    best = None
+    encodes = 0
+    while low <= high and encodes < FIT_MAX_ENCODES:
+        quality = model.quality_for(max_bytes, low, high)
+        data = encode(img, quality)
+        encodes += 1
+        model.measure(quality, len(data))
+        if len(data) > max_bytes:
+            high = quality - 1
+            continue
+        best = (data, quality)
+        low = quality + 1
+        if len(data) >= max_bytes * (1 - FIT_TOLERANCE):
+            break
+    return best, model.size(floor), encodes
+
+
+def fit_image(
+    img: Image.Image, max_bytes: int, encode: QualityEncoder, max_quality: int | None = None
+) -> FittedImage:
+    """Encode img within max_bytes at the highest quality, downscaling only if needed.
+
+    Args:
+        img: Image to encode
+        max_bytes: Byte budget for the encoded image
+        encode: encode(img, quality) -> bytes; quality is None for lossless formats
+        max_quality: Quality tried first (the profile's), or None for a lossless format
+
+    Raises:
+        ValueError: If the image would have to shrink below FIT_MIN_DIMENSION pixels.
+    """
+    source, encodes = img, 0
+    while True:
+        if max_quality is None:
+            data = encode(img, None)
+            encodes += 1
+            if len(data) <= max_bytes:
+                return FittedImage(data, img.width, img.height, None, encodes)
+            floor_size = len(data)
+        else:
+            best, floor_size, count = _fit_quality(img, max_bytes, encode, max_quality)
+            encodes += count
+            if best is not None:
+                return FittedImage(best[0], img.width, img.height, best[1], encodes)
+        # Encoded size is roughly proportional to the pixel count.
+        scale = min(FIT_DOWNSCALE_MARGIN, math.sqrt(max_bytes / floor_size) * FIT_DOWNSCALE_MARGIN)
+        size = (math.floor(img.width * scale), math.floor(img.height * scale))
+        if min(size) < FIT_MIN_DIMENSION:
+            raise ValueError(f"Cannot fit the image in {max_bytes} bytes.")
+        img = source.resize(size, Image.Resampling.LANCZOS)
+
+
+def _quality_field(image_format: str) -> str | None:
+    """Name of the EncoderProfile field holding the quality of a format (None if lossless)."""
+    return {"JPEG": "jpeg_quality", "WEBP": "webp_quality", "AVIF": "avif_quality"}.get(image_format)
+
+
+def fit_pil_image(
+    img: Image.Image,
+    max_bytes: int,
+    image_format: str = "JPEG",
+    profile: str | EncoderProfile | None = None,
+) -> FittedImage:
+    """Encode img like encode_pil_image(), lowering quality and size to fit max_bytes.
+
+    Lossy formats start from the profile's quality; PNG is only downscaled.
+    """
+    fmt = normalize_image_format(image_format)
+    settings = get_encoder_profile(profile)
+    field = _quality_field(fmt)
+
+    def encode(image: Image.Image, quality: int | None) -> bytes:
+        if quality is None:
+            return encode_pil_image(image, fmt, settings)
+        return encode_pil_image(image, fmt, replace(settings, **{field: quality}))
+
+    max_quality = getattr(settings, field) if field else None
+    return fit_image(img, max_bytes, encode, max_quality)
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """A compressed page raster ready to be placed on a PDF page.
+
+    JPEG data is embedded as-is (DCTDecode). Flate and bilevel data are the raw
+    samples compressed with zlib, described by width, height, colorspace (a PDF
+    colour space object) and bits per component.
+    """
+    encoding: str
+    data: bytes
+    width: int
+    height: int
+    colorspace: str = "/DeviceRGB"
+    bits: int = 8
+
+
+def _sample(img: Image.Image) -> Image.Image:
+    """Return a nearest-neighbour subsample of img of about SECURE_ENCODING_SAMPLE_PIXELS.
+
+    Nearest-neighbour keeps the exact pixel values, so flat areas stay flat and
+    no blended colours are introduced.
+    """
+    step = math.ceil(math.sqrt(img.width * img.height / SECURE_ENCODING_SAMPLE_PIXELS))
+    if step <= 1:
+        return img
+    size = (max(1, img.width // step), max(1, img.height // step))
+    return img.resize(size, Image.Resampling.NEAREST)
+
+
+def tonal_fraction(img: Image.Image) -> float:
+    """Return the fraction of neighbouring pixels differing by a small, non-zero step.
+
+    Text and line art are flat areas separated by sharp edges (steps of 0 or
+    large steps); photos and scanned paper are dominated by small steps.
+    """
+    luma = img if img.mode == "L" else img.convert("L")
+    histogram = [0] * 256
+    for dx, dy in ((1, 0), (0, 1)):
+        delta = ImageChops.difference(luma, ImageChops.offset(luma, dx, dy)).histogram()
+        histogram = [a + b for a, b in zip(histogram, delta)]
+    return sum(histogram[1:SECURE_ENCODING_TONAL_DELTA + 1]) / max(1, sum(histogram))
+
+
+def classify_image(img: Image.Image) -> str:
+    """Pick the encoding for a watermarked page raster (RGB, RGBA or L).
+
+    Returns:
+        ENCODING_BILEVEL if the image has at most two colours, ENCODING_FLATE for
+        text and line art, ENCODING_JPEG for continuous-tone content.
+    """
+    sample = _sample(img)
+    if sample.getcolors(2) is not None and img.getcolors(2) is not None:
+        return ENCODING_BILEVEL
+    if tonal_fraction(sample) <= SECURE_ENCODING_MAX_TONAL_FRACTION:
+        return ENCODING_FLATE
+    return ENCODING_JPEG
+
+
+def _encode_bilevel(img: Image.Image, level: int) -> EncodedImage:
+    """Encode a two-colour image as a 1-bit indexed Flate image."""
+    colors = [color for _, color in img.getcolors(2)]
+    if len(colors) == 1:
+        colors.append(colors[0])
+    first, second = colors
+    if img.mode == "L":
+        channel, value, base, palette = img, second, "/DeviceGray", bytes([first, second])
+    else:
+        # Two colours differ in at least one channel, which then tells them apart.
+        k = next((i for i in range(3) if first[i] != second[i]), 0)
+        channel, value, base, palette = img.getchannel(k), second[k], "/DeviceRGB", bytes(first + second)
+    lut = [0] * 256
+    lut[value] = 255
+    bits = channel.point(lut, "1").tobytes()
+    return EncodedImage(
+        ENCODING_BILEVEL, zlib.compress(bits, level), img.width, img.height,
+        colorspace=f"[/Indexed {base} 1 <{palette.hex()}>]", bits=1,
+    )
+
+
+def _encode_secure_jpeg(img: Image.Image, settings: EncoderProfile, quality: int | None = None) -> bytes:
+    buf = io.BytesIO()
+    img.save(
+        buf, format="JPEG", quality=quality or settings.secure_jpeg_quality,
+        subsampling=settings.jpeg_subsampling, optimize=settings.jpeg_optimize,
+        progressive=settings.jpeg_progressive,
+    )
+    return buf.getvalue()
+
+
+def encode_image(
+    img: Image.Image,
+    encoding: str | None = None,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
+) -> EncodedImage:
+    """Encode a watermarked page raster for embedding in a PDF.
+
+    Args:
+        img: Image in RGB, RGBA (alpha is dropped) or L mode
+        encoding: One of the ENCODING_* names, or None to use classify_image()
+        profile: Encoder profile for the JPEG settings and Flate level
+        max_bytes: Optional byte budget. An encoding over budget is replaced by
+            a JPEG at the highest quality (and, if needed, resolution) that fits;
+            see fit_image().
+    """
+    settings = get_encoder_profile(profile)
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    if encoding is None:
+        encoding = classify_image(img)
+    if encoding == ENCODING_BILEVEL and img.getcolors(2) is not None:
+        encoded = _encode_bilevel(img, settings.flate_level)
+    elif encoding in (ENCODING_FLATE, ENCODING_BILEVEL):
+        colorspace = "/DeviceGray" if img.mode == "L" else "/DeviceRGB"
+        encoded = EncodedImage(
+            ENCODING_FLATE, zlib.compress(img.tobytes(), settings.flate_level),
+            img.width, img.height, colorspace=colorspace,
+        )
+    else:
+        encoded = EncodedImage(ENCODING_JPEG, _encode_secure_jpeg(img, settings), img.width, img.height)
+    if max_bytes is None or len(encoded.data) <= max_bytes:
+        return encoded
+    fitted = fit_image(
+        img, max_bytes, lambda image, quality: _encode_secure_jpeg(image, settings, quality),
+        settings.secure_jpeg_quality,
+    )
+    return EncodedImage(ENCODING_JPEG, fitted.data, fitted.width, fitted.height)
+
+
+def insert_encoded_image(page: fitz.Page, rect: fitz.Rect, image: EncodedImage) -> None:
+    """Place an EncodedImage on a page, stretched over rect.
+
+    Flate data is written as an image XObject directly, so the samples compressed
+    on the worker threads are stored as-is instead of being decoded and
+    recompressed by PyMuPDF.
+    """
+    if image.encoding == ENCODING_JPEG:
+        page.insert_image(rect, stream=image.data)
+        return
+    doc = page.parent
+    xref = doc.get_new_xref()
+    doc.update_object(xref, (
+        f"<</Type/XObject/Subtype/Image/Width {image.width}/Height {image.height}"
+        f"/BitsPerComponent {image.bits}/ColorSpace {image.colorspace}>>"
+    ))
+    doc.update_stream(xref, image.data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/FlateDecode")  # Set after update_stream, which resets it.
+    page.insert_image(rect, xref=xref)
@@ -0,0 +1,121 @@
+"""Memory-mapped input loading and header-only validation of source files."""
+
+from __future__ import annotations
+
+import io
+import mmap
+from dataclasses import dataclass
+
+from PIL import Image
+
+from utils import validate_image_dimensions
+
+
+class MappedFile:
+    """Read-only view of a file's bytes, memory-mapped when possible.
+
+    The file is never read into a Python bytes object: `buffer` is a memoryview
+    over the mapping, so pages are only faulted in when a decoder touches them.
+    Empty or non-mappable files fall back to a regular read.
+    """
+
+    def __init__(self, file_path: str):
+        self._mmap: mmap.mmap | None = None
+        with open(file_path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.buffer = memoryview(self._mmap)
+            except (OSError, ValueError):
+                self.buffer = memoryview(f.read())
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def close(self) -> None:
+        """Unmap the file. A no-op while other objects still reference the buffer."""
+        try:
+            self.buffer.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            pass  # Still exported (e.g. to an open document); freed when collected.
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable, zero-copy file object over a bytes-like buffer.
+
+    Each reader keeps its own position, so several threads can decode from the
+    same shared buffer at once.
+    """
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if self._pos < 0:
+            raise ValueError("Negative seek position")
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def open_image(source) -> Image.Image:
+    """Lazily open an image from bytes, a memoryview or a mapped buffer without copying it."""
+    if isinstance(source, bytes):
+        return Image.open(io.BytesIO(source))
+    return Image.open(BufferReader(source))
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    """Header-level facts about an image, obtained without decoding pixels."""
+    width: int
+    height: int
+    format: str | None
+
+
+def probe_image(source) -> ImageInfo:
+    """Validate an image from its header and structure only.
+
+    Checks the dimensions against MAX_IMAGE_DIMENSION and runs Pillow's
+    structural verify() pass; pixel data is never decoded.
+
+    Raises:
+        ValueError: if the image is too large.
+        Exception: any Pillow error for unreadable or corrupted files.
+    """
+    img = open_image(source)
+    validate_image_dimensions(img)
+    info = ImageInfo(width=img.width, height=img.height, format=img.format)
+    open_image(source).verify()
+    return info
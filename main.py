@@ -1,11 +1,24 @@
 """Thin entry point for Passport Filigrane. UI logic lives in app.py."""
+import atexit
+import os
+
 import flet as ft
+import metrics
 from app import PassportFiligraneApp
+from constants import METRICS_APP_FILE_NAME
+from utils import get_log_path
 
 
 def main(page: ft.Page):
     PassportFiligraneApp(page)
 
 
+def write_session_metrics() -> None:
+    """Write the session's metrics next to the log file, if collection is enabled."""
+    if metrics.is_enabled():
+        metrics.write_metrics(os.path.join(os.path.dirname(get_log_path()), METRICS_APP_FILE_NAME))
+
+
 if __name__ == "__main__":
+    atexit.register(write_session_metrics)
     ft.app(target=main)
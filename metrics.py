@@ -0,0 +1,227 @@
+"""Opt-in per-stage timing histograms and counters.
+
+Stages (decode, page_render, stamp_render, composite, encode, insert, save, and
+the app's end-to-end preview) are timed with timer() or @timed; events (pages, tiles_pasted, cache_hits,
+bytes_written, ...) are counted with count(). Collection is off by default and
+then costs one flag check per call: enable it with enable() or by setting
+PASSPORT_FILIGRANE_METRICS=1. Results export as JSON or as Prometheus text
+(for the node exporter's textfile collector).
+
+Usage:
+    with metrics.timer("encode"):
+        data = encode_pil_image(img, "JPEG")
+    metrics.count("bytes_written", len(data))
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+from constants import METRICS_ENV_VAR, METRICS_PREFIX, METRICS_TIME_BUCKETS
+
+
+class _Histogram:
+    """Cumulative-bucket histogram of durations in seconds (Prometheus layout)."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(METRICS_TIME_BUCKETS)  # Per bucket, not cumulative
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(METRICS_TIME_BUCKETS, seconds)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, n in zip(METRICS_TIME_BUCKETS, self.counts):
+            cumulative += n
+            buckets[repr(float(bound))] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+    def merge(self, data: dict) -> None:
+        previous = 0
+        for i, bound in enumerate(METRICS_TIME_BUCKETS):
+            cumulative = data["buckets"][repr(float(bound))]
+            self.counts[i] += cumulative - previous
+            previous = cumulative
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+
+class _Timer:
+    """Context manager recording the duration of its block in a registry."""
+
+    __slots__ = ("_registry", "_stage", "_start")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self._registry = registry
+        self._stage = stage
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._registry.observe(self._stage, time.perf_counter() - self._start)
+
+
+_NULL_TIMER = nullcontext()
+
+
+class MetricsRegistry:
+    """Thread-safe store of per-stage histograms and named counters.
+
+    While disabled, timer() returns a shared no-op context manager and
+    count()/observe() return immediately, so instrumented code pays one
+    attribute check per call.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: dict[str, _Histogram] = {}
+        self._counters: dict[str, int] = {}
+
+    def timer(self, stage: str):
+        """Return a context manager timing its block as one observation of stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one duration of stage."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = _Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add value to the counter name."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        """Drop every recorded observation and counter."""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        """Return all metrics as a JSON-serializable dict.
+
+        Layout: {"stages": {stage: {"count", "sum", "buckets": {le: cumulative}}},
+        "counters": {name: value}}.
+        """
+        with self._lock:
+            return {
+                "stages": {name: h.to_dict() for name, h in sorted(self._stages.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """Add a snapshot() (e.g. from a worker process) into this registry."""
+        with self._lock:
+            for name, data in snapshot.get("stages", {}).items():
+                self._stages.setdefault(name, _Histogram()).merge(data)
+            for name, value in snapshot.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        name = f"{METRICS_PREFIX}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each processing stage.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, data in snapshot["stages"].items():
+            for bound, cumulative in data["buckets"].items():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {data["sum"]!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {data["count"]}')
+        for counter, value in snapshot["counters"].items():
+            metric = f"{METRICS_PREFIX}_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(
+    enabled=os.environ.get(METRICS_ENV_VAR, "0").strip().lower() in ("1", "true", "on", "yes")
+)
+
+
+def enable() -> None:
+    REGISTRY.enabled = True
+
+
+def disable() -> None:
+    REGISTRY.enabled = False
+
+
+def is_enabled() -> bool:
+    return REGISTRY.enabled
+
+
+def timer(stage: str):
+    """Time a block as one observation of stage (no-op while disabled)."""
+    return REGISTRY.timer(stage)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function as one observation of stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            with _Timer(REGISTRY, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add value to a counter (no-op while disabled)."""
+    REGISTRY.count(name, value)
+
+
+def write_metrics(path: str) -> None:
+    """Write all metrics to path: Prometheus text for *.prom files, JSON otherwise.
+
+    The file is replaced atomically, so a scraper never reads a partial file.
+    """
+    text = REGISTRY.to_prometheus() if path.endswith(".prom") else REGISTRY.to_json()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        os.chmod(tmp_path, 0o644)  # Readable by the exporter's user; metrics hold no content.
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
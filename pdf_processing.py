@@ -2,26 +2,207 @@
 
 from __future__ import annotations
 
-from PIL import Image
+from PIL import Image, ImageChops
 import io
+import math
 import os
+import threading
+import time
+from collections import deque
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 import fitz
 
+import metrics
 from constants import (
     WATERMARK_COLOR_MAP,
     WATERMARK_ORIENTATION_MAP,
-    JPEG_EXPORT_QUALITY,
-    JPEG_SECURE_QUALITY,
+    PDF_MEMORY_BUDGET_BYTES,
+    PDF_TIME_BUDGET_SECONDS,
+    PDF_PAGE_WINDOW,
+    VECTOR_SECONDS_PER_PAGE,
+    RASTER_SECONDS_PER_MEGAPIXEL,
+    RASTER_WORKING_BYTES_PER_PIXEL,
+    RASTER_OUTPUT_BYTES_PER_PIXEL,
+    SECURE_BAND_MAX_PIXELS,
+    SCAN_PAGE_COVERAGE,
+    GRAYSCALE_PROBE_DPI,
+    GRAYSCALE_PROBE_MAX_PIXELS,
+    GRAYSCALE_TOLERANCE,
+    THUMBNAIL_ZOOM,
+    LOUPE_SIZE_POINTS,
+    FIT_PDF_OVERHEAD_BYTES,
+    FIT_PDF_PAGE_OVERHEAD_BYTES,
 )
-from watermark import WatermarkParams, apply_watermark_to_pil_image  # noqa: F401 (re-exported)
+from encoding import (
+    IMAGE_FORMAT_EXTENSIONS,
+    EncodedImage,
+    EncoderProfile,
+    encode_image,
+    encode_pil_image,
+    fit_pil_image,
+    get_encoder_profile,
+    insert_encoded_image,
+    normalize_image_format,
+)
+from watermark import (  # noqa: F401 (apply_watermark_to_pil_image is re-exported)
+    WatermarkParams,
+    apply_watermark_in_place,
+    apply_watermark_to_pil_image,
+)
+
+# Progress hook: on_page_done(pages_done, page_count, elapsed_seconds). It runs on
+# the calling thread after each page; an exception raised by it aborts the job.
+PageCallback = Callable[[int, int, float], None]
+
+
+class OperationCancelled(Exception):
+    """Raised by a long-running operation whose CancelToken was cancelled."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared between a caller and a running job.
+
+    Engine functions check the token between pages (and between variants of a
+    page), so a cancelled job stops after at most the unit of work in progress.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled()
+
+
+def _check_cancel(cancel: CancelToken | None) -> None:
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+
+
+def _partial_path(output_path: str) -> str:
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.part")
+
+
+@contextmanager
+def atomic_output(output_path: str):
+    """Yield a temporary path that is moved to output_path only if the block succeeds."""
+    tmp_path = _partial_path(output_path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 def _pixmap_to_image(pix, alpha: bool = True) -> Image.Image:
-    """Convert PyMuPDF pixmap to PIL Image."""
-    mode = "RGBA" if alpha else "RGB"
+    """Convert PyMuPDF pixmap to PIL Image (L for grayscale pixmaps)."""
+    if pix.n - pix.alpha == 1:
+        mode = "LA" if alpha else "L"
+    else:
+        mode = "RGBA" if alpha else "RGB"
     return Image.frombytes(mode, [pix.width, pix.height], pix.samples)
 
 
+def is_grayscale_page(page: fitz.Page, tolerance: int = GRAYSCALE_TOLERANCE) -> bool:
+    """
+    Return True if a page has no visible colour (B/W photocopies, text-only contracts).
+
+    A low-resolution probe render is checked for channel differences above
+    tolerance, which also absorbs the chroma noise of JPEG-compressed gray scans.
+    """
+    rect = page.rect
+    zoom = min(GRAYSCALE_PROBE_DPI / 72, math.sqrt(GRAYSCALE_PROBE_MAX_PIXELS / abs(rect)))
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if pix.n == 1:
+        return True
+    r, g, b = _pixmap_to_image(pix, alpha=False).split()
+    return all(
+        ImageChops.difference(first, second).getextrema()[1] <= tolerance
+        for first, second in ((r, g), (g, b))
+    )
+
+
+def _windowed_map(func, items, window: int = PDF_PAGE_WINDOW):
+    """
+    Apply func to items on a thread pool, yielding results in input order.
+
+    At most `window` items are in flight at once, so peak memory is bounded by
+    the window size rather than the number of pages. `items` is consumed lazily
+    on the calling thread, which keeps all PyMuPDF access on one thread while
+    Pillow compositing/encoding (which releases the GIL) runs in parallel.
+    """
+    if window <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Abandoned early (error or cancellation): drop work not yet started.
+            for future in pending:
+                future.cancel()
+
+
+def pdf_page_limit(
+    doc: fitz.Document,
+    secure: bool = False,
+    dpi: int = 300,
+    memory_budget: int = PDF_MEMORY_BUDGET_BYTES,
+    time_budget: float = PDF_TIME_BUDGET_SECONDS,
+    window: int = PDF_PAGE_WINDOW,
+) -> int:
+    """
+    Return the maximum page count this document may have for the requested mode.
+
+    The limit comes from the memory and time budgets and the cost model in
+    constants.py, using the document's largest page. Vector mode only has a time
+    cost; secure (raster) mode also holds `window` page rasters (or bands, for
+    pages above SECURE_BAND_MAX_PIXELS) plus the growing output document in memory.
+    """
+    if not secure:
+        return int(time_budget / VECTOR_SECONDS_PER_PAGE)
+
+    max_area = max((page.rect.width * page.rect.height for page in doc), default=0)
+    pixels = max(1.0, max_area * (dpi / 72) ** 2)
+    seconds_per_page = pixels / 1_000_000 * RASTER_SECONDS_PER_MEGAPIXEL
+    time_limit = time_budget / seconds_per_page
+    working_bytes = window * min(pixels, SECURE_BAND_MAX_PIXELS) * RASTER_WORKING_BYTES_PER_PIXEL
+    memory_limit = max(0.0, memory_budget - working_bytes) / (pixels * RASTER_OUTPUT_BYTES_PER_PIXEL)
+    return int(min(time_limit, memory_limit))
+
+
+def check_pdf_page_limit(doc: fitz.Document, secure: bool = False, dpi: int = 300) -> None:
+    """Raise ValueError if the document exceeds pdf_page_limit() for this mode."""
+    limit = pdf_page_limit(doc, secure=secure, dpi=dpi)
+    if doc.page_count > limit:
+        mode = f"Secure Mode at {dpi} DPI" if secure else "this document"
+        raise ValueError(
+            f"PDF too large ({doc.page_count} pages). "
+            f"Maximum allowed for {mode} is {limit} pages."
+        )
+
+
 class PdfLoadError(RuntimeError):
     """Base exception for PDF loading failures."""
     pass
@@ -37,13 +218,23 @@ class InvalidPdfError(PdfLoadError):
     pass
 
 
-def load_pdf(file_path: str) -> tuple[fitz.Document, int]:
+def load_pdf(source: str | bytes | bytearray | memoryview | BinaryIO) -> tuple[fitz.Document, int]:
     """
-    Load a PDF file and return (document, page_count).
-    Raises PdfLoadError (or subclass) if the PDF cannot be opened.
+    Load a PDF from a file path, an in-memory buffer or a binary file object and
+    return (document, page_count).
+    Buffers, including memory-mapped files (inputs.MappedFile.buffer), are opened
+    without copying; only the header and cross-reference table are parsed. File
+    objects are read to the end into memory; nothing is written to disk.
+    Raises PdfLoadError (or subclass) if the PDF cannot be opened, with the same
+    exceptions for every kind of source.
     """
     try:
-        doc = fitz.open(file_path)
+        if isinstance(source, str):
+            doc = fitz.open(source)
+        else:
+            if hasattr(source, "read"):
+                source = source.read()
+            doc = fitz.open(stream=source, filetype="pdf")
         if doc.is_encrypted:
             raise ProtectedPdfError("This PDF is password-protected and cannot be opened.")
         if doc.page_count == 0:
@@ -60,10 +251,16 @@ def load_pdf(file_path: str) -> tuple[fitz.Document, int]:
 def pdf_page_to_image(doc: fitz.Document, page_num: int) -> Image.Image:
     """Convert a PDF page to a PIL Image (RGBA)."""
     page = doc.load_page(page_num)
-    return _pixmap_to_image(page.get_pixmap(alpha=True), alpha=True)
+    with metrics.timer("page_render"):
+        return _pixmap_to_image(page.get_pixmap(alpha=True), alpha=True)
 
 
-def apply_vector_watermark_to_pdf(doc: fitz.Document, params: WatermarkParams) -> None:
+def apply_vector_watermark_to_pdf(
+    doc: fitz.Document,
+    params: WatermarkParams,
+    on_page_done: PageCallback | None = None,
+    cancel: CancelToken | None = None,
+) -> None:
     """
     Apply a native vector watermark on all pages of the PDF document.
 
@@ -74,10 +271,20 @@ def apply_vector_watermark_to_pdf(doc: fitz.Document, params: WatermarkParams) -
     Args:
         doc: PDF document to watermark (modified in place)
         params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
+        on_page_done: Optional progress hook called after each page
+        cancel: Optional token checked before each page. A cancelled run raises
+            OperationCancelled and leaves doc partially watermarked.
     """
-    for page_num in range(len(doc)):
+    start = time.perf_counter()
+    page_count = len(doc)
+    for page_num in range(page_count):
+        _check_cancel(cancel)
         page = doc.load_page(page_num)
-        apply_vector_watermark_to_page(page, params)
+        with metrics.timer("insert"):
+            apply_vector_watermark_to_page(page, params)
+        metrics.count("pages")
+        if on_page_done is not None:
+            on_page_done(page_num + 1, page_count, time.perf_counter() - start)
 
 
 def apply_vector_watermark_to_page(page: fitz.Page, params: WatermarkParams) -> None:
@@ -122,70 +329,619 @@ def apply_vector_watermark_to_page(page: fitz.Page, params: WatermarkParams) ->
         row += 1
 
 
-def save_watermarked_pdf(doc: fitz.Document, output_path: str) -> None:
-    """Save the modified PDF document."""
-    doc.save(output_path)
+class VectorVariantGenerator:
+    """
+    Generate many vector-watermarked copies of one PDF from a single parse.
+
+    The source is copied and parsed once. Every page gets a reference to a shared
+    Form XObject overlay (one per distinct page geometry); the original content
+    streams are never touched again. For each variant only the overlay streams are
+    swapped before serializing, so N variants cost N small overlay writes plus a
+    raw copy of the unchanged streams, instead of N full watermarking passes.
+
+    Usage:
+        with VectorVariantGenerator(doc) as generator:
+            for params in recipients:
+                generator.save(params, f"{params.text}.pdf")
+    """
+
+    _OVERLAY_NAME = "fzwm"
+
+    def __init__(self, doc: fitz.Document):
+        self._doc = fitz.open("pdf", doc.tobytes())
+        # page geometry -> (overlay xref, page number used as template)
+        self._overlays: dict[tuple, tuple[int, int]] = {}
+
+        for page in self._doc:
+            key = (tuple(page.mediabox), tuple(page.cropbox), page.rotation)
+            if key not in self._overlays:
+                self._overlays[key] = (self._new_overlay_xobject(page), page.number)
+            overlay_xref = self._overlays[key][0]
+            self._attach_overlay(page, overlay_xref, f"{self._OVERLAY_NAME}{overlay_xref}")
+
+    def _new_overlay_xobject(self, page: fitz.Page) -> int:
+        xref = self._doc.get_new_xref()
+        bbox = " ".join(f"{v:g}" for v in page.mediabox)
+        self._doc.update_object(xref, f"<</Type/XObject/Subtype/Form/BBox[{bbox}]>>")
+        self._doc.update_stream(xref, b" ")
+        return xref
+
+    def _attach_overlay(self, page: fitz.Page, overlay_xref: int, name: str) -> None:
+        """Reference the overlay from the page through one extra, tiny content stream."""
+        doc = self._doc
+        if doc.xref_get_key(page.xref, "Resources")[0] == "null":
+            inherited = self._inherited_resources(page)
+            if inherited:
+                doc.xref_set_key(page.xref, "Resources", inherited)
+        # Resources and their XObject sub-dictionary may be indirect objects.
+        target, path = page.xref, "Resources/XObject"
+        kind, value = doc.xref_get_key(page.xref, "Resources")
+        if kind == "xref":
+            target, path = int(value.split()[0]), "XObject"
+        kind, value = doc.xref_get_key(target, path)
+        if kind == "xref":
+            target, path = int(value.split()[0]), ""
+        doc.xref_set_key(target, f"{path}/{name}".lstrip("/"), f"{overlay_xref} 0 R")
+
+        if not page.is_wrapped:
+            page.wrap_contents()
+        invoke_xref = doc.get_new_xref()
+        doc.update_object(invoke_xref, "<<>>")
+        doc.update_stream(invoke_xref, f"q /{name} Do Q".encode())
+        contents = " ".join(f"{x} 0 R" for x in page.get_contents() + [invoke_xref])
+        doc.xref_set_key(page.xref, "Contents", f"[{contents}]")
+
+    def _inherited_resources(self, page: fitz.Page) -> str | None:
+        doc = self._doc
+        parent = doc.xref_get_key(page.xref, "Parent")
+        while parent[0] == "xref":
+            parent_xref = int(parent[1].split()[0])
+            kind, value = doc.xref_get_key(parent_xref, "Resources")
+            if kind == "xref":
+                return doc.xref_object(int(value.split()[0]), compressed=True)
+            if kind == "dict":
+                return value
+            parent = doc.xref_get_key(parent_xref, "Parent")
+        return None
+
+    @metrics.timed("insert")
+    def _set_overlays(self, params: WatermarkParams) -> None:
+        """Regenerate each overlay's content stream and resources for one variant."""
+        for overlay_xref, page_num in self._overlays.values():
+            template = self._doc.load_page(page_num)
+            scratch = fitz.open()
+            try:
+                page = scratch.new_page(width=template.mediabox.width, height=template.mediabox.height)
+                page.set_mediabox(template.mediabox)
+                page.set_cropbox(template.cropbox)
+                page.set_rotation(template.rotation)
+                apply_vector_watermark_to_page(page, params)
+                content = page.read_contents()
+                resources = self._flatten_overlay_resources(scratch, page)
+            finally:
+                scratch.close()
+            self._doc.update_stream(overlay_xref, content)
+            self._doc.xref_set_key(overlay_xref, "Resources", resources)
+
+    @staticmethod
+    def _flatten_overlay_resources(scratch: fitz.Document, page: fitz.Page) -> str:
+        """Inline the (Helvetica + opacity state) resources used by the overlay."""
+        res_xref = int(scratch.xref_get_key(page.xref, "Resources")[1].split()[0])
+        parts = []
+        font_kind, font_ref = scratch.xref_get_key(res_xref, "Font/helv")
+        if font_kind == "xref":
+            font = scratch.xref_object(int(font_ref.split()[0]), compressed=True)
+            parts.append(f"/Font<</helv {font}>>")
+        gs_kind, gstate = scratch.xref_get_key(res_xref, "ExtGState")
+        if gs_kind == "dict":
+            parts.append(f"/ExtGState{gstate}")
+        return f"<<{''.join(parts)}>>"
+
+    def render(self, params: WatermarkParams) -> bytes:
+        """Return the PDF bytes of the variant watermarked with params."""
+        self._set_overlays(params)
+        return self._doc.tobytes()
+
+    def save(self, params: WatermarkParams, output_path: str) -> None:
+        """Write the variant watermarked with params to output_path."""
+        self._set_overlays(params)
+        with metrics.timer("save"), atomic_output(output_path) as tmp_path:
+            self._doc.save(tmp_path)
+            if metrics.is_enabled():  # No stat() while disabled
+                metrics.count("bytes_written", os.path.getsize(tmp_path))
+
+    def close(self) -> None:
+        self._doc.close()
+
+    def __enter__(self) -> "VectorVariantGenerator":
+        return self
 
+    def __exit__(self, *exc) -> None:
+        self.close()
 
-def save_image_as_pdf(image_bytes: bytes, output_path: str) -> None:
+
+def iter_vector_watermark_variants(doc: fitz.Document, params_list: list[WatermarkParams]):
+    """Yield the PDF bytes of one vector-watermarked variant per WatermarkParams."""
+    with VectorVariantGenerator(doc) as generator:
+        for params in params_list:
+            yield generator.render(params)
+
+
+def save_watermarked_pdf(doc: fitz.Document, output_path: str | BinaryIO) -> None:
+    """Save the modified PDF document to a path or a writable binary stream.
+
+    Nothing is left at output_path if saving fails. A stream receives the bytes
+    of watermarked_pdf_bytes() in a single write.
     """
-    Convert a watermarked image (bytes) to a single-page PDF.
-    The PDF page size will match the image dimensions in points (72 DPI).
+    if not isinstance(output_path, str):
+        data = watermarked_pdf_bytes(doc)
+        output_path.write(data)
+        metrics.count("bytes_written", len(data))
+        return
+    with metrics.timer("save"), atomic_output(output_path) as tmp_path:
+        doc.save(tmp_path)
+        if metrics.is_enabled():  # No stat() while disabled
+            metrics.count("bytes_written", os.path.getsize(tmp_path))
+
+
+def watermarked_pdf_bytes(doc: fitz.Document) -> bytes:
+    """Return the modified PDF document as the bytes save_watermarked_pdf() would write."""
+    with metrics.timer("save"):
+        return doc.tobytes()
+
+
+def pdf_image_budget(max_bytes: int, page_count: int = 1) -> int:
+    """Return the bytes left for page images in a PDF of at most max_bytes.
+
+    Raises:
+        ValueError: If the budget does not even cover the PDF structure.
     """
+    budget = max_bytes - FIT_PDF_OVERHEAD_BYTES - page_count * FIT_PDF_PAGE_OVERHEAD_BYTES
+    if budget <= 0:
+        raise ValueError(f"A {page_count}-page PDF cannot fit in {max_bytes} bytes.")
+    return budget
+
+
+def _image_pdf(image_bytes: bytes, page_size: tuple[float, float] | None) -> fitz.Document:
     img = Image.open(io.BytesIO(image_bytes))
-    width, height = img.size
+    width, height = page_size or img.size
 
     pdf_doc = fitz.open()
-    page = pdf_doc.new_page(width=width, height=height)
-    page.insert_image(page.rect, stream=image_bytes)
+    try:
+        page = pdf_doc.new_page(width=width, height=height)
+        with metrics.timer("insert"):
+            page.insert_image(page.rect, stream=image_bytes)
+    except BaseException:
+        pdf_doc.close()
+        raise
+    return pdf_doc
+
+
+def save_image_as_pdf(
+    image_bytes: bytes, output_path: str | BinaryIO, page_size: tuple[float, float] | None = None
+) -> None:
+    """
+    Convert a watermarked image (bytes) to a single-page PDF, written to a path
+    or a writable binary stream.
+    The PDF page size will match the image dimensions in points (72 DPI), or
+    page_size if given (e.g. the original size of an image downscaled to fit
+    a byte budget). Nothing is left at output_path if saving fails.
+    """
+    if not isinstance(output_path, str):
+        data = image_to_pdf_bytes(image_bytes, page_size)
+        output_path.write(data)
+        metrics.count("bytes_written", len(data))
+        return
+    pdf_doc = _image_pdf(image_bytes, page_size)
+    try:
+        with metrics.timer("save"), atomic_output(output_path) as tmp_path:
+            pdf_doc.save(tmp_path)
+            if metrics.is_enabled():  # No stat() while disabled
+                metrics.count("bytes_written", os.path.getsize(tmp_path))
+    finally:
+        pdf_doc.close()
+
+
+def image_to_pdf_bytes(image_bytes: bytes, page_size: tuple[float, float] | None = None) -> bytes:
+    """Return the single-page PDF save_image_as_pdf() would write, as bytes."""
+    pdf_doc = _image_pdf(image_bytes, page_size)
+    try:
+        with metrics.timer("save"):
+            return pdf_doc.tobytes()
+    finally:
+        pdf_doc.close()
+
+
+def iter_pdf_as_images(
+    doc: fitz.Document,
+    img_format: str = "JPEG",
+    window: int = PDF_PAGE_WINDOW,
+    cancel: CancelToken | None = None,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
+) -> Iterator[bytes]:
+    """
+    Yield each page of the PDF as encoded image bytes, in page order, exactly
+    as save_pdf_as_images() would write them. Nothing is written to disk.
+    Pages are rendered one at a time on the calling thread and encoded with at
+    most `window` in flight. Closing the iterator early stops rendering.
+    """
+    pil_fmt = normalize_image_format(img_format)
+    profile = get_encoder_profile(profile)
+
+    def encode(img: Image.Image) -> bytes:
+        _check_cancel(cancel)
+        with metrics.timer("encode"):
+            if max_bytes is None:
+                data = encode_pil_image(img, pil_fmt, profile)
+            else:
+                data = fit_pil_image(img, max_bytes, pil_fmt, profile).data
+        metrics.count("pages")
+        return data
 
-    pdf_doc.save(output_path)
-    pdf_doc.close()
+    def render(i: int) -> Image.Image:
+        _check_cancel(cancel)
+        page = doc.load_page(i)
+        colorspace = fitz.csGRAY if is_grayscale_page(page) else fitz.csRGB
+        with metrics.timer("page_render"):
+            return _pixmap_to_image(page.get_pixmap(colorspace=colorspace), alpha=False)
+
+    rendered = (render(i) for i in range(len(doc)))
+    yield from _windowed_map(encode, rendered, window)
 
 
 def save_pdf_as_images(
-    doc: fitz.Document, output_dir: str, base_name: str, img_format: str = "JPEG"
+    doc: fitz.Document,
+    output_dir: str,
+    base_name: str,
+    img_format: str = "JPEG",
+    window: int = PDF_PAGE_WINDOW,
+    on_page_done: PageCallback | None = None,
+    cancel: CancelToken | None = None,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
 ) -> None:
     """
-    Save each page of the PDF as an individual image (JPG or PNG).
+    Save each page of the PDF as an individual image (JPG, PNG, WebP or AVIF),
+    encoded with the given encoder profile (see encoding.py). With max_bytes,
+    every image is fitted to that size (see encoding.fit_pil_image).
     Output images are created from raw pixel data (no EXIF metadata).
+    Pages without colour are rendered and saved as grayscale images.
+    Pages are rendered one at a time and encoded with at most `window` in flight
+    (see iter_pdf_as_images); on_page_done is called as each page's file is written.
+
+    Pages are written to hidden ".part" files and only renamed into place once
+    every page succeeded, so a failed or cancelled export (OperationCancelled)
+    leaves the output directory as it was.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    for i in range(len(doc)):
-        page = doc.load_page(i)
-        img = _pixmap_to_image(page.get_pixmap(), alpha=False)
+    ext = IMAGE_FORMAT_EXTENSIONS[normalize_image_format(img_format)]
+    page_count = len(doc)
+    output_paths = [
+        os.path.join(output_dir, f"{base_name}_page_{i+1:03d}.{ext}") for i in range(page_count)
+    ]
+
+    start = time.perf_counter()
+    pages = iter_pdf_as_images(doc, img_format, window, cancel, profile, max_bytes)
+    try:
+        with closing(pages):
+            for i, data in enumerate(pages):
+                with open(_partial_path(output_paths[i]), "wb") as f:
+                    f.write(data)
+                metrics.count("bytes_written", len(data))
+                if on_page_done is not None:
+                    on_page_done(i + 1, page_count, time.perf_counter() - start)
+                _check_cancel(cancel)
+    except BaseException:
+        for output_path in output_paths:
+            tmp_path = _partial_path(output_path)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
 
-        is_png = img_format.upper() == "PNG"
-        ext = "png" if is_png else "jpg"
-        pil_fmt = "PNG" if is_png else "JPEG"
-        output_path = os.path.join(output_dir, f"{base_name}_page_{i+1:03d}.{ext}")
+    for output_path in output_paths:
+        os.replace(_partial_path(output_path), output_path)
 
-        if pil_fmt == "JPEG":
-            img.save(output_path, pil_fmt, quality=JPEG_EXPORT_QUALITY)
-        else:
-            img.save(output_path, pil_fmt)
+
+def render_preview_base(doc: fitz.Document, page_num: int = 0) -> Image.Image:
+    """Render an unwatermarked page at preview resolution (72 DPI, RGBA)."""
+    return pdf_page_to_image(doc, page_num)
 
 
-def generate_pdf_preview(doc: fitz.Document, params: WatermarkParams) -> bytes:
+def composite_preview(base: Image.Image, params: WatermarkParams) -> bytes:
+    """Watermark a preview base image and return PNG bytes. base is not modified."""
+    watermarked = apply_watermark_to_pil_image(base, params)
+    buf = io.BytesIO()
+    with metrics.timer("encode"):
+        watermarked.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def generate_pdf_preview(doc: fitz.Document, params: WatermarkParams, page_num: int = 0) -> bytes:
     """
-    Generate a preview of the first page with the watermark applied.
+    Generate a preview of one page with the watermark applied.
     Does not modify the original document. Returns PNG bytes.
 
     Args:
         doc: PyMuPDF document
         params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
+        page_num: Zero-based page to preview (first page by default)
+    """
+    return composite_preview(render_preview_base(doc, page_num), params)
+
+
+def render_page_thumbnail(doc: fitz.Document, page_num: int, zoom: float = THUMBNAIL_ZOOM) -> bytes:
+    """Render an unwatermarked, low-resolution page thumbnail as PNG bytes."""
+    with metrics.timer("page_render"):
+        pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pix.tobytes("png")
+
+
+def _scale_params_for_dpi(params: WatermarkParams, dpi: int) -> WatermarkParams:
+    """Scale font size and spacing proportionally to DPI for consistent visual appearance."""
+    scale_factor = dpi / 72
+    return WatermarkParams(
+        text=params.text,
+        opacity=params.opacity,
+        font_size=int(params.font_size * scale_factor),
+        spacing=int(params.spacing * scale_factor),
+        color=params.color,
+        orientation=params.orientation,
+    )
+
+
+def _secure_image(pix) -> Image.Image:
+    """Convert a rendered pixmap to the mode composited by secure mode (L or RGB)."""
+    return _pixmap_to_image(pix, alpha=False)
+
+
+def _render_secure_page(page: fitz.Page, dpi: int, gray: bool = False) -> Image.Image:
+    """Rasterize a page at the given DPI as an RGB (or, if gray, L) image ready for compositing."""
+    zoom = dpi / 72
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    with metrics.timer("page_render"):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+        return _secure_image(pix)
+
+
+def loupe_clip(page: fitz.Page, center: tuple[float, float], size: float = LOUPE_SIZE_POINTS) -> fitz.Rect:
+    """Return a size x size point square centred on center, shifted to lie inside the page."""
+    bounds = page.rect
+    width, height = min(size, bounds.width), min(size, bounds.height)
+    x0 = min(max(center[0] - width / 2, bounds.x0), bounds.x1 - width)
+    y0 = min(max(center[1] - height / 2, bounds.y0), bounds.y1 - height)
+    return fitz.Rect(x0, y0, x0 + width, y0 + height)
+
+
+def generate_pdf_loupe(
+    doc: fitz.Document, page_num: int, params: WatermarkParams, dpi: int, clip: fitz.Rect
+) -> bytes:
+    """
+    Render a region of a page at export DPI with the watermark applied. Returns PNG bytes.
+
+    Only the clip rectangle is rasterized, and the watermark grid is phased by the
+    pixmap origin, so the result matches the same region of a full secure export
+    at that DPI (before JPEG compression) at a fraction of the cost.
+
+    Args:
+        doc: PyMuPDF document
+        page_num: Zero-based page number
+        params: WatermarkParams at 72 DPI (scaled to dpi like secure export)
+        dpi: Resolution in DPI (300, 450, or 600), capped for scans like export
+        clip: Region to render, in page points (see loupe_clip)
     """
-    img = pdf_page_to_image(doc, 0)
-    watermarked = apply_watermark_to_pil_image(img, params)
+    page = doc.load_page(page_num)
+    dpi = secure_page_dpi(page, dpi)
+    zoom = dpi / 72
+    colorspace = fitz.csGRAY if is_grayscale_page(page) else fitz.csRGB
+    with metrics.timer("page_render"):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=colorspace, alpha=False)
+        img = _pixmap_to_image(pix, alpha=False)
+    apply_watermark_in_place(img, _scale_params_for_dpi(params, dpi), origin=(pix.x, pix.y))
     buf = io.BytesIO()
-    watermarked.save(buf, format="PNG")
+    with metrics.timer("encode"):
+        img.save(buf, format="PNG")
     return buf.getvalue()
 
 
+@dataclass(frozen=True)
+class ScanInfo:
+    """A page made of one embedded image covering the whole page (a typical scan).
+
+    Attributes:
+        xref: Cross-reference number of the embedded image.
+        dpi: Effective resolution of the image as placed on the page.
+        extractable: The image pixels can be used as-is: it is drawn upright over
+            the full page with no mask, and nothing else is drawn on the page.
+    """
+    xref: int
+    dpi: float
+    extractable: bool
+
+
+def detect_scanned_page(page: fitz.Page) -> ScanInfo | None:
+    """Return ScanInfo if the page is a single full-page image, else None."""
+    infos = page.get_image_info(xrefs=True)
+    if len(infos) != 1 or not infos[0]["xref"]:
+        return None
+    info = infos[0]
+    unrotated = page.rect * page.derotation_matrix
+    bbox = fitz.Rect(info["bbox"])
+    if abs(bbox & unrotated) < SCAN_PAGE_COVERAGE * abs(unrotated):
+        return None
+
+    a, b, c, d, _, _ = info["transform"]
+    dpi_x = info["width"] * 72 / math.hypot(a, b)
+    dpi_y = info["height"] * 72 / math.hypot(c, d)
+    dpi = min(dpi_x, dpi_y)
+    extractable = (
+        page.rotation == 0
+        and b == 0 and c == 0 and a > 0 and d > 0
+        and abs(dpi_x - dpi_y) <= 0.02 * dpi
+        and all(abs(u - v) <= 1 for u, v in zip(bbox, page.rect))
+        and not info["has-mask"]
+        and page.first_annot is None
+        and not page.get_text().strip()
+        and not page.get_drawings()
+    )
+    return ScanInfo(xref=info["xref"], dpi=dpi, extractable=extractable)
+
+
+def secure_page_dpi(page: fitz.Page, dpi: int) -> float:
+    """Return the DPI secure mode uses for a page: dpi, capped at a scan's own resolution."""
+    scan = detect_scanned_page(page)
+    return min(dpi, scan.dpi) if scan is not None else dpi
+
+
+@dataclass
+class _RasterBand:
+    """A horizontal slice of a rasterized page and where it goes on the output page."""
+    page_rect: fitz.Rect  # output page size
+    place: fitz.Rect  # target rectangle on the output page
+    image: Image.Image  # RGB (or grayscale L) pixels of the slice
+    origin: tuple[int, int]  # top-left pixel of the slice within the full page raster
+    first: bool
+    last: bool
+    dpi: float  # resolution of the raster, for scaling the watermark
+    budgets: list[int] | None = None  # max encoded bytes per variant (size-budgeted output)
+
+
+def _render_secure_bands(
+    page: fitz.Page, dpi: int, band_pixels: int = SECURE_BAND_MAX_PIXELS, gray: bool = False
+):
+    """
+    Yield a page's raster at dpi as _RasterBand items, top to bottom.
+
+    Pages up to band_pixels are rendered whole. Larger pages are rendered in
+    horizontal clip bands of at most band_pixels each, so memory depends on the
+    band size rather than on the page area.
+    """
+    zoom = dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+    rect = page.rect
+    full = (rect * matrix).irect
+    if full.width * full.height <= band_pixels:
+        yield _RasterBand(rect, rect, _render_secure_page(page, dpi, gray), (0, 0), True, True, dpi)
+        return
+
+    rows = max(1, band_pixels // full.width)
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    for top in range(0, full.height, rows):
+        bottom = min(top + rows, full.height)
+        clip = fitz.Rect(rect.x0, rect.y0 + top / zoom, rect.x1, rect.y0 + bottom / zoom)
+        with metrics.timer("page_render"):
+            pix = page.get_pixmap(matrix=matrix, clip=clip, colorspace=colorspace, alpha=False)
+        origin = (pix.x - full.x0, pix.y - full.y0)
+        # Same pixel-to-point mapping as a whole-page image stretched over the page.
+        place = fitz.Rect(
+            0, origin[1] * rect.height / full.height,
+            rect.width, (origin[1] + pix.height) * rect.height / full.height,
+        )
+        image = _secure_image(pix)
+        del pix
+        yield _RasterBand(rect, place, image, origin, top == 0, bottom == full.height, dpi)
+
+
+def _extract_scan_image(
+    doc: fitz.Document, xref: int, max_pixels: int, gray: bool = False
+) -> Image.Image | None:
+    """Decode an embedded image at native resolution as RGB (or L), or None if it is too large."""
+    with metrics.timer("decode"):
+        pix = fitz.Pixmap(doc, xref)
+        if pix.width * pix.height > max_pixels:
+            return None
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        target = fitz.csGRAY if gray else fitz.csRGB
+        if pix.colorspace is None or pix.colorspace.n != target.n:
+            pix = fitz.Pixmap(target, pix)
+        return _secure_image(pix)
+
+
+def _secure_page_bands(page: fitz.Page, dpi: int, band_pixels: int = SECURE_BAND_MAX_PIXELS):
+    """
+    Yield a page's secure-mode raster as _RasterBand items.
+
+    Scanned pages are never upsampled: the DPI is capped at the scan's effective
+    resolution, and a plain full-page scan is used at its native pixels directly.
+    Pages without colour are processed in grayscale (see is_grayscale_page).
+    """
+    gray = is_grayscale_page(page)
+    scan = detect_scanned_page(page)
+    if scan is None or scan.dpi >= dpi:
+        yield from _render_secure_bands(page, dpi, band_pixels, gray)
+        return
+    if scan.extractable:
+        image = _extract_scan_image(page.parent, scan.xref, band_pixels, gray)
+        if image is not None:
+            yield _RasterBand(page.rect, page.rect, image, (0, 0), True, True, scan.dpi)
+            return
+    yield from _render_secure_bands(page, scan.dpi, band_pixels, gray)
+
+
+def _encode_secure_page(
+    img: Image.Image,
+    params: WatermarkParams,
+    origin: tuple[int, int] = (0, 0),
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
+    in_place: bool = False,
+) -> EncodedImage:
+    """Watermark a rasterized page (or band at origin) and encode it for its content.
+
+    Grayscale (L) rasters stay single-channel; see encoding.classify_image for
+    the choice between JPEG, Flate and bilevel, and encoding.encode_image for
+    max_bytes. With in_place, img itself is watermarked instead of a copy (when
+    no other variant needs the clean raster).
+    """
+    if in_place:
+        apply_watermark_in_place(img, params, origin)
+        watermarked = img
+    else:
+        watermarked = apply_watermark_to_pil_image(img, params, origin=origin)
+    with metrics.timer("encode"):
+        return encode_image(watermarked, profile=profile, max_bytes=max_bytes)
+
+
+class _ByteBudget:
+    """Splits the byte budget of secure output documents across page bands.
+
+    Each band is granted, when it is rendered, a share of the bytes not yet
+    granted proportional to its area. Bytes a band leaves unused (e.g. a text
+    page stored as Flate) go back to the pool once it is inserted, for the
+    bands rendered after that. One pool is kept per variant document.
+    """
+
+    def __init__(self, doc: fitz.Document, variants: int, max_bytes: int):
+        self.available = [pdf_image_budget(max_bytes, len(doc))] * variants
+        self.area = sum(page.rect.width * page.rect.height for page in doc)
+
+    def grant(self, place: fitz.Rect) -> list[int]:
+        """Reserve and return the byte budget of a band, per variant."""
+        area = place.width * place.height
+        share = area / self.area if self.area > 0 else 1.0
+        self.area -= area
+        budgets = [max(1, int(available * share)) for available in self.available]
+        self.available = [a - b for a, b in zip(self.available, budgets)]
+        return budgets
+
+    def settle(self, budgets: list[int], images: list[EncodedImage]) -> None:
+        """Return the bytes a band did not use."""
+        self.available = [a + b - len(e.data) for a, b, e in zip(self.available, budgets, images)]
+
+
 def apply_secure_raster_watermark_to_pdf(
-    doc: fitz.Document, params: WatermarkParams, dpi: int = 300
+    doc: fitz.Document,
+    params: WatermarkParams,
+    dpi: int = 300,
+    window: int = PDF_PAGE_WINDOW,
+    on_page_done: PageCallback | None = None,
+    cancel: CancelToken | None = None,
+    band_pixels: int = SECURE_BAND_MAX_PIXELS,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
 ) -> fitz.Document:
     """
     Apply a watermark on a PDF by rendering each page as an image (rasterization).
@@ -195,37 +951,133 @@ def apply_secure_raster_watermark_to_pdf(
         doc: PyMuPDF document
         params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
         dpi: Resolution in DPI (300, 450, or 600)
+        window: Maximum number of rendered pages in flight
+        on_page_done: Optional progress hook called after each page
+        cancel: Optional token; a cancelled run raises OperationCancelled
+        band_pixels: Pages above this many pixels are rendered in horizontal bands
+        profile: Encoder profile for the page images (see encoding.py)
+        max_bytes: Optional size limit of the output document
 
     Returns:
         New fitz.Document with rasterized watermarked pages
     """
-    out_doc = fitz.open()
+    return apply_secure_raster_watermark_variants(
+        doc, [params], dpi=dpi, window=window, on_page_done=on_page_done, cancel=cancel,
+        band_pixels=band_pixels, profile=profile, max_bytes=max_bytes,
+    )[0]
 
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
 
-    # Scale font size and spacing proportionally to DPI for consistent visual appearance
-    scale_factor = dpi / 72
-    adjusted_params = WatermarkParams(
-        text=params.text,
-        opacity=params.opacity,
-        font_size=int(params.font_size * scale_factor),
-        spacing=int(params.spacing * scale_factor),
-        color=params.color,
-        orientation=params.orientation,
-    )
+def apply_secure_raster_watermark_variants(
+    doc: fitz.Document,
+    params_list: list[WatermarkParams],
+    dpi: int = 300,
+    max_workers: int = 1,
+    window: int = PDF_PAGE_WINDOW,
+    on_page_done: PageCallback | None = None,
+    cancel: CancelToken | None = None,
+    band_pixels: int = SECURE_BAND_MAX_PIXELS,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
+) -> list[fitz.Document]:
+    """
+    Apply several secure raster watermarks to one PDF, rasterizing each page once.
 
-    for page in doc:
-        img = _pixmap_to_image(page.get_pixmap(matrix=mat, alpha=False), alpha=False)
-        img_rgba = img.convert("RGBA")
+    Each page is rendered a single time at the requested DPI; every variant is
+    then composited and encoded from that shared raster. At most `window` page
+    rasters are held in memory at a time, whatever the page count. Pages larger
+    than band_pixels (e.g. A2/A1 plans at 600 DPI) are rendered, watermarked and
+    placed as horizontal strips, each its own image on the output page. Scanned
+    pages are processed at min(dpi, scan resolution), with the watermark scaled
+    to that resolution (see detect_scanned_page); pages without colour are
+    rendered, composited and encoded in grayscale (see is_grayscale_page). Each
+    page image is stored as JPEG, lossless Flate or 1-bit Flate depending on its
+    content (see encoding.classify_image).
 
-        watermarked_img = apply_watermark_to_pil_image(img_rgba, adjusted_params)
+    With max_bytes, each output document stays under that size when saved
+    (without garbage collection or deflate options): the budget is shared
+    between pages by area, and pages over their share are stored as JPEG at
+    the highest quality, or resolution, that fits (see encoding.fit_image).
 
-        final_img = watermarked_img.convert("RGB")
-        new_page = out_doc.new_page(width=page.rect.width, height=page.rect.height)
+    Args:
+        doc: PyMuPDF document
+        params_list: One WatermarkParams per variant (e.g. one per recipient)
+        dpi: Resolution in DPI (300, 450, or 600)
+        max_workers: Number of threads compositing/encoding variants of a page in parallel
+        window: Maximum number of rendered pages in flight
+        on_page_done: Optional progress hook called after each page
+        cancel: Optional token checked before each page render and before each
+            variant encode. A cancelled run raises OperationCancelled; the
+            partially built output documents are closed.
+        band_pixels: Maximum pixels rendered at once for a single page
+        profile: Encoder profile for the page images (see encoding.py)
+        max_bytes: Optional size limit of each output document
 
-        img_buffer = io.BytesIO()
-        final_img.save(img_buffer, format="JPEG", quality=JPEG_SECURE_QUALITY)
-        new_page.insert_image(new_page.rect, stream=img_buffer.getvalue())
+    Returns:
+        One new fitz.Document per variant, in the same order as params_list
+    """
+    profile = get_encoder_profile(profile)
+    budget = _ByteBudget(doc, len(params_list), max_bytes) if max_bytes is not None else None
+    adjusted_by_dpi: dict[float, list[WatermarkParams]] = {}
+
+    def adjusted(band_dpi: float) -> list[WatermarkParams]:
+        if band_dpi not in adjusted_by_dpi:
+            adjusted_by_dpi[band_dpi] = [_scale_params_for_dpi(p, band_dpi) for p in params_list]
+        return adjusted_by_dpi[band_dpi]
+
+    out_docs = [fitz.open() for _ in params_list]
+
+    pool = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+    def encode(band: _RasterBand, variant: int) -> EncodedImage:
+        _check_cancel(cancel)
+        params = adjusted(band.dpi)[variant]
+        max_band_bytes = band.budgets[variant] if band.budgets else None
+        return _encode_secure_page(
+            band.image, params, band.origin, profile, max_band_bytes, in_place=len(params_list) == 1,
+        )
+
+    def composite(band: _RasterBand) -> tuple[_RasterBand, list[EncodedImage]]:
+        variants = range(len(params_list))
+        if pool is None:
+            streams = [encode(band, v) for v in variants]
+        else:
+            streams = list(pool.map(lambda v: encode(band, v), variants))
+        band.image = None  # Only the encoded images travel back to the calling thread.
+        return band, streams
+
+    def render(page: fitz.Page):
+        for band in _secure_page_bands(page, dpi, band_pixels):
+            _check_cancel(cancel)
+            if budget is not None:
+                band.budgets = budget.grant(band.place)
+            yield band
+
+    start = time.perf_counter()
+    page_count = len(doc)
+    rendered = (band for page in doc for band in render(page))
+    done = 0
+    try:
+        for band, streams in _windowed_map(composite, rendered, window):
+            if budget is not None:
+                budget.settle(band.budgets, streams)
+            with metrics.timer("insert"):
+                for out_doc, encoded in zip(out_docs, streams):
+                    if band.first:
+                        out_doc.new_page(width=band.page_rect.width, height=band.page_rect.height)
+                    insert_encoded_image(out_doc[-1], band.place, encoded)
+            if not band.last:
+                continue
+            done += 1
+            metrics.count("pages")
+            if on_page_done is not None:
+                on_page_done(done, page_count, time.perf_counter() - start)
+            _check_cancel(cancel)
+    except BaseException:
+        for out_doc in out_docs:
+            out_doc.close()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
 
-    return out_doc
+    return out_docs
@@ -0,0 +1,167 @@
+"""On-demand profiling of top-level operations (cProfile + tracemalloc dumps).
+
+When enabled (enable(), `cli batch --profile`, or PASSPORT_FILIGRANE_PROFILE=1),
+each operation wrapped in profile_operation() — preview, vector_apply,
+secure_apply, image_export, save — writes two files to the "profiles"
+directory next to the log file (see utils.get_log_path):
+
+- <stem>.prof: cProfile statistics, readable with pstats or snakeviz.
+- <stem>.json: duration, tracemalloc current/peak Python allocations, the
+  top allocation sites, the process peak RSS (pixel buffers allocated by
+  Pillow and MuPDF are invisible to tracemalloc), and any error.
+
+Paths are passed through utils.sanitize_path_for_log before being written.
+cProfile records the calling thread only: work handed to page-window or
+encoder threads shows up as time spent waiting for them. Only one operation is
+profiled at a time; operations started meanwhile (in
+other threads, or nested in the profiled one) run unprofiled. While disabled,
+profile_operation() is a shared no-op context manager.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import itertools
+import json
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from constants import PROFILE_DIR_NAME, PROFILE_ENV_VAR, PROFILE_TOP_ALLOCATIONS
+from utils import get_log_path, sanitize_path_for_log
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_enabled = os.environ.get(PROFILE_ENV_VAR, "0").strip().lower() in ("1", "true", "on", "yes")
+_active = threading.Lock()  # Held while an operation is being profiled
+_sequence = itertools.count(1)
+_NULL_CONTEXT = nullcontext()
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_profile_dir() -> str:
+    """Return the private directory receiving profile dumps (created if needed)."""
+    profile_dir = os.path.join(os.path.dirname(get_log_path()), PROFILE_DIR_NAME)
+    os.makedirs(profile_dir, mode=0o700, exist_ok=True)
+    return profile_dir
+
+
+def profile_operation(operation: str, source: str | None = None):
+    """Profile the enclosed block as one operation, if profiling is enabled.
+
+    Args:
+        operation: Operation name, used in the dump file names.
+        source: Input file the operation works on (recorded sanitized).
+    """
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _profiled(operation, source)
+
+
+def _private_open(path: str, mode: str):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    return os.fdopen(fd, mode)
+
+
+def _dump_stats(profiler: cProfile.Profile, path: str) -> None:
+    """Write the profiler's stats with sanitized file names."""
+    stats = pstats.Stats(profiler)
+
+    def clean(key):
+        return (sanitize_path_for_log(key[0]), key[1], key[2])
+
+    stats.stats = {
+        clean(func): (cc, nc, tt, ct, {clean(caller): timing for caller, timing in callers.items()})
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items()
+    }
+    with _private_open(path, "wb") as f:
+        marshal.dump(stats.stats, f)  # pstats.Stats.dump_stats format
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> list[dict]:
+    return [
+        {
+            "file": sanitize_path_for_log(stat.traceback[0].filename),
+            "line": stat.traceback[0].lineno,
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+    ]
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes
+
+
+@contextmanager
+def _profiled(operation: str, source: str | None):
+    if not _active.acquire(blocking=False):
+        yield
+        return
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    error = None
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    except BaseException as ex:
+        error = sanitize_path_for_log(f"{type(ex).__name__}: {ex}")
+        raise
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        top = _top_allocations(tracemalloc.take_snapshot())
+        if started_tracing:
+            tracemalloc.stop()
+        try:
+            stem = os.path.join(
+                get_profile_dir(),
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence):04d}-{operation}",
+            )
+            _dump_stats(profiler, stem + ".prof")
+            report = {
+                "operation": operation,
+                "source": sanitize_path_for_log(source) if source else None,
+                "seconds": seconds,
+                "python_current_bytes": current,
+                "python_peak_bytes": peak,
+                "process_peak_rss_bytes": _peak_rss_bytes(),
+                "top_allocations": top,
+                "error": error,
+            }
+            with _private_open(stem + ".json", "w") as f:
+                json.dump(report, f, indent=2)
+        except OSError:
+            pass  # A failed dump never breaks the operation itself.
+        finally:
+            _active.release()
@@ -0,0 +1,530 @@
+"""Local watermarking service over HTTP (TCP or Unix socket), standard library only.
+
+Requests go through a bounded queue to a pool of warm worker processes that
+keep fonts, stamp caches and PyMuPDF loaded between jobs. A full queue is
+answered with 503 and Retry-After. A job still running after its timeout has
+its worker killed and replaced, and is answered with 504.
+
+Endpoints:
+    POST /v1/watermark?text=COPY&opacity=30&secure=1&format=PDF  (body: the image or PDF)
+        200 with the watermarked file, or a ZIP of the pages for PDF inputs
+        exported to an image format.
+    GET /v1/health   worker and queue state as JSON ("degraded" while a worker is down).
+    GET /metrics     Prometheus text of the workers' stage timings (--metrics).
+
+Usage:
+    python -m cli serve --port 8790 --workers 4
+    python -m cli serve --unix-socket /run/filigrane/filigrane.sock
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import socketserver
+import stat
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import metrics
+from batch import BatchOptions, watermark_bytes
+from constants import (
+    DEFAULT_ENCODER_PROFILE,
+    MAX_FILE_SIZE_BYTES,
+    PIL_COLOR_MAP,
+    SERVICE_DEFAULT_HOST,
+    SERVICE_DEFAULT_PORT,
+    SERVICE_JOB_TIMEOUT_SECONDS,
+    SERVICE_QUEUE_SIZE,
+    SERVICE_RESPAWN_DELAY_SECONDS,
+    SERVICE_RETRY_AFTER_SECONDS,
+    SERVICE_WORKER_START_SECONDS,
+)
+from encoding import ENCODER_PROFILES, IMAGE_FORMAT_EXTENSIONS, supported_image_formats
+from utils import detect_buffer_type
+from watermark import WatermarkParams, apply_watermark
+
+ORIENTATIONS = {"ascending": "Ascending (↗)", "descending": "Descending (↘)"}
+CONTENT_TYPES = {
+    "jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "avif": "image/avif",
+    "pdf": "application/pdf", "zip": "application/zip",
+}
+_SAFE_NAME = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]{0,127}")
+
+
+class UnsupportedInputError(ValueError):
+    """The request body is not a PDF, JPEG or PNG file."""
+
+
+class QueueFullError(RuntimeError):
+    """Raised by WorkerPool.submit when the job queue is at capacity."""
+
+
+class JobTimeoutError(TimeoutError):
+    """The job exceeded its timeout; its worker was replaced."""
+
+
+class WorkerCrashedError(RuntimeError):
+    """The worker process died while running the job; it was replaced."""
+
+
+@dataclass(frozen=True)
+class Job:
+    """One watermarking request, as sent to a worker process.
+
+    Attributes:
+        data: The input file contents (PDF, JPEG or PNG).
+        options: Batch settings; output_dir is ignored.
+        name: Stem of the output file names.
+        timeout: Seconds the job may run before its worker is killed.
+    """
+    data: bytes
+    options: BatchOptions
+    name: str = "document"
+    timeout: float = SERVICE_JOB_TIMEOUT_SECONDS
+
+
+@dataclass
+class JobResult:
+    """Outcome of a Job: (file name, contents) per output, or an error."""
+    outputs: list[tuple[str, bytes]] = field(default_factory=list)
+    error: str | None = None
+    seconds: float = 0.0
+    metrics: dict | None = None  # metrics.snapshot() of the worker, if collected
+
+
+# --- Worker processes ---
+
+def _warm_up() -> None:
+    """Load fonts, the stamp caches and PyMuPDF before the first job arrives."""
+    import fitz
+    from PIL import Image
+    from pdf_processing import apply_vector_watermark_to_pdf
+
+    params = WatermarkParams(text="COPY", opacity=30, font_size=36, spacing=150)
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buf, format="PNG")
+    apply_watermark(buf.getvalue(), params)
+    with fitz.open() as doc:
+        doc.new_page()
+        apply_vector_watermark_to_pdf(doc, params)
+
+
+def run_job(job: Job) -> JobResult:
+    """Watermark one job in memory (no temporary files). Never raises."""
+    if metrics.is_enabled():
+        metrics.REGISTRY.reset()
+    result = JobResult()
+    start = time.perf_counter()
+    try:
+        result.outputs = watermark_bytes(job.data, job.options, job.name)
+    except Exception as ex:
+        result.error = str(ex) or type(ex).__name__
+    result.seconds = time.perf_counter() - start
+    metrics.count("files" if result.error is None else "files_failed")
+    if metrics.is_enabled():
+        result.metrics = metrics.REGISTRY.snapshot()
+    return result
+
+
+def _worker_main(conn, collect_metrics: bool) -> None:
+    """Worker process loop: warm up, then run jobs received over conn until None."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C stops the server, which stops the workers.
+    if collect_metrics:
+        metrics.enable()
+    _warm_up()
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        conn.send(run_job(job))
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(self, context, collect_metrics: bool):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, collect_metrics),
+                                       name="filigrane-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        try:
+            if not self.conn.poll(SERVICE_WORKER_START_SECONDS):
+                raise WorkerCrashedError(f"Worker not ready after {SERVICE_WORKER_START_SECONDS}s.")
+            self.conn.recv()  # "ready", once warmed up
+        except BaseException:
+            self.kill()
+            raise
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Warm worker processes fed from a bounded queue, with per-job timeouts.
+
+    Each worker has a dispatcher thread that takes the next queued job, sends
+    it to its process and waits up to the job's timeout. A worker that times
+    out or dies is killed and replaced by a fresh, warmed-up one, so a runaway
+    job never holds a slot for longer than its timeout. The job's future is
+    resolved before the replacement starts. A replacement that fails to start
+    is retried every SERVICE_RESPAWN_DELAY_SECONDS; until then the pool runs
+    with fewer workers and reports itself as degraded.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = SERVICE_QUEUE_SIZE,
+                 collect_metrics: bool = False):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.collect_metrics = collect_metrics
+        self._context = multiprocessing.get_context("spawn")  # No fork of a threaded server
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closing = threading.Event()
+        self._counts = {"ready": 0, "in_flight": 0, "completed": 0, "failed": 0,
+                        "rejected": 0, "timed_out": 0, "crashed": 0, "start_failed": 0}
+        self._threads = [threading.Thread(target=self._dispatch, name=f"filigrane-dispatch-{i}",
+                                          daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._changed:
+            self._counts[name] += value
+            self._changed.notify_all()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Wait until every worker has warmed up; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._counts["ready"] == self.workers, timeout)
+
+    def submit(self, job: Job) -> Future:
+        """Queue a job; the future resolves to a JobResult.
+
+        Raises:
+            QueueFullError: If queue_size jobs are already waiting.
+        """
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((job, future))
+        except queue.Full:
+            self._count("rejected")
+            metrics.count("jobs_rejected")
+            raise QueueFullError(f"Job queue is full ({self.queue_size} waiting).") from None
+        return future
+
+    def _spawn(self) -> _Worker | None:
+        """Start a warm worker, retrying until one starts; None if the pool closes first."""
+        while not self._closing.is_set():
+            try:
+                worker = _Worker(self._context, self.collect_metrics)
+            except Exception:
+                self._count("start_failed")
+                metrics.count("worker_start_failures")
+                self._closing.wait(SERVICE_RESPAWN_DELAY_SECONDS)
+                continue
+            self._count("ready")
+            return worker
+        return None
+
+    def _replace(self, worker: _Worker) -> _Worker | None:
+        self._count("ready", -1)
+        worker.kill()
+        return self._spawn()
+
+    def _dispatch(self) -> None:
+        worker = self._spawn()
+        while worker is not None:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._count("in_flight")
+            failed = True
+            try:
+                worker.conn.send(job)
+                if worker.conn.poll(job.timeout):
+                    result = worker.conn.recv()
+                    failed = False
+                    self._count("completed" if result.error is None else "failed")
+                    if result.metrics is not None:
+                        metrics.REGISTRY.merge(result.metrics)
+                    future.set_result(result)
+                else:
+                    self._count("timed_out")
+                    metrics.count("jobs_timed_out")
+                    future.set_exception(JobTimeoutError(f"Job exceeded {job.timeout:g}s."))
+            except (EOFError, OSError):
+                self._count("crashed")
+                future.set_exception(WorkerCrashedError("Worker process exited during the job."))
+            finally:
+                self._count("in_flight", -1)
+            if failed:
+                worker = self._replace(worker)
+        if worker is not None:
+            self._count("ready", -1)
+            worker.stop()
+
+    def stats(self) -> dict:
+        """Return worker and queue counters (JSON-serializable)."""
+        with self._lock:
+            counts = dict(self._counts)
+        return {"workers": self.workers, "queue_size": self.queue_size,
+                "queued": self._queue.qsize(), **counts}
+
+    def max_wait(self, max_timeout: float) -> float:
+        """Upper bound (seconds) on the wait for a result, if no job may run over max_timeout.
+
+        Covers the jobs that may be queued ahead, each running to its timeout
+        and then waiting for its worker to be replaced.
+        """
+        rounds = math.ceil(self.queue_size / self.workers) + 1
+        return rounds * (max_timeout + SERVICE_WORKER_START_SECONDS)
+
+    def close(self) -> None:
+        """Finish queued jobs, then stop every worker."""
+        self._closing.set()  # Workers that failed to start are not retried.
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+# --- HTTP front end ---
+
+def _content_disposition(name: str) -> str:
+    """RFC 6266 attachment header value: an ASCII fallback plus the UTF-8 name."""
+    fallback = re.sub(r'[^A-Za-z0-9._-]', "_", name)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "on", "yes")
+
+
+def job_from_request(query: str, data: bytes, max_timeout: float = SERVICE_JOB_TIMEOUT_SECONDS) -> Job:
+    """Build a Job from a /v1/watermark query string and body.
+
+    Raises:
+        UnsupportedInputError: If data is not a PDF, JPEG or PNG file.
+        ValueError: For invalid parameters.
+    """
+    file_type = detect_buffer_type(data)
+    if file_type == "unknown":
+        raise UnsupportedInputError("Unsupported file format (expected a PDF, JPEG or PNG).")
+    fields = {key: values[-1] for key, values in parse_qs(query).items()}
+    try:
+        params = WatermarkParams(
+            text=fields.get("text", "COPY"),
+            opacity=int(fields.get("opacity", 30)),
+            font_size=int(fields.get("font_size", 36)),
+            spacing=int(fields.get("spacing", 150)),
+            color=fields.get("color", "White"),
+            orientation=ORIENTATIONS[fields.get("orientation", "ascending").lower()],
+        )
+        dpi = int(fields.get("dpi", 450))
+        max_bytes = int(fields["max_bytes"]) if "max_bytes" in fields else None
+        timeout = min(float(fields.get("timeout", max_timeout)), max_timeout)
+    except KeyError:
+        raise ValueError("orientation must be one of: " + ", ".join(ORIENTATIONS)) from None
+    if not params.text or len(params.text) > 200:
+        raise ValueError("text must be 1 to 200 characters.")
+    if not 0 <= params.opacity <= 100 or params.font_size < 1 or params.spacing < 1:
+        raise ValueError("opacity must be 0-100; font_size and spacing must be positive.")
+    if params.color not in PIL_COLOR_MAP:
+        raise ValueError("color must be one of: " + ", ".join(sorted(PIL_COLOR_MAP)))
+    if dpi not in (300, 450, 600):
+        raise ValueError("dpi must be 300, 450 or 600.")
+    if (max_bytes is not None and max_bytes < 1) or not timeout > 0:
+        raise ValueError("max_bytes and timeout must be positive.")
+    image_formats = [IMAGE_FORMAT_EXTENSIONS[f].upper() for f in supported_image_formats()]
+    fmt = fields.get("format", "PDF" if file_type == "pdf" else "JPG").upper()
+    if fmt not in (*image_formats, "PDF"):
+        raise ValueError("format must be one of: " + ", ".join((*image_formats, "PDF")))
+    profile = fields.get("encoder_profile", DEFAULT_ENCODER_PROFILE).lower()
+    if profile not in ENCODER_PROFILES:
+        raise ValueError("encoder_profile must be one of: " + ", ".join(sorted(ENCODER_PROFILES)))
+
+    options = BatchOptions(
+        params=params, output_dir="", secure=_flag(fields.get("secure", "0")), dpi=dpi,
+        image_format=fmt, pdf_format=fmt, encoder_profile=profile, max_bytes=max_bytes,
+    )
+    name = os.path.splitext(os.path.basename(fields.get("filename", "")))[0]
+    if not _SAFE_NAME.fullmatch(name):
+        name = "document"  # Output names end up in a response header.
+    return Job(data=data, options=options, name=name, timeout=timeout)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "Filigrane"
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/v1/health":
+            stats = self.server.pool.stats()
+            status = "ok" if stats["ready"] == stats["workers"] else "degraded"
+            self._send_json(200, {"status": status, **stats})
+        elif path == "/metrics" and metrics.is_enabled():
+            self._send(200, metrics.REGISTRY.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/v1/watermark":
+            self._send_json(404, {"error": "Not found."})
+            return
+        length = self.headers.get("Content-Length", "")
+        if not length.isdigit():
+            self._send_json(411, {"error": "Content-Length is required."})
+            return
+        if int(length) > MAX_FILE_SIZE_BYTES:
+            self.close_connection = True  # The body is not read.
+            self._send_json(413, {"error": f"Maximum upload size is {MAX_FILE_SIZE_BYTES // (1024 * 1024)} MB."})
+            return
+        data = self.rfile.read(int(length))
+        try:
+            job = job_from_request(url.query, data, self.server.job_timeout)
+            future = self.server.pool.submit(job)
+            try:
+                result = future.result(timeout=self.server.pool.max_wait(self.server.job_timeout))
+            except JobTimeoutError:
+                raise
+            except FutureTimeoutError:
+                future.cancel()
+                raise JobTimeoutError("No worker became available in time.") from None
+        except UnsupportedInputError as ex:
+            self._send_json(415, {"error": str(ex)})
+            return
+        except ValueError as ex:
+            self._send_json(400, {"error": str(ex)})
+            return
+        except QueueFullError as ex:
+            self._send_json(503, {"error": str(ex)}, {"Retry-After": str(SERVICE_RETRY_AFTER_SECONDS)})
+            return
+        except JobTimeoutError as ex:
+            self._send_json(504, {"error": str(ex)})
+            return
+        except WorkerCrashedError as ex:
+            self._send_json(500, {"error": str(ex)})
+            return
+        if result.error is not None:
+            self._send_json(422, {"error": result.error})
+            return
+
+        headers = {"X-Processing-Seconds": f"{result.seconds:.3f}"}
+        if len(result.outputs) == 1:
+            name, body = result.outputs[0]
+        else:
+            name, buf = f"{job.name}_pages.zip", io.BytesIO()
+            with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as archive:  # Pages are already compressed.
+                for page_name, page_data in result.outputs:
+                    archive.writestr(page_name, page_data)
+            body = buf.getvalue()
+        headers["Content-Disposition"] = _content_disposition(name)
+        self._send(200, body, CONTENT_TYPES.get(name.rsplit(".", 1)[-1], "application/octet-stream"), headers)
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        try:
+            mode = os.lstat(self.server_address).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{self.server_address} exists and is not a socket.")
+            os.remove(self.server_address)  # Left behind by a previous run.
+        old_umask = os.umask(0o177)  # Created as 0600, with no window of wider access.
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+
+def make_server(pool: WorkerPool, host: str = SERVICE_DEFAULT_HOST, port: int = SERVICE_DEFAULT_PORT,
+                unix_socket: str | None = None, job_timeout: float = SERVICE_JOB_TIMEOUT_SECONDS):
+    """Create (but do not start) the HTTP server in front of pool.
+
+    Listens on unix_socket if given (created with mode 0600), else on host:port.
+    """
+    if unix_socket:
+        server = _UnixServer(unix_socket, _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.pool = pool
+    server.job_timeout = job_timeout
+    return server
+
+
+def serve(host: str = SERVICE_DEFAULT_HOST, port: int = SERVICE_DEFAULT_PORT, unix_socket: str | None = None,
+          workers: int = 2, queue_size: int = SERVICE_QUEUE_SIZE,
+          job_timeout: float = SERVICE_JOB_TIMEOUT_SECONDS) -> None:
+    """Run the service until interrupted, then drain the queue and stop the workers."""
+    start = time.perf_counter()
+    pool = WorkerPool(workers, queue_size, collect_metrics=metrics.is_enabled())
+    server = make_server(pool, host, port, unix_socket, job_timeout)
+    pool.wait_ready()
+    where = unix_socket or f"http://{host}:{server.server_address[1]}"
+    print(f"Serving on {where} with {workers} warm worker(s), started in {time.perf_counter() - start:.1f}s",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
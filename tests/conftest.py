@@ -25,6 +25,12 @@ def find_all_controls(controls, control_type, results=None):
     return results
 
 
+@pytest.fixture(autouse=True)
+def _no_result_cache(monkeypatch):
+    """Keep tests from writing watermarked outputs to the real user cache."""
+    monkeypatch.setenv("PASSPORT_FILIGRANE_RESULT_CACHE", "0")
+
+
 @pytest.fixture
 def app():
     mock_page = MagicMock(spec=ft.Page)
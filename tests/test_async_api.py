@@ -0,0 +1,181 @@
+"""Tests for the asyncio facade (async_api.py)."""
+import asyncio
+import contextlib
+import io
+import threading
+import time
+import pytest
+import fitz
+from PIL import Image
+
+import async_api
+from async_api import AsyncEngine
+from pdf_processing import InvalidPdfError
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="ASYNC", opacity=30, font_size=36, spacing=150)
+
+
+def _jpeg(size=(400, 300)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (60, 110, 160)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _pdf(pages=3):
+    with fitz.open() as doc:
+        for i in range(pages):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        return doc.tobytes()
+
+
+class _Concurrency:
+    """Wraps a blocking function and records how many calls overlapped."""
+
+    def __init__(self, func, delay=0.1):
+        self.func, self.delay = func, delay
+        self.lock = threading.Lock()
+        self.running = self.peak = self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            return self.func(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_watermark_image_and_pdf():
+    async def main():
+        async with AsyncEngine() as engine:
+            image = await engine.watermark_image(_jpeg(), PARAMS, output_format="PNG")
+            vector = await engine.watermark_pdf(_pdf(), PARAMS)
+            secure = await engine.watermark_pdf(_pdf(), PARAMS, secure=True, dpi=300)
+        return image, vector, secure
+
+    image, vector, secure = asyncio.run(main())
+    assert Image.open(io.BytesIO(image)).size == (400, 300)
+    with fitz.open("pdf", vector) as doc:
+        assert len(doc) == 3 and "Page 2" in doc[1].get_text()
+    with fitz.open("pdf", secure) as doc:
+        assert len(doc) == 3 and doc[0].get_images()
+
+
+def test_event_loop_keeps_running():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        async with AsyncEngine() as engine:
+            await engine.watermark_pdf(_pdf(4), PARAMS, secure=True, dpi=450)
+        task.cancel()
+        return ticks, time.perf_counter() - start
+
+    ticks, seconds = asyncio.run(main())
+    assert ticks >= seconds / 0.01 / 3
+
+
+@pytest.mark.parametrize("limit", [1, 2])
+def test_max_in_flight(monkeypatch, limit):
+    probe = _Concurrency(async_api.apply_watermark)
+    monkeypatch.setattr(async_api, "apply_watermark", probe)
+
+    async def main():
+        async with AsyncEngine(max_in_flight=limit) as engine:
+            await asyncio.gather(*(engine.watermark_image(_jpeg(), PARAMS) for _ in range(5)))
+
+    asyncio.run(main())
+    assert probe.calls == 5 and probe.peak == limit
+
+
+def test_memory_budget(monkeypatch):
+    probe = _Concurrency(async_api.apply_watermark)
+    monkeypatch.setattr(async_api, "apply_watermark", probe)
+    cost = async_api.estimate_image_memory(400, 300, len(_jpeg()))
+
+    async def main():
+        async with AsyncEngine(max_in_flight=4, memory_budget=int(cost * 1.5)) as engine:
+            await asyncio.gather(*(engine.watermark_image(_jpeg(), PARAMS) for _ in range(3)))
+            with pytest.raises(ValueError, match="memory budget"):
+                await engine.watermark_image(_jpeg((800, 600)), PARAMS)
+
+    asyncio.run(main())
+    assert probe.calls == 3 and probe.peak == 1  # Two jobs never fit together
+
+
+def test_cancellation_reaches_the_engine(monkeypatch):
+    tokens = []
+    secure = async_api.apply_secure_raster_watermark_to_pdf
+
+    def recording(doc, params, cancel=None, **kwargs):
+        tokens.append(cancel)
+        return secure(doc, params, cancel=cancel, **kwargs)
+
+    monkeypatch.setattr(async_api, "apply_secure_raster_watermark_to_pdf", recording)
+
+    async def main():
+        async with AsyncEngine() as engine:
+            task = asyncio.create_task(engine.watermark_pdf(_pdf(20), PARAMS, secure=True, dpi=600))
+            while not tokens:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return engine.in_flight, engine.reserved_bytes
+
+    assert asyncio.run(main()) == (0, 0)
+    assert tokens[0].cancelled
+
+
+def test_iter_pdf_pages():
+    async def main():
+        async with AsyncEngine() as engine:
+            return [page async for page in engine.iter_pdf_pages(_pdf(3), PARAMS, secure=True, dpi=300)]
+
+    pages = asyncio.run(main())
+    assert len(pages) == 3
+    for page in pages:
+        with fitz.open("pdf", page) as doc:
+            assert len(doc) == 1 and doc[0].get_images()
+
+
+def test_iter_pdf_pages_stops_when_closed(monkeypatch):
+    probe = _Concurrency(async_api._watermark_document, delay=0.05)
+    monkeypatch.setattr(async_api, "_watermark_document", probe)
+
+    async def main():
+        async with AsyncEngine() as engine:
+            async with contextlib.aclosing(engine.iter_pdf_pages(_pdf(12), PARAMS)) as pages:
+                async for page in pages:
+                    with fitz.open("pdf", page) as doc:
+                        assert "Page 1" in doc[0].get_text()
+                    break
+            return engine.in_flight
+
+    assert asyncio.run(main()) == 0
+    assert probe.calls < 12
+
+
+def test_module_functions_and_errors():
+    async def main():
+        async_api.configure(max_in_flight=1)
+        assert async_api.get_engine().max_in_flight == 1
+        data = await async_api.watermark_image(_jpeg(), PARAMS)
+        with pytest.raises(InvalidPdfError):
+            await async_api.watermark_pdf(b"%PDF-1.7 truncated", PARAMS)
+        return data
+
+    assert asyncio.run(main())[:2] == b"\xff\xd8"
+    assert asyncio.run(main())[:2] == b"\xff\xd8"  # The engine is reusable from a new loop
@@ -0,0 +1,153 @@
+"""Tests for background exports: progress reporting, cancellation and the single-export guard."""
+import os
+import threading
+import pytest
+import fitz
+from unittest.mock import MagicMock, patch
+
+from watermark import WatermarkParams
+
+
+def _make_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=200).insert_text((20, 40), f"Page {i+1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def loaded_app(app, tmp_path):
+    event = MagicMock()
+    event.files = [MagicMock(path=_make_pdf(tmp_path / "dossier.pdf", 4))]
+    with patch.object(app, "update_preview"):
+        app.on_file_result(event)
+    return app
+
+
+class TestEngineProgress:
+    PARAMS = WatermarkParams(text="PROGRESS", opacity=30, font_size=12, spacing=60)
+
+    def test_vector_reports_every_page(self, tmp_path):
+        from pdf_processing import apply_vector_watermark_to_pdf
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 3))
+        calls = []
+        apply_vector_watermark_to_pdf(doc, self.PARAMS, on_page_done=lambda *a: calls.append(a))
+        assert [(done, total) for done, total, _ in calls] == [(1, 3), (2, 3), (3, 3)]
+
+    def test_secure_and_images_report_every_page(self, tmp_path):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf, save_pdf_as_images
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 3))
+        secure_calls, image_calls = [], []
+        secured = apply_secure_raster_watermark_to_pdf(
+            doc, self.PARAMS, dpi=72, on_page_done=lambda *a: secure_calls.append(a[0]),
+        )
+        save_pdf_as_images(secured, str(tmp_path / "out"), "p",
+                           on_page_done=lambda *a: image_calls.append(a[0]))
+        assert secure_calls == image_calls == [1, 2, 3]
+
+    def test_callback_exception_aborts_secure_job(self, tmp_path):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 5))
+        calls = []
+
+        def stop(done, total, elapsed):
+            calls.append(done)
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            apply_secure_raster_watermark_to_pdf(doc, self.PARAMS, dpi=72, on_page_done=stop)
+        assert calls == [1]
+
+
+class TestBackgroundExport:
+    def test_pdf_export_runs_off_the_calling_thread(self, loaded_app, tmp_path):
+        threads = []
+        original = loaded_app._report_export_progress
+
+        def progress(done, total):
+            threads.append(threading.get_ident())
+            original(done, total)
+
+        with patch.object(loaded_app, "_report_export_progress", progress):
+            loaded_app.on_save_result(MagicMock(path=str(tmp_path / "out.pdf")))
+            loaded_app.wait_for_export()
+        assert os.path.exists(tmp_path / "out.pdf")
+        assert len(threads) == 4 and threading.get_ident() not in threads
+        assert loaded_app.export_progress_container.visible is False
+
+    def test_progress_text_shows_rate_and_eta(self, loaded_app):
+        loaded_app._export_started -= 2.0
+        loaded_app._report_export_progress(2, 8)
+        assert loaded_app.export_progress_bar.value == 0.25
+        assert loaded_app.export_progress_text.value.startswith("2/8 pages")
+        assert "ETA" in loaded_app.export_progress_text.value
+
+    def test_controls_locked_and_single_export(self, loaded_app):
+        started, release = threading.Event(), threading.Event()
+        second_job = MagicMock()
+
+        def job(progress, cancel):
+            started.set()
+            release.wait(5)
+            return "done"
+
+        loaded_app._start_export(job, error_prefix="Error")
+        started.wait(5)
+        try:
+            assert loaded_app.is_exporting()
+            assert loaded_app.select_file_button.disabled
+            assert loaded_app.watermark_text.disabled
+            loaded_app._start_export(second_job, error_prefix="Error")
+        finally:
+            release.set()
+            loaded_app.wait_for_export()
+        second_job.assert_not_called()
+        assert not loaded_app.select_file_button.disabled
+        assert not loaded_app.watermark_text.disabled
+
+    def test_cancel_removes_partial_images(self, loaded_app, tmp_path):
+        out_dir = tmp_path / "images"
+        out_dir.mkdir()
+        (out_dir / "dossier_page_004.jpg").write_bytes(b"from an earlier export")
+        original = loaded_app._report_export_progress
+
+        def progress(done, total):
+            if done == 6:  # watermarking done, two images written
+                loaded_app.on_cancel_export()
+            original(done, total)
+
+        with patch.object(loaded_app, "_report_export_progress", progress), \
+                patch.object(loaded_app, "_show_success") as mock_success:
+            loaded_app.on_dir_result(MagicMock(path=str(out_dir)))
+            loaded_app.wait_for_export()
+        mock_success.assert_called_once_with("Export cancelled.")
+        # Nothing from the cancelled export is left behind or overwritten.
+        assert os.listdir(out_dir) == ["dossier_page_004.jpg"]
+        assert (out_dir / "dossier_page_004.jpg").read_bytes() == b"from an earlier export"
+
+    def test_cancelled_vector_export_restores_source(self, loaded_app, tmp_path):
+        original = loaded_app._report_export_progress
+
+        def progress(done, total):
+            if done == 2:
+                loaded_app.on_cancel_export()
+            original(done, total)
+
+        with patch.object(loaded_app, "_report_export_progress", progress):
+            loaded_app.on_save_result(MagicMock(path=str(tmp_path / "out.pdf")))
+            loaded_app.wait_for_export()
+        assert not os.path.exists(tmp_path / "out.pdf")
+        assert loaded_app.pdf_doc.page_count == 4
+        assert "COPY" not in loaded_app.pdf_doc.load_page(0).get_text()
+
+    def test_failure_reports_error_and_unlocks(self, loaded_app):
+        def job(progress, cancel):
+            raise RuntimeError("disk full")
+
+        with patch.object(loaded_app, "_show_error") as mock_error:
+            loaded_app._start_export(job, error_prefix="Error while saving")
+            loaded_app.wait_for_export()
+        mock_error.assert_called_once_with("Error while saving: disk full")
+        assert not loaded_app.is_exporting()
@@ -0,0 +1,151 @@
+"""Tests for batch.py and the headless `cli.py batch` command."""
+import os
+import fitz
+import pytest
+from PIL import Image
+
+from watermark import WatermarkParams
+
+
+@pytest.fixture
+def params():
+    return WatermarkParams(text="BATCH", opacity=40, font_size=24, spacing=80, color="Black")
+
+
+@pytest.fixture
+def inputs_dir(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    Image.new("RGB", (120, 90), "blue").save(src / "scan_a.jpg")
+    Image.new("RGB", (90, 120), "red").save(src / "scan_b.png")
+    doc = fitz.open()
+    for i in range(2):
+        doc.new_page().insert_text((50, 50), f"Page {i+1}")
+    doc.save(str(src / "contract.pdf"))
+    doc.close()
+    (src / "notes.txt").write_text("not a document")
+    return src
+
+
+class TestExpandInputs:
+    def test_globs_are_sorted_and_deduplicated(self, inputs_dir):
+        from batch import expand_inputs
+        files = expand_inputs([str(inputs_dir / "*.jpg"), str(inputs_dir / "scan_*")])
+        assert [os.path.basename(f) for f in files] == ["scan_a.jpg", "scan_b.png"]
+
+    def test_manifest_resolves_relative_entries(self, inputs_dir):
+        from batch import expand_inputs
+        manifest = inputs_dir / "manifest.txt"
+        manifest.write_text("# comment\n\ncontract.pdf\n*.png\n")
+        files = expand_inputs([], str(manifest))
+        assert [os.path.basename(f) for f in files] == ["contract.pdf", "scan_b.png"]
+
+
+class TestProcessFile:
+    def test_image_to_jpg(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path))
+        result = process_file(str(inputs_dir / "scan_a.jpg"), options)
+        assert result.ok
+        assert Image.open(result.outputs[0]).format == "JPEG"
+
+    def test_image_to_pdf(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path), image_format="PDF")
+        result = process_file(str(inputs_dir / "scan_b.png"), options)
+        assert result.ok
+        assert fitz.open(result.outputs[0]).page_count == 1
+
+    def test_pdf_vector(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path))
+        result = process_file(str(inputs_dir / "contract.pdf"), options)
+        assert result.ok
+        doc = fitz.open(result.outputs[0])
+        assert "BATCH" in doc.load_page(0).get_text()
+
+    def test_pdf_secure_to_png_images(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path), secure=True,
+                               dpi=300, pdf_format="PNG")
+        result = process_file(str(inputs_dir / "contract.pdf"), options)
+        assert result.ok
+        assert len(result.outputs) == 2
+        assert all(os.path.exists(p) and p.endswith(".png") for p in result.outputs)
+
+    def test_unsupported_file_reports_error(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path))
+        result = process_file(str(inputs_dir / "notes.txt"), options)
+        assert not result.ok
+        assert "Unsupported" in result.error
+
+    def test_protected_pdf_reports_error(self, protected_pdf, tmp_path, params):
+        from batch import BatchOptions, process_file
+        options = BatchOptions(params=params, output_dir=str(tmp_path))
+        result = process_file(protected_pdf, options)
+        assert "password-protected" in result.error
+
+
+class TestRunBatch:
+    def test_parallel_matches_inline(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, expand_inputs, run_batch
+        sources = expand_inputs([str(inputs_dir / "*")])
+        options = BatchOptions(params=params, output_dir=str(tmp_path / "out"))
+        summary = run_batch(sources, options, jobs=2)
+        assert [r.source for r in summary.results] == sources
+        assert summary.succeeded == 3
+        assert summary.failed == 1
+
+    def test_same_stem_inputs_do_not_overwrite(self, tmp_path, params):
+        from batch import BatchOptions, expand_inputs, run_batch
+        for folder in ("a", "b"):
+            (tmp_path / "in" / folder).mkdir(parents=True)
+            Image.new("RGB", (40, 30), "blue").save(tmp_path / "in" / folder / "id.jpg")
+        Image.new("RGB", (40, 30), "red").save(tmp_path / "in" / "a" / "id.png")
+        sources = expand_inputs([str(tmp_path / "in" / "**" / "*")])
+        options = BatchOptions(params=params, output_dir=str(tmp_path / "out"))
+        summary = run_batch(sources, options, jobs=2)
+        outputs = [path for r in summary.results for path in r.outputs]
+        assert summary.succeeded == 3 and len(set(outputs)) == 3
+        assert sorted(os.path.relpath(p, tmp_path / "out") for p in outputs) == [
+            os.path.join("a", "id_jpg_export_filigree.jpg"),
+            os.path.join("a", "id_png_export_filigree.jpg"),
+            os.path.join("b", "id_export_filigree.jpg"),
+        ]
+        assert all(os.path.exists(p) for p in outputs)
+
+    def test_output_stems(self):
+        from batch import output_stems
+        assert output_stems(["/in/x.pdf", "/in/y.pdf"]) == ["x", "y"]
+        assert output_stems(["/in/x.JPG", "/in/x.jpg", "/in/x_jpg.png"]) == ["x_jpg", "x_jpg_2", "x_jpg_3"]
+
+    def test_report_includes_throughput_and_latency(self, inputs_dir, tmp_path, params):
+        from batch import BatchOptions, run_batch
+        options = BatchOptions(params=params, output_dir=str(tmp_path / "out"))
+        summary = run_batch([str(inputs_dir / "scan_a.jpg")], options)
+        report = summary.format_report()
+        assert "files/s" in report
+        assert "p95=" in report
+
+
+class TestCli:
+    def test_batch_command(self, inputs_dir, tmp_path, capsys):
+        from cli import main
+        out_dir = tmp_path / "cli_out"
+        code = main([
+            "batch", str(inputs_dir / "*.jpg"), "-o", str(out_dir),
+            "--text", "AGENCY", "--color", "Gray", "--orientation", "descending",
+            "--image-format", "png",
+        ])
+        assert code == 0
+        assert os.listdir(out_dir) == ["scan_a_export_filigree.png"]
+        assert "1 ok" in capsys.readouterr().out
+
+    def test_batch_command_no_matches(self, tmp_path):
+        from cli import main
+        assert main(["batch", str(tmp_path / "*.jpg"), "-o", str(tmp_path)]) == 2
+
+    def test_batch_command_failure_exit_code(self, inputs_dir, tmp_path):
+        from cli import main
+        assert main(["batch", str(inputs_dir / "notes.txt"), "-o", str(tmp_path)]) == 1
@@ -0,0 +1,185 @@
+"""Tests for cache.py: content-addressed result cache and its app integration."""
+import os
+import stat
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+from watermark import WatermarkParams
+
+
+@pytest.fixture
+def params():
+    return WatermarkParams(text="COPY", opacity=30, font_size=36, spacing=150)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    from cache import ResultCache
+    return ResultCache(directory=str(tmp_path / "cache"), max_bytes=1000)
+
+
+class TestCacheSwitch:
+    def test_disabled_by_environment(self, monkeypatch):
+        from cache import is_result_cache_enabled
+        for value in ("0", "false", "OFF", "no"):
+            monkeypatch.setenv("PASSPORT_FILIGRANE_RESULT_CACHE", value)
+            assert is_result_cache_enabled() is False
+
+    def test_enabled_by_environment(self, monkeypatch):
+        from cache import is_result_cache_enabled
+        for value in ("1", "true", "ON", "yes"):
+            monkeypatch.setenv("PASSPORT_FILIGRANE_RESULT_CACHE", value)
+            assert is_result_cache_enabled() is True
+
+    def test_disabled_by_default(self, monkeypatch):
+        from cache import is_result_cache_enabled
+        monkeypatch.delenv("PASSPORT_FILIGRANE_RESULT_CACHE", raising=False)
+        assert is_result_cache_enabled() is False
+
+
+class TestMakeCacheKey:
+    def test_hash_file_streams_content(self, tmp_path):
+        import hashlib
+        from cache import hash_file
+        path = tmp_path / "doc.bin"
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        path.write_bytes(data)
+        assert hash_file(str(path)) == hashlib.sha256(data).hexdigest()
+
+    def test_float_and_int_params_share_key(self, params):
+        from cache import make_cache_key
+        as_float = WatermarkParams(text="COPY", opacity=30.0, font_size=36, spacing=150)
+        assert make_cache_key("abc", params, "vector", "PDF") == make_cache_key("abc", as_float, "vector", "pdf")
+
+    def test_dpi_only_matters_in_secure_mode(self, params):
+        from cache import make_cache_key
+        assert make_cache_key("abc", params, "vector", "PDF", dpi=300) == \
+            make_cache_key("abc", params, "vector", "PDF", dpi=600)
+        assert make_cache_key("abc", params, "secure", "PDF", dpi=300) != \
+            make_cache_key("abc", params, "secure", "PDF", dpi=600)
+
+    def test_every_setting_changes_key(self, params):
+        from cache import make_cache_key
+        base = make_cache_key("abc", params, "vector", "PDF")
+        assert make_cache_key("abd", params, "vector", "PDF") != base
+        assert make_cache_key("abc", params, "secure", "PDF", dpi=300) != base
+        assert make_cache_key("abc", params, "vector", "JPG") != base
+        changed = WatermarkParams(text="COPY", opacity=31, font_size=36, spacing=150)
+        assert make_cache_key("abc", changed, "vector", "PDF") != base
+
+
+class TestResultCache:
+    def test_miss_then_hit(self, cache):
+        assert cache.get("k1") is None
+        cache.put("k1", b"data")
+        assert cache.get("k1") == b"data"
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+    def test_restrictive_permissions(self, cache):
+        cache.put("k1", b"data")
+        dir_mode = stat.S_IMODE(os.stat(cache.directory).st_mode)
+        file_mode = stat.S_IMODE(os.stat(os.path.join(cache.directory, "k1.bin")).st_mode)
+        assert dir_mode == 0o700
+        assert file_mode == 0o600
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put("old", b"a" * 400)
+        cache.put("used", b"b" * 400)
+        os.utime(os.path.join(cache.directory, "old.bin"), (1, 1))
+        os.utime(os.path.join(cache.directory, "used.bin"), (2, 2))
+        cache.get("old")  # refreshes "old", leaving "used" least recently used
+        cache.put("new", b"c" * 400)
+        assert cache.get("used") is None
+        assert cache.get("old") is not None
+        assert cache.get("new") is not None
+        assert cache.size_bytes() <= cache.max_bytes
+
+    def test_oversized_entry_not_stored(self, cache):
+        cache.put("huge", b"x" * 2000)
+        assert cache.get("huge") is None
+
+    def test_clear(self, cache):
+        cache.put("k1", b"data")
+        cache.clear()
+        assert cache.size_bytes() == 0
+
+
+class TestAppIntegration:
+    @pytest.fixture
+    def cached_app(self, app, tmp_path, sample_pdf):
+        from cache import ResultCache
+        app.result_cache = ResultCache(directory=str(tmp_path / "app_cache"))
+        event = MagicMock()
+        event.files = [MagicMock(path=sample_pdf)]
+        with patch.object(app, "update_preview"):
+            app.on_file_result(event)
+        return app
+
+    def test_cache_disabled_in_app(self, app):
+        assert app.result_cache is None
+
+    def test_pdf_save_hit_skips_watermarking(self, cached_app, tmp_path):
+        first, second = MagicMock(path=str(tmp_path / "a.pdf")), MagicMock(path=str(tmp_path / "b.pdf"))
+        cached_app.on_save_result(first)
+        cached_app.wait_for_export()
+        with patch.object(cached_app, "_apply_watermark_to_pdf") as mock_apply:
+            cached_app.on_save_result(second)
+            cached_app.wait_for_export()
+        mock_apply.assert_not_called()
+        assert (tmp_path / "b.pdf").read_bytes() == (tmp_path / "a.pdf").read_bytes()
+
+    def test_settings_change_misses(self, cached_app, tmp_path):
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "a.pdf")))
+        cached_app.wait_for_export()
+        cached_app.watermark_text.value = "OTHER"
+        with patch.object(cached_app, "_apply_watermark_to_pdf",
+                          wraps=cached_app._apply_watermark_to_pdf) as mock_apply:
+            cached_app.on_save_result(MagicMock(path=str(tmp_path / "b.pdf")))
+            cached_app.wait_for_export()
+        mock_apply.assert_called_once()
+
+    def test_repeated_vector_exports_carry_one_watermark(self, cached_app, tmp_path):
+        import fitz
+        cached_app.watermark_text.value = "FIRST"
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "a.pdf")))
+        cached_app.wait_for_export()
+        cached_app.watermark_text.value = "SECOND"
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "b.pdf")))
+        cached_app.wait_for_export()
+        with fitz.open(str(tmp_path / "b.pdf")) as doc:
+            text = "".join(page.get_text() for page in doc)
+        assert "SECOND" in text and "FIRST" not in text
+        assert all("FIRST" not in page.get_text() for page in cached_app.pdf_doc)
+
+    def test_image_export_reuses_cached_pdf(self, cached_app, tmp_path):
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "a.pdf")))
+        cached_app.wait_for_export()
+        cached_app.export_format_dropdown.value = "Images (PNG)"
+        with patch.object(cached_app, "_apply_watermark_to_pdf") as mock_apply:
+            cached_app.on_dir_result(MagicMock(path=str(tmp_path / "images")))
+            cached_app.wait_for_export()
+        mock_apply.assert_not_called()
+        assert sorted(os.listdir(tmp_path / "images")) == ["test_page_001.png", "test_page_002.png"]
+
+    def test_key_uses_the_loaded_content(self, cached_app, sample_pdf, tmp_path):
+        import hashlib
+        with open(sample_pdf, "rb") as f:
+            loaded = f.read()
+        with open(sample_pdf, "wb") as f:  # Changed on disk after loading.
+            f.write(b"%PDF-1.7 something else")
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "a.pdf")))
+        cached_app.wait_for_export()
+        assert cached_app._source_digest == hashlib.sha256(loaded).hexdigest()
+        assert (tmp_path / "a.pdf").read_bytes().startswith(b"%PDF-")
+
+    def test_hit_write_is_atomic(self, cached_app, tmp_path):
+        cached_app.on_save_result(MagicMock(path=str(tmp_path / "a.pdf")))
+        cached_app.wait_for_export()
+        target = tmp_path / "b.pdf"
+        target.write_bytes(b"previous")
+        with patch("os.replace", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                cached_app._write_output(str(target), b"new")
+        assert target.read_bytes() == b"previous"
+        assert sorted(os.listdir(tmp_path)) == ["a.pdf", "app_cache", "b.pdf", "test.pdf"]
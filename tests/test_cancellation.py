@@ -0,0 +1,102 @@
+"""Tests for cooperative cancellation and atomic outputs in pdf_processing."""
+import os
+import time
+import pytest
+import fitz
+from unittest.mock import patch
+
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="CANCEL", opacity=30, font_size=12, spacing=60)
+
+
+def _make_doc(pages, size=300):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=size, height=size).insert_text((20, 40), f"Page {i+1}")
+    return doc
+
+
+class TestCancelToken:
+    def test_flag(self):
+        from pdf_processing import CancelToken, OperationCancelled
+        token = CancelToken()
+        token.raise_if_cancelled()
+        assert not token.cancelled
+        token.cancel()
+        assert token.cancelled
+        with pytest.raises(OperationCancelled):
+            token.raise_if_cancelled()
+
+    def test_precancelled_vector_job_touches_nothing(self):
+        from pdf_processing import CancelToken, OperationCancelled, apply_vector_watermark_to_pdf
+        doc = _make_doc(3)
+        token = CancelToken()
+        token.cancel()
+        with pytest.raises(OperationCancelled):
+            apply_vector_watermark_to_pdf(doc, PARAMS, cancel=token)
+        assert all("CANCEL" not in page.get_text() for page in doc)
+
+
+class TestSecureCancellation:
+    @pytest.mark.parametrize("window", [1, 4])
+    def test_600_dpi_job_stops_within_one_page(self, window):
+        import pdf_processing
+        from pdf_processing import CancelToken, OperationCancelled
+        doc = _make_doc(8)
+        token = CancelToken()
+        renders = []
+        state = {}
+        real_render = pdf_processing._render_secure_page
+
+        def counting_render(page, dpi, gray=False):
+            renders.append(page.number)
+            return real_render(page, dpi, gray)
+
+        def on_page_done(done, total, elapsed):
+            state["page_seconds"] = elapsed
+            state["cancelled_at"] = time.perf_counter()
+            token.cancel()
+
+        with patch.object(pdf_processing, "_render_secure_page", counting_render):
+            with pytest.raises(OperationCancelled):
+                pdf_processing.apply_secure_raster_watermark_to_pdf(
+                    doc, PARAMS, dpi=600, window=window, on_page_done=on_page_done, cancel=token,
+                )
+        stop_seconds = time.perf_counter() - state["cancelled_at"]
+        # No page is started after the cancel; only work already in flight finishes.
+        assert len(renders) == window
+        assert stop_seconds <= state["page_seconds"]
+
+
+class TestAtomicOutputs:
+    def test_cancelled_image_export_leaves_directory_untouched(self, tmp_path):
+        from pdf_processing import CancelToken, OperationCancelled, save_pdf_as_images
+        out_dir = tmp_path / "out"
+        out_dir.mkdir()
+        (out_dir / "p_page_002.png").write_bytes(b"previous")
+        token = CancelToken()
+
+        def on_page_done(done, total, elapsed):
+            if done == 3:
+                token.cancel()
+
+        with pytest.raises(OperationCancelled):
+            save_pdf_as_images(_make_doc(6, size=100), str(out_dir), "p", img_format="PNG",
+                               on_page_done=on_page_done, cancel=token)
+        assert os.listdir(out_dir) == ["p_page_002.png"]
+        assert (out_dir / "p_page_002.png").read_bytes() == b"previous"
+
+    def test_failed_pdf_save_leaves_no_file(self, tmp_path):
+        from pdf_processing import save_watermarked_pdf
+        doc = _make_doc(1)
+        with patch.object(fitz.Document, "save", side_effect=RuntimeError("disk full")):
+            with pytest.raises(RuntimeError):
+                save_watermarked_pdf(doc, str(tmp_path / "out.pdf"))
+        assert os.listdir(tmp_path) == []
+
+    def test_successful_save_leaves_no_part_file(self, tmp_path):
+        from pdf_processing import save_watermarked_pdf
+        save_watermarked_pdf(_make_doc(1), str(tmp_path / "out.pdf"))
+        assert os.listdir(tmp_path) == ["out.pdf"]
+        assert fitz.open(str(tmp_path / "out.pdf")).page_count == 1
@@ -0,0 +1,82 @@
+"""Tests for the deterministic synthetic corpus (benchmarks/corpus.py)."""
+import os
+import pytest
+import fitz
+from PIL import Image
+
+from benchmarks.corpus import SCALES, CorpusScale, generate_corpus
+
+TINY = CorpusScale(scan_dpis=(100,), scan_pages=1, contract_pages=2, mixed_pages=4,
+                   oversized_pages=1, image_sizes=((400, 300),))
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    return {item.name: item for item in generate_corpus(TINY, seed=7, directory=str(tmp_path_factory.mktemp("c")))}
+
+
+def _contents(items):
+    out = {}
+    for item in items:
+        with open(item.path, "rb") as f:
+            out[item.name] = f.read()
+    return out
+
+
+def test_items(corpus):
+    assert sorted(corpus) == sorted([
+        "scan_100dpi.pdf", "contract.pdf", "mixed.pdf", "oversized.pdf", "photo_400x300.jpg", "photo_400x300.png",
+    ])
+    for item in corpus.values():
+        if item.kind == "image":
+            with Image.open(item.path) as img:
+                assert img.size == (item.width, item.height)
+        else:
+            with fitz.open(item.path) as doc:
+                assert len(doc) == item.pages
+                assert doc[0].rect == fitz.Rect(0, 0, item.width, item.height)
+
+
+def test_same_seed_same_bytes(corpus, tmp_path):
+    again = _contents(generate_corpus(TINY, seed=7, directory=str(tmp_path)))
+    assert again == _contents(corpus.values())
+    other = _contents(generate_corpus(TINY, seed=8, directory=str(tmp_path / "other")))
+    assert other["contract.pdf"] != again["contract.pdf"]
+    assert other["photo_400x300.png"] != again["photo_400x300.png"]
+
+
+def test_cache_is_reused(tmp_path, monkeypatch):
+    from benchmarks import corpus as corpus_module
+    generate_corpus(TINY, seed=1, directory=str(tmp_path))
+    monkeypatch.setattr(corpus_module, "build_contract_pdf", lambda *a: pytest.fail("regenerated"))
+    generate_corpus(TINY, seed=1, directory=str(tmp_path))
+    os.remove(tmp_path / "mixed.pdf")
+    with pytest.raises(pytest.fail.Exception):
+        generate_corpus(TINY, seed=1, directory=str(tmp_path))
+
+
+def test_scans_are_detected_at_their_dpi(corpus):
+    from pdf_processing import detect_scanned_page, is_grayscale_page
+    with fitz.open(corpus["scan_100dpi.pdf"].path) as doc:
+        scan = detect_scanned_page(doc[0])
+        assert scan is not None and round(scan.dpi) == 100
+        assert is_grayscale_page(doc[0])
+    with fitz.open(corpus["mixed.pdf"].path) as doc:
+        assert [detect_scanned_page(page) is not None for page in doc] == [False, False, False, True]
+
+
+def test_corpus_runs_through_batch(corpus, tmp_path):
+    from batch import BatchOptions, run_batch
+    from watermark import WatermarkParams
+    options = BatchOptions(params=WatermarkParams(text="CORPUS", opacity=30, font_size=24, spacing=120),
+                           output_dir=str(tmp_path), secure=True, dpi=300)
+    summary = run_batch([item.path for item in corpus.values()], options)
+    assert summary.failed == 0, summary.format_report()
+    outputs = [path for result in summary.results for path in result.outputs]
+    assert len(set(outputs)) == len(outputs)  # photo_400x300.jpg and .png must not collide
+
+
+def test_standard_scales():
+    assert SCALES["small"].image_sizes[0] == (3840, 2160)
+    assert max(w for w, _ in SCALES["large"].image_sizes) == 20000
+    assert set(SCALES["large"].scan_dpis) == {150, 300, 600}
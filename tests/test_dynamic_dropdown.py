@@ -32,6 +32,7 @@ def test_dropdown_options_for_pdf(app):
     mock_event.files = [MagicMock(path="test.pdf")]
 
     with patch("app.detect_file_type", return_value="pdf"), \
+         patch("builtins.open", mock_open(read_data=b"%PDF-1.7")), \
          patch("pdf_processing.load_pdf", return_value=(MagicMock(), 1)), \
          patch("app.validate_file_size"):
         app.on_file_result(mock_event)
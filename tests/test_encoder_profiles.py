@@ -0,0 +1,141 @@
+"""Tests for encoder profiles and WebP/AVIF export."""
+import io
+import os
+import pytest
+import fitz
+from PIL import Image, ImageFilter
+from unittest.mock import MagicMock
+
+from encoding import (
+    ENCODER_PROFILES, encode_pil_image, get_encoder_profile, normalize_image_format,
+    supported_image_formats,
+)
+from watermark import WatermarkParams, apply_watermark
+
+PARAMS = WatermarkParams(text="PROFILE", opacity=40, font_size=20, spacing=80)
+
+requires_webp = pytest.mark.skipif("WEBP" not in supported_image_formats(), reason="Pillow without WebP")
+
+
+def _photo(size=(400, 300)):
+    img = Image.radial_gradient("L").resize(size).convert("RGB")
+    return Image.blend(img, Image.effect_noise(size, 25).convert("RGB"), 0.2).filter(ImageFilter.SMOOTH)
+
+
+def _photo_bytes():
+    buf = io.BytesIO()
+    _photo().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class TestProfiles:
+    def test_default_is_balanced(self):
+        assert get_encoder_profile() is ENCODER_PROFILES["balanced"]
+        assert get_encoder_profile("Smallest") is ENCODER_PROFILES["smallest"]
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError, match="Unknown encoder profile"):
+            get_encoder_profile("tiny")
+
+    def test_balanced_jpeg_matches_previous_encoder(self):
+        img = _photo()
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        assert encode_pil_image(img, "JPG", "balanced") == buf.getvalue()
+
+    def test_smallest_beats_fast(self):
+        img = _photo((800, 600))
+        for fmt in ("JPEG", "PNG"):
+            assert len(encode_pil_image(img, fmt, "smallest")) < len(encode_pil_image(img, fmt, "fast"))
+
+    def test_fast_jpeg_differs_from_balanced(self):
+        img = _photo((800, 600))
+        assert len(encode_pil_image(img, "JPEG", "fast")) < len(encode_pil_image(img, "JPEG", "balanced"))
+
+    def test_smallest_jpeg_is_progressive(self):
+        data = encode_pil_image(_photo(), "JPEG", "smallest")
+        assert Image.open(io.BytesIO(data)).info.get("progressive")
+
+    def test_format_names(self):
+        assert normalize_image_format("jpg") == "JPEG"
+        with pytest.raises(ValueError, match="Unsupported image format"):
+            normalize_image_format("BMP")
+
+
+class TestExports:
+    @requires_webp
+    def test_apply_watermark_webp(self):
+        data = apply_watermark(_photo_bytes(), PARAMS, output_format="WEBP", profile="fast")
+        assert Image.open(io.BytesIO(data)).format == "WEBP"
+
+    @requires_webp
+    def test_pdf_pages_as_webp(self, tmp_path):
+        from pdf_processing import save_pdf_as_images
+        doc = fitz.open()
+        doc.new_page(width=100, height=100).insert_text((10, 50), "Page")
+        save_pdf_as_images(doc, str(tmp_path), "p", img_format="WEBP", profile="smallest")
+        assert os.listdir(tmp_path) == ["p_page_001.webp"]
+
+    def test_secure_profile_changes_output(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        buf = io.BytesIO()
+        _photo().save(buf, format="JPEG")
+        doc = fitz.open()
+        doc.new_page(width=200, height=150).insert_image(fitz.Rect(0, 0, 200, 150), stream=buf.getvalue())
+        sizes = {
+            name: len(apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=150, profile=name).tobytes())
+            for name in ("balanced", "smallest")
+        }
+        assert sizes["smallest"] < sizes["balanced"]
+
+    @requires_webp
+    def test_batch_profile_and_format(self, tmp_path):
+        from batch import BatchOptions, process_file
+        source = tmp_path / "photo.png"
+        source.write_bytes(_photo_bytes())
+        options = BatchOptions(params=PARAMS, output_dir=str(tmp_path), image_format="WEBP",
+                               encoder_profile="fast")
+        result = process_file(str(source), options)
+        assert result.ok and result.outputs[0].endswith(".webp")
+
+    def test_cli_accepts_profile(self):
+        from cli import build_parser
+        args = build_parser().parse_args(["batch", "x.jpg", "-o", "out", "--encoder-profile", "Smallest"])
+        assert args.encoder_profile == "smallest"
+
+
+class TestAppEncoderProfile:
+    def test_profile_dropdown_shown_with_export_options(self, app):
+        app.update_export_options("pdf")
+        assert app.encoder_profile_dropdown.visible
+        assert [o.key for o in app.encoder_profile_dropdown.options] == list(ENCODER_PROFILES)
+        assert app.encoder_profile_dropdown.value == "balanced"
+        app.update_export_options(None)
+        assert not app.encoder_profile_dropdown.visible
+
+    @requires_webp
+    def test_webp_export_offered(self, app):
+        app.update_export_options("pdf")
+        assert "Images (WEBP)" in [o.key for o in app.export_format_dropdown.options]
+        app.export_format_dropdown.value = "Images (WEBP)"
+        assert app._selected_image_format() == "WEBP"
+
+    def test_cache_key_depends_on_profile(self):
+        from cache import make_cache_key
+        keys = {make_cache_key("d" * 64, PARAMS, "secure", "PDF", dpi=300, encoder_profile=p)
+                for p in ENCODER_PROFILES}
+        assert len(keys) == len(ENCODER_PROFILES)
+
+    @requires_webp
+    def test_image_preview_uses_selected_profile(self, app, tmp_path):
+        source = tmp_path / "photo.png"
+        source.write_bytes(_photo_bytes())
+        event = MagicMock()
+        event.files = [MagicMock(path=str(source))]
+        app.on_file_result(event)
+        app.update_timer.join()
+        app.export_format_dropdown.value = "WEBP"
+        app.encoder_profile_dropdown.value = "smallest"
+        app.update_preview()
+        app.update_timer.join()
+        assert Image.open(io.BytesIO(app.watermarked_image_bytes)).format == "WEBP"
@@ -0,0 +1,129 @@
+"""Tests for content-aware encoding of secure raster pages."""
+import io
+import pytest
+import fitz
+from PIL import Image, ImageChops, ImageDraw
+
+from encoding import (
+    ENCODING_BILEVEL, ENCODING_FLATE, ENCODING_JPEG,
+    classify_image, encode_image, insert_encoded_image,
+)
+from watermark import WatermarkParams
+
+
+def _line_art(mode="L"):
+    img = Image.new(mode, (400, 300), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(20, 300, 30):
+        draw.text((20, y), "Terms and conditions apply", fill="black")
+    draw.rectangle((250, 40, 380, 120), outline="black", fill="gray")
+    return img
+
+
+def _photo(mode="RGB"):
+    img = Image.radial_gradient("L").resize((400, 300))
+    return Image.blend(img, Image.effect_noise((400, 300), 30), 0.3).convert(mode)
+
+
+def _roundtrip(encoded):
+    """Embed an encoded image in a PDF and decode it back to a PIL image."""
+    doc = fitz.open()
+    page = doc.new_page(width=encoded.width, height=encoded.height)
+    insert_encoded_image(page, page.rect, encoded)
+    reopened = fitz.open("pdf", doc.tobytes())
+    xref = reopened[0].get_images()[0][0]
+    pix = fitz.Pixmap(reopened, xref)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples), reopened.xref_get_key(xref, "Filter")[1]
+
+
+class TestClassifyImage:
+    @pytest.mark.parametrize("mode", ["L", "RGB", "RGBA"])
+    def test_line_art_is_flate(self, mode):
+        assert classify_image(_line_art(mode)) == ENCODING_FLATE
+
+    def test_photo_is_jpeg(self):
+        assert classify_image(_photo()) == ENCODING_JPEG
+
+    def test_two_colours_is_bilevel(self):
+        img = _line_art("L").point(lambda v: 255 if v > 128 else 0)
+        assert classify_image(img) == ENCODING_BILEVEL
+
+    def test_semi_transparent_watermark_is_not_bilevel(self):
+        from watermark import apply_watermark_to_pil_image
+        page = _line_art("L").point(lambda v: 255 if v > 128 else 0)
+        params = WatermarkParams(text="COPY", opacity=30, font_size=20, spacing=80, color="Black")
+        assert classify_image(apply_watermark_to_pil_image(page, params)) == ENCODING_FLATE
+
+
+class TestEncodeImage:
+    @pytest.mark.parametrize("mode", ["L", "RGB"])
+    def test_flate_is_lossless(self, mode):
+        img = _line_art(mode)
+        encoded = encode_image(img)
+        assert encoded.encoding == ENCODING_FLATE
+        decoded, filter_name = _roundtrip(encoded)
+        assert filter_name == "/FlateDecode"
+        assert ImageChops.difference(decoded, img).getbbox() is None
+
+    @pytest.mark.parametrize("colors", [(0, 255), (30, 200)])
+    def test_bilevel_gray_is_lossless(self, colors):
+        img = _line_art("L").point(lambda v: colors[1] if v > 128 else colors[0])
+        encoded = encode_image(img)
+        assert encoded.encoding == ENCODING_BILEVEL and encoded.bits == 1
+        decoded, _ = _roundtrip(encoded)
+        assert ImageChops.difference(decoded.convert("L"), img).getbbox() is None
+
+    def test_bilevel_colour_is_lossless(self):
+        img = Image.new("RGB", (64, 48), (200, 30, 30))
+        ImageDraw.Draw(img).rectangle((10, 10, 40, 30), fill=(200, 30, 250))
+        encoded = encode_image(img)
+        assert encoded.encoding == ENCODING_BILEVEL
+        decoded, _ = _roundtrip(encoded)
+        assert ImageChops.difference(decoded.convert("RGB"), img).getbbox() is None
+
+    def test_blank_page_is_bilevel(self):
+        encoded = encode_image(Image.new("L", (50, 50), 255))
+        decoded, _ = _roundtrip(encoded)
+        assert decoded.convert("L").getextrema() == (255, 255)
+
+    def test_photo_is_jpeg_stream(self):
+        encoded = encode_image(_photo("RGBA"))
+        assert encoded.encoding == ENCODING_JPEG
+        assert Image.open(io.BytesIO(encoded.data)).format == "JPEG"
+
+    def test_forced_encoding(self):
+        assert encode_image(_line_art(), ENCODING_JPEG).encoding == ENCODING_JPEG
+
+
+class TestSecureOutput:
+    PARAMS = WatermarkParams(text="SECURE", opacity=30, font_size=14, spacing=80, color="Gray")
+
+    @staticmethod
+    def _filters(doc):
+        return [doc.xref_get_key(img[0], "Filter")[1] for img in doc[0].get_images()]
+
+    def test_text_page_stored_as_flate_and_smaller(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = fitz.open()
+        page = doc.new_page()
+        for i in range(40):
+            page.insert_text((50, 60 + i * 18), f"Clause {i}: the holder consents to copying.")
+        out = apply_secure_raster_watermark_to_pdf(doc, self.PARAMS, dpi=150)
+        assert self._filters(out) == ["/FlateDecode"]
+
+        jpeg_only = fitz.open()
+        pix = out[0].get_pixmap(dpi=150)
+        jpeg_only.new_page().insert_image(jpeg_only[0].rect, stream=pix.tobytes("jpeg", jpg_quality=95))
+        assert len(out.tobytes()) < len(jpeg_only.tobytes())
+
+    def test_photo_page_stored_as_jpeg(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        buf = io.BytesIO()
+        _photo().save(buf, format="JPEG")
+        doc = fitz.open()
+        doc.new_page(width=400, height=300).insert_image(fitz.Rect(0, 0, 400, 300), stream=buf.getvalue())
+        out = apply_secure_raster_watermark_to_pdf(doc, self.PARAMS, dpi=150)
+        assert self._filters(out) == ["/DCTDecode"]
@@ -0,0 +1,94 @@
+"""Tests for grayscale detection and single-channel processing of monochrome pages."""
+import io
+import pytest
+import fitz
+from PIL import Image, ImageChops
+
+from watermark import WatermarkParams, apply_watermark_to_pil_image
+
+PARAMS = WatermarkParams(text="GRAY", opacity=50, font_size=14, spacing=60, color="Black")
+
+
+def _text_doc():
+    doc = fitz.open()
+    doc.new_page(width=200, height=200).insert_text((20, 40), "Contract clause 1")
+    return doc
+
+
+def _colour_doc():
+    doc = _text_doc()
+    doc[0].draw_rect(fitz.Rect(20, 60, 180, 180), color=(0.8, 0.1, 0.1), fill=(0.2, 0.4, 0.9))
+    return doc
+
+
+def _noisy_gray_scan_doc():
+    """A B/W photocopy stored as an RGB JPEG, with small chroma noise."""
+    img = Image.new("RGB", (200, 200), (235, 235, 235))
+    img.paste((30, 32, 29), (20, 20, 180, 40))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=75)
+    doc = fitz.open()
+    doc.new_page(width=200, height=200).insert_image(fitz.Rect(0, 0, 200, 200), stream=buf.getvalue())
+    return doc
+
+
+class TestIsGrayscalePage:
+    def test_text_page(self):
+        from pdf_processing import is_grayscale_page
+        assert is_grayscale_page(_text_doc()[0])
+
+    def test_colour_page(self):
+        from pdf_processing import is_grayscale_page
+        assert not is_grayscale_page(_colour_doc()[0])
+
+    def test_rgb_photocopy_within_tolerance(self):
+        from pdf_processing import is_grayscale_page
+        assert is_grayscale_page(_noisy_gray_scan_doc()[0])
+
+
+class TestGrayWatermark:
+    @pytest.mark.parametrize("color", ["White", "Black", "Gray"])
+    def test_matches_rgba_path(self, color):
+        params = WatermarkParams(text="GRAY", opacity=50, font_size=14, spacing=60, color=color)
+        base = Image.new("L", (180, 140), 150)
+        gray = apply_watermark_to_pil_image(base, params)
+        rgba = apply_watermark_to_pil_image(base.convert("RGBA"), params).convert("L")
+        assert gray.mode == "L"
+        assert ImageChops.difference(gray, rgba).getextrema()[1] <= 1
+
+    def test_input_not_modified(self):
+        base = Image.new("L", (100, 100), 200)
+        apply_watermark_to_pil_image(base, PARAMS)
+        assert base.getextrema() == (200, 200)
+
+
+class TestGraySecureExport:
+    @staticmethod
+    def _image_components(doc):
+        return [fitz.Pixmap(doc, img[0]).n for img in doc[0].get_images()]
+
+    def test_monochrome_page_encoded_as_gray_jpeg(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        out = apply_secure_raster_watermark_to_pdf(_text_doc(), PARAMS, dpi=150)
+        assert self._image_components(out) == [1]
+        assert "GRAY" not in out[0].get_text()
+
+    def test_colour_page_stays_rgb(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        out = apply_secure_raster_watermark_to_pdf(_colour_doc(), PARAMS, dpi=150)
+        assert self._image_components(out) == [3]
+
+    def test_gray_scan_extracted_as_gray(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        out = apply_secure_raster_watermark_to_pdf(_noisy_gray_scan_doc(), PARAMS, dpi=300)
+        info = out[0].get_image_info()[0]
+        assert (info["width"], info["height"]) == (200, 200)
+        assert self._image_components(out) == [1]
+
+    def test_image_export_per_page_mode(self, tmp_path):
+        from pdf_processing import save_pdf_as_images
+        doc = _text_doc()
+        doc.insert_pdf(_colour_doc())
+        save_pdf_as_images(doc, str(tmp_path), "p", img_format="PNG")
+        assert Image.open(tmp_path / "p_page_001.png").mode == "L"
+        assert Image.open(tmp_path / "p_page_002.png").mode == "RGB"
@@ -3,6 +3,7 @@ import flet as ft
 from unittest.mock import MagicMock, patch, mock_open
 from app import PassportFiligraneApp
 import io
+import os
 from PIL import Image
 def test_image_to_pdf_save_dialog_params(app):
     # Setup
@@ -46,7 +47,7 @@ def test_pdf_processing_save_image_as_pdf():
     
     out_buf = io.BytesIO()
     # Mocking open since save_image_as_pdf might write to a file path
-    with patch("pdf_processing.fitz.open") as mock_fitz_open:
+    with patch("pdf_processing.fitz.open") as mock_fitz_open, patch("os.replace") as mock_replace:
         mock_doc = MagicMock()
         mock_fitz_open.return_value = mock_doc
         
@@ -56,4 +57,21 @@ def test_pdf_processing_save_image_as_pdf():
         assert mock_fitz_open.called
         # Verify page insertion (insert_pdf or new_page + insert_image)
         assert mock_doc.new_page.called
-        assert mock_doc.save.called
+        # Saved to a hidden partial file, then moved into place
+        mock_doc.save.assert_called_once_with(".dummy.pdf.part")
+        mock_replace.assert_called_once_with(".dummy.pdf.part", "dummy.pdf")
+        assert mock_doc.close.called
+
+
+def test_save_image_as_pdf_failure_leaves_previous_file(tmp_path):
+    import fitz
+    from pdf_processing import save_image_as_pdf
+    buf = io.BytesIO()
+    Image.new("RGB", (100, 200), color="blue").save(buf, format="JPEG")
+    target = tmp_path / "out.pdf"
+    target.write_bytes(b"previous")
+    with patch.object(fitz.Document, "save", side_effect=RuntimeError("disk full")):
+        with pytest.raises(RuntimeError):
+            save_image_as_pdf(buf.getvalue(), str(target))
+    assert target.read_bytes() == b"previous"
+    assert os.listdir(tmp_path) == ["out.pdf"]
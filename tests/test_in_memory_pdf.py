@@ -0,0 +1,128 @@
+"""Tests for the in-memory (bytes and stream) variants of the PDF API."""
+import glob
+import io
+import os
+import pytest
+import fitz
+from PIL import Image
+
+from batch import BatchOptions, process_file, watermark_bytes
+from pdf_processing import (
+    InvalidPdfError,
+    ProtectedPdfError,
+    apply_vector_watermark_to_pdf,
+    image_to_pdf_bytes,
+    iter_pdf_as_images,
+    load_pdf,
+    save_image_as_pdf,
+    save_pdf_as_images,
+    save_watermarked_pdf,
+    watermarked_pdf_bytes,
+)
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="MEMORY", opacity=30, font_size=36, spacing=150)
+
+
+def _jpeg(size=(400, 300)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (60, 110, 160)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _content(pdf):
+    """Page contents of a PDF: its bytes differ at every save (a new /ID is drawn)."""
+    with fitz.open("pdf", pdf) as doc:
+        return [(page.rect, page.read_contents(), page.get_text()) for page in doc]
+
+
+def _sources(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return [path, data, bytearray(data), memoryview(data), io.BytesIO(data)]
+
+
+class TestLoadPdf:
+    def test_every_source_kind(self, sample_pdf):
+        for source in _sources(sample_pdf):
+            doc, pages = load_pdf(source)
+            assert pages == 2 and "Test Page 1" in doc[0].get_text()
+            doc.close()
+
+    @pytest.mark.parametrize("fixture, error", [
+        ("corrupt_pdf", InvalidPdfError), ("protected_pdf", ProtectedPdfError),
+    ])
+    def test_errors_match_the_path_version(self, request, fixture, error):
+        for source in _sources(request.getfixturevalue(fixture)):
+            with pytest.raises(error):
+                load_pdf(source)
+
+    def test_empty_buffer(self):
+        for source in (b"", io.BytesIO()):
+            with pytest.raises(InvalidPdfError):
+                load_pdf(source)
+
+
+def test_watermarked_pdf_bytes_match_the_saved_file(sample_pdf, tmp_path):
+    doc, _ = load_pdf(sample_pdf)
+    apply_vector_watermark_to_pdf(doc, PARAMS)
+    path = str(tmp_path / "out.pdf")
+    save_watermarked_pdf(doc, path)
+    stream = io.BytesIO()
+    save_watermarked_pdf(doc, stream)
+    data = watermarked_pdf_bytes(doc)
+    doc.close()
+    with open(path, "rb") as f:
+        assert _content(f.read()) == _content(data) == _content(stream.getvalue())
+
+
+def test_image_to_pdf_bytes():
+    data = image_to_pdf_bytes(_jpeg(), page_size=(800, 600))
+    stream = io.BytesIO()
+    save_image_as_pdf(_jpeg(), stream)
+    with fitz.open("pdf", data) as doc:
+        assert len(doc) == 1 and tuple(doc[0].rect)[2:] == (800, 600)
+    with fitz.open("pdf", stream.getvalue()) as doc:
+        assert tuple(doc[0].rect)[2:] == (400, 300)
+
+
+def test_iter_pdf_as_images_matches_the_saved_files(sample_pdf, tmp_path):
+    doc, _ = load_pdf(sample_pdf)
+    save_pdf_as_images(doc, str(tmp_path), "doc", img_format="PNG")
+    pages = list(iter_pdf_as_images(doc, img_format="PNG"))
+    doc.close()
+    files = sorted(glob.glob(str(tmp_path / "doc_page_*.png")))
+    assert len(pages) == len(files) == 2
+    for page, path in zip(pages, files):
+        with open(path, "rb") as f:
+            assert f.read() == page
+
+
+class TestWatermarkBytes:
+    @pytest.mark.parametrize("secure, pdf_format", [(False, "PDF"), (True, "PDF"), (True, "PNG")])
+    def test_matches_process_file(self, sample_pdf, tmp_path, secure, pdf_format):
+        options = BatchOptions(params=PARAMS, output_dir=str(tmp_path / "out"), secure=secure, dpi=300,
+                               pdf_format=pdf_format)
+        os.makedirs(options.output_dir)
+        result = process_file(sample_pdf, options)
+        with open(sample_pdf, "rb") as f:
+            outputs = watermark_bytes(f.read(), options, name="test")
+        assert [name for name, _ in outputs] == [os.path.basename(p) for p in result.outputs]
+        if pdf_format != "PDF":
+            for (_, data), path in zip(outputs, result.outputs):
+                with open(path, "rb") as f:
+                    assert f.read() == data
+
+    def test_image_to_pdf(self, tmp_path):
+        options = BatchOptions(params=PARAMS, output_dir=str(tmp_path), image_format="PDF")
+        [(name, data)] = watermark_bytes(memoryview(_jpeg()), options, name="id")
+        assert name == "id_export_filigree.pdf" and data.startswith(b"%PDF-")
+        assert os.listdir(tmp_path) == []  # output_dir is not used
+
+    def test_errors(self, protected_pdf, tmp_path):
+        options = BatchOptions(params=PARAMS, output_dir=str(tmp_path))
+        with open(protected_pdf, "rb") as f:
+            with pytest.raises(ProtectedPdfError):
+                watermark_bytes(f.read(), options)
+        with pytest.raises(ValueError, match="Unsupported"):
+            watermark_bytes(b"GIF89a...", options)
@@ -0,0 +1,150 @@
+"""Tests for inputs.py: memory-mapped loading and header-only validation."""
+import io
+import tracemalloc
+import pytest
+from PIL import Image, ImageFile
+from unittest.mock import patch
+
+from watermark import WatermarkParams, apply_watermark
+
+
+@pytest.fixture
+def png_path(tmp_path):
+    path = tmp_path / "scan.png"
+    Image.new("RGB", (64, 48), "blue").save(path)
+    return str(path)
+
+
+class TestMappedFile:
+    def test_buffer_matches_file(self, png_path):
+        from inputs import MappedFile
+        with open(png_path, "rb") as f:
+            expected = f.read()
+        with MappedFile(png_path) as mapped:
+            assert mapped.buffer.tobytes() == expected
+            assert len(mapped) == len(expected)
+
+    def test_empty_file_falls_back_to_read(self, tmp_path):
+        from inputs import MappedFile
+        path = tmp_path / "empty.bin"
+        path.write_bytes(b"")
+        with MappedFile(str(path)) as mapped:
+            assert len(mapped) == 0
+
+    def test_close_while_buffer_in_use_is_safe(self, png_path):
+        from inputs import MappedFile
+        mapped = MappedFile(png_path)
+        view = mapped.buffer[:4]
+        mapped.close()
+        assert bytes(view) == b"\x89PNG"
+
+    def test_does_not_allocate_file_sized_python_objects(self, tmp_path):
+        from inputs import MappedFile, probe_image
+        path = tmp_path / "large.bmp"
+        Image.new("RGB", (3000, 2000), "white").save(path)  # ~18 MB on disk
+        tracemalloc.start()
+        try:
+            with MappedFile(str(path)) as mapped:
+                probe_image(mapped.buffer)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 1024 * 1024
+
+
+class TestBufferReader:
+    def test_read_seek_tell(self):
+        from inputs import BufferReader
+        reader = BufferReader(memoryview(b"0123456789"))
+        assert reader.read(3) == b"012"
+        assert reader.tell() == 3
+        reader.seek(-2, io.SEEK_END)
+        assert reader.read() == b"89"
+        reader.seek(1)
+        reader.seek(2, io.SEEK_CUR)
+        assert reader.read(1) == b"3"
+
+    def test_independent_cursors(self):
+        from inputs import BufferReader
+        data = memoryview(b"abcdef")
+        first, second = BufferReader(data), BufferReader(data)
+        first.read(4)
+        assert second.read(2) == b"ab"
+
+    def test_negative_seek_rejected(self):
+        from inputs import BufferReader
+        with pytest.raises(ValueError):
+            BufferReader(b"abc").seek(-1)
+
+
+class TestProbeImage:
+    def test_reports_header_info(self, png_path):
+        from inputs import MappedFile, probe_image
+        with MappedFile(png_path) as mapped:
+            info = probe_image(mapped.buffer)
+        assert (info.width, info.height, info.format) == (64, 48, "PNG")
+
+    def test_does_not_decode_pixels(self, png_path):
+        from inputs import MappedFile, probe_image
+        with MappedFile(png_path) as mapped:
+            with patch.object(ImageFile.ImageFile, "load", side_effect=AssertionError("decoded")):
+                probe_image(mapped.buffer)
+
+    def test_rejects_oversized_dimensions(self, png_path):
+        from inputs import probe_image
+        with patch("utils.MAX_IMAGE_DIMENSION", 32):
+            with pytest.raises(ValueError, match="too large"):
+                probe_image(open(png_path, "rb").read())
+
+    def test_rejects_garbage(self):
+        from inputs import probe_image
+        with pytest.raises(Exception):
+            probe_image(memoryview(b"not an image at all"))
+
+
+class TestMappedConsumers:
+    def test_apply_watermark_accepts_mapped_buffer(self, png_path):
+        from inputs import MappedFile
+        from watermark import apply_watermark, WatermarkParams
+        params = WatermarkParams(text="X", opacity=30, font_size=12, spacing=40)
+        with open(png_path, "rb") as f:
+            expected = apply_watermark(f.read(), params, output_format="PNG")
+        with MappedFile(png_path) as mapped:
+            assert apply_watermark(mapped.buffer, params, output_format="PNG") == expected
+
+    def test_load_pdf_from_mapped_buffer(self, sample_pdf):
+        from inputs import MappedFile
+        from pdf_processing import load_pdf
+        mapped = MappedFile(sample_pdf)
+        doc, num_pages = load_pdf(mapped.buffer)
+        assert num_pages == 2
+        assert "Test Page 1" in doc.load_page(0).get_text()
+        doc.close()
+
+    def test_load_pdf_buffer_errors_match_path_errors(self, protected_pdf, corrupt_pdf):
+        from pdf_processing import load_pdf, ProtectedPdfError, InvalidPdfError
+        with pytest.raises(ProtectedPdfError):
+            load_pdf(open(protected_pdf, "rb").read())
+        with pytest.raises(InvalidPdfError):
+            load_pdf(open(corrupt_pdf, "rb").read())
+        with pytest.raises(InvalidPdfError):
+            load_pdf(b"")
+
+    def test_app_keeps_a_private_copy(self, app, png_path):
+        with open(png_path, "rb") as f:
+            original = f.read()
+        app._load_image(png_path)
+        assert app.original_image_bytes == original
+        assert app.file_info_text.value == "Image loaded"
+        with open(png_path, "wb") as f:  # e.g. an export saved over the source
+            f.write(b"")
+        params = WatermarkParams(text="T", opacity=30, font_size=36, spacing=150)
+        assert apply_watermark(app.original_image_bytes, params)
+
+    def test_app_reports_unreadable_image(self, app, tmp_path):
+        path = tmp_path / "broken.jpg"
+        path.write_bytes(b"garbage")
+        with patch.object(app, "_show_error") as mock_error:
+            app._load_image(str(path))
+        mock_error.assert_called_once_with("Unable to read this image file.")
+        assert app.original_image_bytes is None
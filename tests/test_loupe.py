@@ -0,0 +1,101 @@
+"""Tests for the loupe: clipped high-DPI region previews."""
+import io
+import pytest
+import fitz
+from PIL import Image, ImageChops
+from unittest.mock import MagicMock
+
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="LOUPE", opacity=50, font_size=16, spacing=80, color="Red")
+
+
+@pytest.fixture
+def text_doc():
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(30):
+        page.insert_text((40, 40 + i * 24), "The quick brown fox jumps over the lazy dog", fontsize=11)
+    return doc
+
+
+class TestLoupeClip:
+    def test_centred(self, text_doc):
+        from pdf_processing import loupe_clip
+        assert loupe_clip(text_doc[0], (300, 400), size=100) == fitz.Rect(250, 350, 350, 450)
+
+    def test_shifted_inside_page(self, text_doc):
+        from pdf_processing import loupe_clip
+        page = text_doc[0]
+        assert loupe_clip(page, (0, page.rect.height), size=100) == fitz.Rect(
+            0, page.rect.height - 100, 100, page.rect.height)
+
+
+class TestGeneratePdfLoupe:
+    @pytest.mark.parametrize("dpi", [300, 600])
+    def test_matches_region_of_full_secure_render(self, text_doc, dpi):
+        from pdf_processing import (
+            generate_pdf_loupe, loupe_clip, _render_secure_page, _scale_params_for_dpi,
+            apply_watermark_to_pil_image,
+        )
+        page = text_doc[0]
+        clip = loupe_clip(page, (215, 333))
+        loupe = Image.open(io.BytesIO(generate_pdf_loupe(text_doc, 0, PARAMS, dpi, clip))).convert("RGB")
+
+        full = apply_watermark_to_pil_image(_render_secure_page(page, dpi), _scale_params_for_dpi(PARAMS, dpi))
+        zoom = dpi / 72
+        x0, y0 = (clip * fitz.Matrix(zoom, zoom)).irect[:2]  # Pixmap origin of the clip
+        region = full.crop((x0, y0, x0 + loupe.width, y0 + loupe.height))
+        assert ImageChops.difference(loupe, region).getbbox() is None
+
+    def test_renders_only_the_clip(self, text_doc):
+        from pdf_processing import generate_pdf_loupe, loupe_clip
+        clip = loupe_clip(text_doc[0], (300, 400), size=96)
+        img = Image.open(io.BytesIO(generate_pdf_loupe(text_doc, 0, PARAMS, 600, clip)))
+        assert abs(img.width - 800) <= 1 and abs(img.height - 800) <= 1
+
+
+class TestAppLoupe:
+    @pytest.fixture
+    def loupe_app(self, app, sample_pdf):
+        event = MagicMock()
+        event.files = [MagicMock(path=sample_pdf)]
+        app.on_file_result(event)
+        app.update_timer.join()
+        app._on_preview_resize(MagicMock(width=1190, height=842))  # A4 preview shown at 1:1 height
+        app.loupe_switch.value = True
+        yield app
+        app._stop_thumbnails()
+
+    def test_maps_taps_through_contain_fit(self, loupe_app):
+        # 595x842 image centred in a 1190x842 area: 297.5 px of margin each side.
+        assert loupe_app._preview_point_to_page(297.5 + 100, 200) == pytest.approx((100, 200))
+        assert loupe_app._preview_point_to_page(10, 200) is None
+
+    def test_tap_shows_region_at_selected_dpi(self, loupe_app):
+        loupe_app.dpi_segmented_button.selected = {"600"}
+        loupe_app.on_preview_tap(MagicMock(local_x=297.5 + 100, local_y=200))
+        assert loupe_app.loupe_container.visible
+        assert loupe_app.loupe_label.value == "600 DPI · page 1"
+        data = Image.open(io.BytesIO(__import__("base64").b64decode(loupe_app.loupe_image.src_base64)))
+        assert abs(data.width - 800) <= 1
+
+    def test_ignored_when_switch_off(self, loupe_app):
+        loupe_app.loupe_switch.value = False
+        loupe_app.on_preview_tap(MagicMock(local_x=400, local_y=200))
+        assert not loupe_app.loupe_container.visible
+
+    def test_param_change_rerenders_loupe(self, loupe_app):
+        loupe_app.color_dropdown.value = "Black"
+        loupe_app.spacing_slider.value = loupe_app.spacing_slider.min  # stamps inside the region
+        loupe_app.on_preview_tap(MagicMock(local_x=400, local_y=200))
+        before = loupe_app.loupe_image.src_base64
+        loupe_app.watermark_text.value = "CHANGED"
+        loupe_app.update_preview()
+        loupe_app.update_timer.join()
+        assert loupe_app.loupe_image.src_base64 != before
+
+    def test_page_change_hides_loupe(self, loupe_app):
+        loupe_app.on_preview_tap(MagicMock(local_x=400, local_y=200))
+        loupe_app.go_to_page(1)
+        assert not loupe_app.loupe_container.visible
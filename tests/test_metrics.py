@@ -0,0 +1,162 @@
+"""Tests for stage timers, counters and their JSON/Prometheus export."""
+import io
+import json
+import os
+import pytest
+import fitz
+from PIL import Image
+
+import metrics
+from metrics import MetricsRegistry
+from watermark import WatermarkParams, apply_watermark
+
+PARAMS = WatermarkParams(text="METRICS", opacity=40, font_size=20, spacing=80)
+
+
+@pytest.fixture
+def collected():
+    """Enable the global registry for one test, starting empty."""
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.reset()
+
+
+def _jpeg(size=(320, 240)):
+    buf = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class TestRegistry:
+    def test_disabled_records_nothing(self):
+        registry = MetricsRegistry()
+        with registry.timer("encode"):
+            pass
+        registry.count("pages")
+        assert registry.snapshot() == {"stages": {}, "counters": {}}
+        assert registry.timer("a") is registry.timer("b")  # Shared no-op, no allocation
+
+    def test_timer_and_counter(self):
+        registry = MetricsRegistry(enabled=True)
+        for seconds in (0.002, 0.2, 100.0):
+            registry.observe("encode", seconds)
+        registry.count("pages")
+        registry.count("pages", 2)
+        encode = registry.snapshot()["stages"]["encode"]
+        assert encode["count"] == 3 and encode["sum"] == pytest.approx(100.202)
+        assert encode["buckets"]["0.0025"] == 1
+        assert encode["buckets"]["0.25"] == 2
+        assert encode["buckets"]["30.0"] == 2 and encode["buckets"]["+Inf"] == 3
+        assert registry.snapshot()["counters"] == {"pages": 3}
+
+    def test_timed_decorator(self, collected):
+        @metrics.timed("decode")
+        def decode(x):
+            return x * 2
+
+        assert decode(21) == 42
+        assert decode.__name__ == "decode"
+        assert collected.snapshot()["stages"]["decode"]["count"] == 1
+
+    def test_merge(self):
+        worker, parent = MetricsRegistry(enabled=True), MetricsRegistry(enabled=True)
+        worker.observe("save", 0.03)
+        worker.count("bytes_written", 100)
+        parent.observe("save", 3.0)
+        parent.count("bytes_written", 1)
+        parent.merge(json.loads(json.dumps(worker.snapshot())))
+        snapshot = parent.snapshot()
+        assert snapshot["counters"] == {"bytes_written": 101}
+        assert snapshot["stages"]["save"]["count"] == 2
+        assert snapshot["stages"]["save"]["buckets"]["0.05"] == 1
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.observe("encode", 0.004)
+        registry.count("tiles_pasted", 12)
+        text = registry.to_prometheus()
+        assert "# TYPE filigrane_stage_duration_seconds histogram" in text
+        assert 'filigrane_stage_duration_seconds_bucket{stage="encode",le="0.005"} 1' in text
+        assert 'filigrane_stage_duration_seconds_bucket{stage="encode",le="+Inf"} 1' in text
+        assert 'filigrane_stage_duration_seconds_count{stage="encode"} 1' in text
+        assert "# TYPE filigrane_tiles_pasted_total counter\nfiligrane_tiles_pasted_total 12" in text
+        assert text.endswith("\n")
+
+    def test_write_metrics(self, collected, tmp_path):
+        metrics.count("pages", 4)
+        metrics.write_metrics(str(tmp_path / "m.json"))
+        metrics.write_metrics(str(tmp_path / "m.prom"))
+        assert json.loads((tmp_path / "m.json").read_text())["counters"] == {"pages": 4}
+        assert "filigrane_pages_total 4" in (tmp_path / "m.prom").read_text()
+        assert sorted(os.listdir(tmp_path)) == ["m.json", "m.prom"]
+
+
+class TestInstrumentation:
+    def test_apply_watermark_stages(self, collected):
+        apply_watermark(_jpeg(), PARAMS)
+        snapshot = collected.snapshot()
+        assert {"decode", "stamp_render", "composite", "encode"} <= set(snapshot["stages"])
+        assert snapshot["counters"]["tiles_pasted"] > 0
+
+    def test_secure_pdf_stages(self, collected, sample_pdf, tmp_path):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf, save_watermarked_pdf
+        with fitz.open(sample_pdf) as doc:
+            out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=72)
+        path = str(tmp_path / "out.pdf")
+        save_watermarked_pdf(out, path)
+        snapshot = collected.snapshot()
+        assert {"page_render", "stamp_render", "composite", "encode", "insert", "save"} <= set(snapshot["stages"])
+        assert snapshot["stages"]["page_render"]["count"] == 2
+        assert snapshot["counters"]["pages"] == 2
+        assert snapshot["counters"]["bytes_written"] == os.path.getsize(path)
+
+    def test_cache_hits_and_misses(self, collected, tmp_path):
+        from cache import ResultCache
+        cache = ResultCache(str(tmp_path / "cache"))
+        cache.get("missing")
+        cache.put("key", b"data")
+        cache.get("key")
+        assert collected.snapshot()["counters"] == {"cache_hits": 1, "cache_misses": 1}
+
+    def test_disabled_pipeline_records_nothing(self):
+        metrics.REGISTRY.reset()
+        apply_watermark(_jpeg(), PARAMS)
+        assert metrics.REGISTRY.snapshot() == {"stages": {}, "counters": {}}
+
+
+class TestBatchMetrics:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_cli_writes_prometheus_file(self, tmp_path, jobs):
+        from cli import main
+        for name in ("a.jpg", "b.jpg"):
+            (tmp_path / name).write_bytes(_jpeg())
+        out = tmp_path / "metrics.prom"
+        try:
+            assert main(["batch", str(tmp_path / "*.jpg"), "-o", str(tmp_path / "out"),
+                         "--jobs", str(jobs), "--metrics-out", str(out)]) == 0
+        finally:
+            metrics.disable()
+            metrics.REGISTRY.reset()
+        text = out.read_text()
+        assert "filigrane_files_total 2" in text
+        assert 'filigrane_stage_duration_seconds_count{stage="decode"} 2' in text
+        written = sum(p.stat().st_size for p in (tmp_path / "out").iterdir())
+        assert f"filigrane_bytes_written_total {written}" in text
+
+
+class TestAppMetrics:
+    def test_written_next_to_the_log(self, collected, tmp_path, monkeypatch):
+        import main
+        monkeypatch.setattr(main, "get_log_path", lambda: str(tmp_path / "error_log.txt"))
+        apply_watermark(_jpeg(), PARAMS)
+        main.write_session_metrics()
+        data = json.loads((tmp_path / "metrics.json").read_text())
+        assert data["stages"]["decode"]["count"] == 1
+
+    def test_not_written_while_disabled(self, tmp_path, monkeypatch):
+        import main
+        monkeypatch.setattr(main, "get_log_path", lambda: str(tmp_path / "error_log.txt"))
+        main.write_session_metrics()
+        assert not (tmp_path / "metrics.json").exists()
@@ -0,0 +1,151 @@
+"""Tests for windowed, bounded-memory page processing and the derived page limit."""
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import pytest
+import fitz
+
+from watermark import WatermarkParams
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _make_pdf(path, pages, width=595, height=842):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=width, height=height).insert_text((20, 40), f"Page {i+1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+class TestWindowedMap:
+    def test_preserves_order(self):
+        from pdf_processing import _windowed_map
+        assert list(_windowed_map(lambda x: x * 2, range(20), window=4)) == list(range(0, 40, 2))
+
+    def test_bounds_items_in_flight(self):
+        from pdf_processing import _windowed_map
+        lock = threading.Lock()
+        state = {"produced": 0, "consumed": 0, "max_in_flight": 0}
+
+        def produce():
+            for i in range(50):
+                with lock:
+                    state["produced"] += 1
+                    in_flight = state["produced"] - state["consumed"]
+                    state["max_in_flight"] = max(state["max_in_flight"], in_flight)
+                yield i
+
+        for _ in _windowed_map(lambda x: x, produce(), window=3):
+            with lock:
+                state["consumed"] += 1
+        assert state["max_in_flight"] <= 3
+
+    def test_window_of_one_runs_inline(self):
+        from pdf_processing import _windowed_map
+        threads = set()
+        list(_windowed_map(lambda x: threads.add(threading.get_ident()), range(5), window=1))
+        assert threads == {threading.get_ident()}
+
+
+class TestPdfPageLimit:
+    def test_vector_limit_allows_large_dossiers(self, tmp_path):
+        from pdf_processing import pdf_page_limit
+        doc = fitz.open(_make_pdf(tmp_path / "a4.pdf", 1))
+        assert pdf_page_limit(doc) >= 1000
+
+    def test_secure_limit_shrinks_with_dpi(self, tmp_path):
+        from pdf_processing import pdf_page_limit
+        doc = fitz.open(_make_pdf(tmp_path / "a4.pdf", 1))
+        limits = [pdf_page_limit(doc, secure=True, dpi=dpi) for dpi in (300, 450, 600)]
+        assert limits[0] > limits[1] > limits[2] > 50
+        assert limits[0] >= 300
+
+    def test_secure_limit_uses_largest_page(self, tmp_path):
+        from pdf_processing import pdf_page_limit
+        a4 = fitz.open(_make_pdf(tmp_path / "a4.pdf", 1))
+        mixed = fitz.open(_make_pdf(tmp_path / "mixed.pdf", 1))
+        mixed.new_page(width=1684, height=2384)  # A1
+        assert pdf_page_limit(mixed, secure=True, dpi=300) < pdf_page_limit(a4, secure=True, dpi=300)
+
+    def test_budget_is_configurable(self, tmp_path):
+        from pdf_processing import pdf_page_limit
+        doc = fitz.open(_make_pdf(tmp_path / "a4.pdf", 1))
+        assert pdf_page_limit(doc, time_budget=6) == 100
+        small = pdf_page_limit(doc, secure=True, dpi=300, memory_budget=512 * 1024 * 1024)
+        assert small < pdf_page_limit(doc, secure=True, dpi=300)
+
+    def test_check_raises_with_limit_in_message(self, tmp_path, monkeypatch):
+        import pdf_processing
+        doc = fitz.open(_make_pdf(tmp_path / "many.pdf", 20))
+        pdf_processing.check_pdf_page_limit(doc, secure=True, dpi=600)
+        monkeypatch.setattr(pdf_processing, "pdf_page_limit", lambda *a, **kw: 10)
+        with pytest.raises(ValueError, match="Maximum allowed for Secure Mode at 600 DPI is 10 pages"):
+            pdf_processing.check_pdf_page_limit(doc, secure=True, dpi=600)
+
+    def test_app_accepts_300_page_dossier(self, app, tmp_path):
+        path = _make_pdf(tmp_path / "dossier.pdf", 300, width=200, height=200)
+        app._load_pdf(path)
+        assert app.num_pages == 300
+        assert app.pdf_doc is not None
+        app.pdf_doc.close()
+
+
+class TestWindowedPipelines:
+    def test_secure_output_matches_unwindowed(self, tmp_path):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 6, width=200, height=200))
+        params = WatermarkParams(text="WINDOW", opacity=50, font_size=12, spacing=60, color="Black")
+        serial = apply_secure_raster_watermark_to_pdf(doc, params, dpi=150, window=1)
+        windowed = apply_secure_raster_watermark_to_pdf(doc, params, dpi=150, window=4)
+        for a, b in zip(serial, windowed):
+            assert a.get_pixmap().samples == b.get_pixmap().samples
+
+    def test_image_export_writes_every_page(self, tmp_path):
+        from pdf_processing import save_pdf_as_images
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 9, width=100, height=100))
+        save_pdf_as_images(doc, str(tmp_path / "out"), "p", img_format="PNG", window=3)
+        assert sorted(os.listdir(tmp_path / "out")) == [f"p_page_{i:03d}.png" for i in range(1, 10)]
+
+
+_RSS_SCRIPT = textwrap.dedent("""
+    import os, resource, sys, tempfile
+    sys.path.insert(0, {root!r})
+    import fitz
+    from pdf_processing import save_pdf_as_images, apply_secure_raster_watermark_to_pdf
+    from watermark import WatermarkParams
+
+    pages = int(sys.argv[1])
+    src = fitz.open()
+    for i in range(pages):
+        src.new_page(width=288, height=288).insert_text((20, 40), f"Page {{i+1}}")
+    pdf_bytes = src.tobytes()
+    src.close()
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    params = WatermarkParams(text="STRESS", opacity=30, font_size=12, spacing=60)
+    with tempfile.TemporaryDirectory() as out_dir:
+        save_pdf_as_images(doc, out_dir, "p")
+    secured = apply_secure_raster_watermark_to_pdf(doc, params, dpi=150)
+    assert secured.page_count == pages
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+""")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses the resource module")
+def test_peak_rss_flat_for_1000_page_pdf():
+    """Peak RSS for 1000 pages stays close to the peak for 50 pages."""
+    script = _RSS_SCRIPT.format(root=os.path.abspath(ROOT))
+
+    def peak_rss(pages):
+        out = subprocess.run([sys.executable, "-c", script, str(pages)],
+                             capture_output=True, text=True, check=True)
+        return int(out.stdout.strip().splitlines()[-1])
+
+    small, large = peak_rss(50), peak_rss(1000)
+    # 20x the pages; growth is limited to the (small) output streams.
+    assert large - small < 64 * 1024 * 1024, f"peak RSS grew from {small} to {large} bytes"
@@ -154,3 +154,43 @@ def test_pdf_load_error_catch_as_runtime_error(protected_pdf):
     """PdfLoadError can be caught as RuntimeError (base class)."""
     with pytest.raises(RuntimeError):
         load_pdf(protected_pdf)
+
+
+def test_secure_raster_variants_render_each_page_once(sample_pdf):
+    """Variants share one rasterization per page and produce one document each."""
+    from unittest.mock import patch
+    import pdf_processing
+    from pdf_processing import apply_secure_raster_watermark_variants
+
+    doc, num_pages = load_pdf(sample_pdf)
+    params_list = [
+        WatermarkParams(text=f"FOR {name} ONLY", opacity=30, font_size=24, spacing=80, color="Black")
+        for name in ("A", "B", "C")
+    ]
+    with patch.object(pdf_processing, "_render_secure_page",
+                      wraps=pdf_processing._render_secure_page) as mock_render:
+        out_docs = apply_secure_raster_watermark_variants(doc, params_list, dpi=300, max_workers=2)
+
+    assert mock_render.call_count == num_pages
+    assert len(out_docs) == len(params_list)
+    for out_doc in out_docs:
+        assert out_doc.page_count == num_pages
+        assert out_doc.load_page(0).get_text() == ""
+        out_doc.close()
+    doc.close()
+
+
+def test_secure_raster_variants_differ_per_recipient(sample_pdf):
+    """Each variant carries its own watermark pixels."""
+    from pdf_processing import apply_secure_raster_watermark_variants
+
+    doc, _ = load_pdf(sample_pdf)
+    params_list = [
+        WatermarkParams(text="FOR ALPHA ONLY", opacity=80, font_size=24, spacing=80, color="Black"),
+        WatermarkParams(text="FOR BRAVO ONLY", opacity=80, font_size=24, spacing=80, color="Black"),
+    ]
+    first, second = apply_secure_raster_watermark_variants(doc, params_list, dpi=300)
+    assert first.tobytes() != second.tobytes()
+    first.close()
+    second.close()
+    doc.close()
@@ -1,24 +1,62 @@
-
-import fitz
-import time
+"""Performance ceiling and benchmark-suite mechanics (see benchmarks/suite.py)."""
+import json
 import pytest
-from pdf_processing import apply_vector_watermark_to_pdf
-from watermark import WatermarkParams
-
-def test_performance_10_pages(tmp_path):
-    doc = fitz.open()
-    for i in range(10):
-        page = doc.new_page()
-        page.insert_text((100, 100), f"Page {i+1}")
-
-    params = WatermarkParams(text="PERFORMANCE TEST", opacity=30, font_size=36, spacing=150, color="Black")
-    start_time = time.time()
-    apply_vector_watermark_to_pdf(doc, params)
-    end_time = time.time()
-    duration = end_time - start_time
-
-    print(f"\nTime to watermark 10 pages: {duration:.4f}s")
-    assert duration < 5.0
-
-if __name__ == "__main__":
-    test_performance_10_pages(None)
+
+from benchmarks import suite
+
+
+def test_performance_10_pages():
+    result = suite.measure_case("vector", {"pages": 10}, repeat=1)
+    print(f"\nTime to watermark 10 pages: {result['wall_s']:.4f}s")
+    assert result["wall_s"] < 5.0
+
+
+def test_case_ids_are_unique():
+    for cases in (suite.QUICK_CASES, suite.FULL_CASES):
+        ids = [suite.case_id(*c) for c in cases]
+        assert len(set(ids)) == len(ids)
+    assert suite.case_id("secure", {"pages": 2, "dpi": 300}) == "secure[dpi=300,pages=2]"
+    assert set(name for name, _ in suite.FULL_CASES) == set(suite.CASES)
+
+
+def test_isolated_run_reports_every_metric():
+    result = suite.run_case_isolated("apply_watermark", {"size": [320, 240], "spacing": 80}, repeat=1)
+    assert set(result) == {"wall_s", "cpu_s", "peak_rss_mb"}
+    assert result["wall_s"] > 0 and result["peak_rss_mb"] >= 0
+
+
+class TestCompare:
+    BASE = {"vector[pages=10]": {"wall_s": 1.0, "cpu_s": 0.8, "peak_rss_mb": 100.0}}
+
+    def _measured(self, **changes):
+        return {"vector[pages=10]": {**self.BASE["vector[pages=10]"], **changes}}
+
+    def test_within_threshold(self):
+        assert suite.compare(self._measured(wall_s=1.2, peak_rss_mb=120.0), self.BASE, 0.25) == []
+
+    @pytest.mark.parametrize("metric, value", [("wall_s", 1.3), ("cpu_s", 1.1), ("peak_rss_mb", 130.0)])
+    def test_regression(self, metric, value):
+        regressions = suite.compare(self._measured(**{metric: value}), self.BASE, 0.25)
+        assert len(regressions) == 1 and metric in regressions[0]
+
+    def test_noise_floor(self):
+        base = {"preview[base=cached]": {"wall_s": 0.002, "cpu_s": 0.002, "peak_rss_mb": 1.0}}
+        measured = {"preview[base=cached]": {"wall_s": 0.006, "cpu_s": 0.006, "peak_rss_mb": 5.0}}
+        assert suite.compare(measured, base, 0.25) == []
+
+    def test_new_cases_are_skipped(self):
+        assert suite.compare({"secure[dpi=600,pages=4]": {"wall_s": 9.0}}, self.BASE, 0.25) == []
+
+
+def test_baseline_round_trip_and_gate(tmp_path, monkeypatch):
+    path = str(tmp_path / "baselines" / "quick.json")
+    measured = {"vector[pages=10]": {"wall_s": 1.0, "cpu_s": 1.0, "peak_rss_mb": 10.0}}
+    suite.save_baseline(path, measured, repeat=2)
+    assert suite.load_baseline(path) == measured
+    assert json.loads(open(path).read())["repeat"] == 2
+
+    monkeypatch.setattr(suite, "QUICK_CASES", [("vector", {"pages": 10})])
+    slower = {"vector[pages=10]": {"wall_s": 2.0, "cpu_s": 1.0, "peak_rss_mb": 10.0}}
+    monkeypatch.setattr(suite, "run_suite", lambda cases, repeat, on_result=None: slower)
+    assert suite.main(["--quick", "--baseline", path]) == 1
+    assert suite.main(["--quick", "--baseline", path, "--threshold", "1.5"]) == 0
@@ -57,10 +57,11 @@ def test_on_save_result_writes_png(app):
     mock_event = MagicMock()
     mock_event.path = "test.png"
     
-    with patch("builtins.open", mock_open()) as mocked_file:
+    with patch("builtins.open", mock_open()) as mocked_file, patch("os.replace") as mocked_replace:
         app.on_save_result(mock_event)
-        mocked_file.assert_called_with("test.png", "wb")
+        mocked_file.assert_called_with(".test.png.part", "wb")
         mocked_file().write.assert_called_with(b"png-data")
+        mocked_replace.assert_called_once_with(".test.png.part", "test.png")
 
 def test_pdf_to_png_images_params(app):
     app.current_file_type = "pdf"
@@ -71,8 +72,10 @@ def test_pdf_to_png_images_params(app):
     mock_event = MagicMock()
     mock_event.path = "/fake/dir"
     
-    # Mock save_pdf_as_images
-    with patch("pdf_processing.save_pdf_as_images") as mock_save_pdf:
+    # Mock save_pdf_as_images and the per-export copy of the source PDF
+    with patch("pdf_processing.save_pdf_as_images") as mock_save_pdf, \
+         patch("pdf_processing.load_pdf", return_value=(MagicMock(), 1)):
         app.on_dir_result(mock_event)
+        app.wait_for_export()
         args, kwargs = mock_save_pdf.call_args
         assert kwargs.get("img_format") == "PNG"
@@ -0,0 +1,69 @@
+"""Tests for the headless preview-latency harness (benchmarks/preview_latency.py)."""
+import glob
+import os
+import time
+import pytest
+from PIL import Image
+
+from benchmarks import preview_latency
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    Image.new("RGB", (320, 240), (90, 120, 150)).save(path, format="JPEG")
+    return path
+
+
+def _events(*times, control="opacity"):
+    return [{"t": t, "control": control, "value": 40 + i} for i, t in enumerate(times)]
+
+
+def test_percentile():
+    values = [0.1 * i for i in range(1, 101)]
+    assert preview_latency.percentile(values, 50) == pytest.approx(5.0)
+    assert preview_latency.percentile(values, 99) == pytest.approx(9.9)
+    assert preview_latency.percentile([3.0], 95) == 3.0
+
+
+def test_bundled_streams_load():
+    paths = glob.glob(os.path.join(preview_latency.STREAM_DIR, "*.json"))
+    assert paths
+    for path in paths:
+        events = preview_latency.load_stream(path)
+        assert events and [e["t"] for e in events] == sorted(e["t"] for e in events)
+
+
+def test_unknown_control_is_rejected(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('{"events": [{"t": 0, "control": "zoom", "value": 2}]}')
+    with pytest.raises(ValueError, match="zoom"):
+        preview_latency.load_stream(str(path))
+
+
+def test_drag_is_debounced_into_one_render(photo):
+    result = preview_latency.measure(photo, _events(0.0, 0.01, 0.02, 0.03), debounce=0.05)
+    assert result["events"] == 4 and result["renders"] == 1 and result["debounced"] == 3
+    assert result["displays"] == 1 and result["wasted"] == 0 and result["never_shown"] == 0
+    assert 50 <= result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
+
+
+def test_render_superseded_while_running_is_wasted(photo, monkeypatch):
+    import app as app_module
+    apply_watermark = app_module.apply_watermark
+
+    def slow_apply(*args, **kwargs):
+        time.sleep(0.2)
+        return apply_watermark(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "apply_watermark", slow_apply)
+    # The first render starts at 0.05s and is still running when the second event arrives.
+    result = preview_latency.measure(photo, _events(0.0, 0.1), debounce=0.05)
+    assert result["renders"] == 2 and result["displays"] == 2
+    assert result["wasted"] == 1 and result["never_shown"] == 0
+    assert result["max_ms"] >= 200
+
+
+def test_font_size_change_counts_as_displayed(photo):
+    result = preview_latency.measure(photo, _events(0.0, 0.2, control="font_size"), debounce=0.05)
+    assert result["displays"] == 2 and result["never_shown"] == 0
@@ -0,0 +1,89 @@
+"""Tests for the on-demand per-operation profiler."""
+import io
+import json
+import os
+import pstats
+import stat
+import pytest
+from PIL import Image
+
+import profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    """Enable profiling with the log (and home) directory under tmp_path."""
+    home = tmp_path / "home"
+    log_dir = home / "logs"
+    log_dir.mkdir(parents=True)
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setattr(profiling, "get_log_path", lambda: str(log_dir / "error_log.txt"))
+    profiling.enable()
+    yield log_dir / "profiles"
+    profiling.disable()
+
+
+def _reports(directory):
+    return [json.loads((directory / name).read_text())
+            for name in sorted(os.listdir(directory)) if name.endswith(".json")]
+
+
+class TestProfileOperation:
+    def test_disabled_is_a_no_op(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling, "get_log_path", lambda: str(tmp_path / "error_log.txt"))
+        assert profiling.profile_operation("preview") is profiling.profile_operation("save")
+        with profiling.profile_operation("preview"):
+            pass
+        assert os.listdir(tmp_path) == []
+
+    def test_writes_prof_and_json(self, profile_dir):
+        source = os.path.join(os.path.expanduser("~"), "clients", "passport.jpg")
+        with profiling.profile_operation("image_export", source):
+            data = [bytes(1000) for _ in range(100)]
+        del data
+        names = sorted(os.listdir(profile_dir))
+        assert len(names) == 2 and names[0].endswith("-image_export.json") and names[1].endswith(".prof")
+        report = _reports(profile_dir)[0]
+        assert report["operation"] == "image_export"
+        assert report["source"] == os.path.join("~USER", "clients", "passport.jpg")
+        assert report["python_peak_bytes"] >= 100_000
+        assert report["top_allocations"] and report["error"] is None
+        stats = pstats.Stats(str(profile_dir / names[1]))
+        assert stats.total_calls > 0
+        for name in names:
+            assert stat.S_IMODE(os.stat(profile_dir / name).st_mode) == 0o600
+
+    def test_profiled_file_names_are_sanitized(self, profile_dir, monkeypatch):
+        monkeypatch.setenv("HOME", os.path.dirname(profiling.__file__))
+        with profiling.profile_operation("preview"):
+            profiling.is_enabled()
+        prof = next(name for name in os.listdir(profile_dir) if name.endswith(".prof"))
+        files = {func[0] for func in pstats.Stats(str(profile_dir / prof)).stats}
+        assert any(f.startswith("~USER") for f in files)
+        assert not any(f.startswith(os.path.dirname(profiling.__file__)) for f in files)
+
+    def test_error_is_recorded_and_raised(self, profile_dir):
+        with pytest.raises(ValueError):
+            with profiling.profile_operation("save"):
+                raise ValueError("disk full")
+        assert _reports(profile_dir)[0]["error"] == "ValueError: disk full"
+
+    def test_nested_operations_are_profiled_once(self, profile_dir):
+        with profiling.profile_operation("secure_apply"):
+            with profiling.profile_operation("save"):
+                pass
+        assert [r["operation"] for r in _reports(profile_dir)] == ["secure_apply"]
+
+
+class TestCli:
+    def test_profile_switch(self, profile_dir, sample_pdf, tmp_path, capsys):
+        from cli import main
+        buf = io.BytesIO()
+        Image.new("RGB", (64, 48), (90, 120, 150)).save(buf, format="JPEG")
+        (tmp_path / "photo.jpg").write_bytes(buf.getvalue())
+        profiling.disable()  # Switched back on by --profile
+        assert main(["batch", sample_pdf, str(tmp_path / "photo.jpg"), "-o", str(tmp_path / "out"),
+                     "--secure", "--dpi", "300", "--profile"]) == 0
+        operations = sorted(r["operation"] for r in _reports(profile_dir))
+        assert operations == ["image_export", "save", "secure_apply"]
+        assert "Profiles written to" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+"""Tests for native-resolution handling of scanned pages in secure mode."""
+import io
+import pytest
+import fitz
+from PIL import Image
+from unittest.mock import patch
+
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="SCAN", opacity=30, font_size=12, spacing=60)
+A5 = fitz.Rect(0, 0, 420, 595)
+
+
+def _scan_png(width, height):
+    img = Image.new("RGB", (width, height), (230, 230, 220))
+    for x in range(0, width, 20):
+        img.paste((40, 40, 40), (x, 0, x + 2, height))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _scan_doc(scan_dpi, rotation=0, text=None, rect=A5):
+    """One page covered by an image scanned at scan_dpi."""
+    doc = fitz.open()
+    page = doc.new_page(width=rect.width, height=rect.height)
+    w, h = round(rect.width * scan_dpi / 72), round(rect.height * scan_dpi / 72)
+    page.insert_image(page.rect, stream=_scan_png(w, h))
+    if text:
+        page.insert_text((30, 60), text)
+    page.set_rotation(rotation)
+    return doc
+
+
+def _output_image_size(doc, page_num=0):
+    info = doc.load_page(page_num).get_image_info()
+    return [(i["width"], i["height"]) for i in info]
+
+
+class TestDetectScannedPage:
+    def test_full_page_image(self):
+        from pdf_processing import detect_scanned_page
+        scan = detect_scanned_page(_scan_doc(200).load_page(0))
+        assert scan is not None and scan.extractable
+        assert scan.dpi == pytest.approx(200, rel=0.01)
+
+    def test_vector_page_is_not_a_scan(self):
+        from pdf_processing import detect_scanned_page
+        doc = fitz.open()
+        doc.new_page().insert_text((50, 50), "Plain text")
+        assert detect_scanned_page(doc.load_page(0)) is None
+
+    def test_small_image_is_not_a_scan(self):
+        from pdf_processing import detect_scanned_page
+        doc = fitz.open()
+        page = doc.new_page(width=400, height=400)
+        page.insert_image(fitz.Rect(0, 0, 200, 200), stream=_scan_png(100, 100))
+        assert detect_scanned_page(page) is None
+
+    @pytest.mark.parametrize("kwargs", [{"rotation": 90}, {"text": "OCR layer"}])
+    def test_rotated_or_annotated_scan_not_extractable(self, kwargs):
+        from pdf_processing import detect_scanned_page
+        scan = detect_scanned_page(_scan_doc(150, **kwargs).load_page(0))
+        assert scan is not None and not scan.extractable
+        assert scan.dpi == pytest.approx(150, rel=0.01)
+
+
+class TestSecureScan:
+    def test_low_res_scan_kept_at_native_resolution(self):
+        import pdf_processing
+        doc = _scan_doc(200)
+        native = doc.load_page(0).get_image_info()[0]
+        with patch.object(pdf_processing, "_render_secure_page") as mock_render:
+            out = pdf_processing.apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=600)
+        mock_render.assert_not_called()
+        assert _output_image_size(out) == [(native["width"], native["height"])]
+        assert out.load_page(0).rect == A5
+
+    def test_high_res_scan_uses_requested_dpi(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        out = apply_secure_raster_watermark_to_pdf(_scan_doc(300), PARAMS, dpi=150)
+        assert _output_image_size(out) == [(875, 1240)]
+
+    def test_scan_with_text_rendered_at_capped_dpi(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        out = apply_secure_raster_watermark_to_pdf(_scan_doc(144, text="OCR layer"), PARAMS, dpi=600)
+        assert _output_image_size(out) == [(840, 1190)]
+
+    def test_vector_page_unaffected(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = fitz.open()
+        doc.new_page(width=72, height=72).insert_text((10, 30), "Vector")
+        out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=300)
+        assert _output_image_size(out) == [(300, 300)]
+
+    def test_watermark_scaled_to_effective_dpi(self):
+        import pdf_processing
+        scaled = []
+        real_scale = pdf_processing._scale_params_for_dpi
+
+        def spy(params, dpi):
+            scaled.append(round(dpi))
+            return real_scale(params, dpi)
+
+        with patch.object(pdf_processing, "_scale_params_for_dpi", spy):
+            pdf_processing.apply_secure_raster_watermark_to_pdf(_scan_doc(200), PARAMS, dpi=600)
+        assert scaled == [200]
+
+    def test_mixed_document(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = _scan_doc(100)
+        doc.new_page(width=72, height=72).insert_text((10, 30), "Vector")
+        out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=300)
+        assert _output_image_size(out, 0) == [(583, 826)]
+        assert _output_image_size(out, 1) == [(300, 300)]
+
+    def test_loupe_capped_at_scan_resolution(self):
+        from pdf_processing import generate_pdf_loupe
+        doc = _scan_doc(100)
+        data = generate_pdf_loupe(doc, 0, PARAMS, 600, fitz.Rect(0, 0, 72, 72))
+        assert Image.open(io.BytesIO(data)).size == (100, 100)
@@ -0,0 +1,104 @@
+"""Tests for band rasterization of oversized pages in secure mode."""
+import fitz
+import pytest
+from PIL import Image, ImageChops
+from unittest.mock import patch
+
+from watermark import WatermarkParams
+
+PARAMS = WatermarkParams(text="PLAN", opacity=60, font_size=14, spacing=70, color="Black")
+
+
+def _plan_doc(width=600, height=900, rotation=0):
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    for i in range(int(height // 25)):
+        page.insert_text((20, 20 + i * 25), f"Drawing row {i} " * 4, fontsize=12)
+    page.draw_rect(fitz.Rect(30, 30, width - 30, height - 30), color=(1, 0, 0), width=4)
+    page.set_rotation(rotation)
+    return doc
+
+
+class TestRenderSecureBands:
+    def test_small_page_is_one_band(self):
+        from pdf_processing import _render_secure_bands
+        doc = _plan_doc()
+        bands = list(_render_secure_bands(doc[0], 150))
+        assert len(bands) == 1
+        assert bands[0].first and bands[0].last and bands[0].place == doc[0].rect
+
+    @pytest.mark.parametrize("rotation", [0, 90])
+    def test_watermarked_bands_reassemble_to_full_page(self, rotation):
+        from pdf_processing import (
+            _render_secure_bands, _render_secure_page, _scale_params_for_dpi, apply_watermark_to_pil_image,
+        )
+        doc = _plan_doc(rotation=rotation)
+        page, dpi = doc[0], 200
+        params = _scale_params_for_dpi(PARAMS, dpi)
+        full = apply_watermark_to_pil_image(_render_secure_page(page, dpi), params)
+
+        bands = list(_render_secure_bands(page, dpi, band_pixels=200_000))
+        assert len(bands) > 3
+        assert bands[0].first and bands[-1].last
+        assert not any(b.first for b in bands[1:]) and not any(b.last for b in bands[:-1])
+        canvas = Image.new(full.mode, full.size)
+        for band in bands:
+            canvas.paste(apply_watermark_to_pil_image(band.image, params, origin=band.origin), band.origin)
+        assert ImageChops.difference(canvas, full).getbbox() is None
+
+    def test_band_places_tile_the_page(self):
+        from pdf_processing import _render_secure_bands
+        doc = _plan_doc(width=595, height=842)
+        bands = list(_render_secure_bands(doc[0], 300, band_pixels=1_000_000))
+        assert bands[0].place.y0 == 0
+        assert bands[-1].place.y1 == pytest.approx(842)
+        for above, below in zip(bands, bands[1:]):
+            assert below.place.y0 == pytest.approx(above.place.y1)
+
+
+class TestSecureExportWithBands:
+    def test_peak_pixmap_bounded_by_band_size(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = _plan_doc(width=1684, height=2384)  # A1
+        sizes = []
+        real_get_pixmap = fitz.Page.get_pixmap
+
+        def recording_get_pixmap(page, *args, **kwargs):
+            pix = real_get_pixmap(page, *args, **kwargs)
+            sizes.append(pix.width * pix.height)
+            return pix
+
+        with patch.object(fitz.Page, "get_pixmap", recording_get_pixmap):
+            out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=150, band_pixels=1_000_000)
+        assert max(sizes) <= 1_000_000
+        assert out.page_count == 1
+        assert out[0].rect == doc[0].rect
+        # One image per band; the remaining render is the low-resolution colour probe.
+        assert len(out[0].get_images()) == len(sizes) - 1
+        assert out[0].get_text() == ""
+
+    def test_banded_output_looks_like_whole_page_output(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = _plan_doc()
+        whole = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=150)
+        banded = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=150, band_pixels=150_000)
+        a, b = (Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                for pix in (d[0].get_pixmap(matrix=fitz.Matrix(150 / 72, 150 / 72)) for d in (whole, banded)))
+        diff = ImageChops.difference(a, b).convert("L")
+        mean = sum(i * n for i, n in enumerate(diff.histogram())) / (a.width * a.height)
+        assert mean < 2  # only JPEG block differences at the strip seams
+
+    def test_progress_counts_pages_not_bands(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = _plan_doc()
+        doc.insert_pdf(_plan_doc())
+        calls = []
+        apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=150, band_pixels=150_000,
+                                             on_page_done=lambda *a: calls.append(a[:2]))
+        assert calls == [(1, 2), (2, 2)]
+
+
+def test_page_limit_uses_band_size_for_working_memory():
+    from pdf_processing import pdf_page_limit
+    doc = _plan_doc(width=1684, height=2384)  # A1 at 600 DPI: ~220 MP per page
+    assert pdf_page_limit(doc, secure=True, dpi=600) > 0
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, mock_open, patch
 import flet as ft
 from app import PassportFiligraneApp
 
@@ -18,6 +18,7 @@ def test_secure_mode_visible_for_pdf():
 
     # Patch external dependencies to avoid actual file I/O
     with patch("os.path.getsize", return_value=1024), \
+         patch("builtins.open", mock_open(read_data=b"%PDF-1.7")), \
          patch("pdf_processing.load_pdf", return_value=(MagicMock(), 5)):
         
         # Execute
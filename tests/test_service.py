@@ -0,0 +1,254 @@
+"""Tests for the local watermarking service (service.py)."""
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import socket
+import stat
+import threading
+import time
+import zipfile
+import pytest
+import fitz
+from PIL import Image
+
+import service
+from service import (
+    Job, JobTimeoutError, QueueFullError, UnsupportedInputError, WorkerPool, job_from_request, make_server,
+)
+
+
+def _jpeg(size=(320, 240)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (60, 110, 160)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _pdf(pages=2):
+    with fitz.open() as doc:
+        for i in range(pages):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        return doc.tobytes()
+
+
+class TestJobFromRequest:
+    def test_defaults_follow_the_input_type(self):
+        job = job_from_request("", _jpeg())
+        assert job.options.image_format == "JPG" and job.name == "document"
+        job = job_from_request("secure=1&dpi=300&filename=../contract.pdf&text=DRAFT", _pdf())
+        assert job.options.pdf_format == "PDF" and job.options.secure
+        assert job.name == "contract" and job.options.params.text == "DRAFT"
+
+    @pytest.mark.parametrize("filename", [
+        "a%0d%0aSet-Cookie:%20x=1.jpg", "%D0%BF%D0%B0%D1%81%20%D0%BF%D0%BE%D1%80%D1%82.jpg", ".hidden.jpg",
+    ])
+    def test_unsafe_filename_falls_back(self, filename):
+        assert job_from_request(f"filename={filename}", _jpeg()).name == "document"
+
+    def test_timeout_is_capped(self):
+        assert job_from_request("timeout=9999", _jpeg(), max_timeout=30).timeout == 30
+        assert job_from_request("timeout=5", _jpeg(), max_timeout=30).timeout == 5
+
+    @pytest.mark.parametrize("query", [
+        "opacity=101", "font_size=0", "color=Blue", "orientation=up", "dpi=200",
+        "format=GIF", "encoder_profile=turbo", "max_bytes=0", "timeout=-1", "opacity=abc",
+    ])
+    def test_invalid_parameters(self, query):
+        with pytest.raises(ValueError):
+            job_from_request(query, _jpeg())
+
+    def test_unsupported_input(self):
+        with pytest.raises(UnsupportedInputError):
+            job_from_request("", b"GIF89a...")
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(workers=1, queue_size=4)
+    assert pool.wait_ready(60)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="module")
+def server(pool):
+    server = make_server(pool, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _request(server, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=60)
+    conn.request(method, path, body=body)
+    response = conn.getresponse()
+    return response.status, dict(response.getheaders()), response.read()
+
+
+class TestHttp:
+    def test_image_round_trip(self, server):
+        status, headers, body = _request(server, "POST", "/v1/watermark?format=PNG&filename=id.jpg", _jpeg())
+        assert status == 200 and headers["Content-Type"] == "image/png"
+        assert 'filename="id_export_filigree.png"' in headers["Content-Disposition"]
+        assert Image.open(io.BytesIO(body)).size == (320, 240)
+
+    @pytest.mark.parametrize("filename", ["a%0d%0aSet-Cookie:%20x=1.jpg", "%D0%BF%D0%B0%D1%81%20%D0%BF.jpg"])
+    def test_unsafe_filename_in_header(self, server, filename):
+        status, headers, _ = _request(server, "POST", f"/v1/watermark?filename={filename}", _jpeg())
+        assert status == 200 and "Set-Cookie" not in headers
+        assert headers["Content-Disposition"] == (
+            "attachment; filename=\"document_export_filigree.jpg\"; "
+            "filename*=UTF-8''document_export_filigree.jpg"
+        )
+
+    def test_pdf_pages_as_zip(self, server):
+        status, headers, body = _request(server, "POST", "/v1/watermark?format=JPG&secure=1&dpi=300", _pdf())
+        assert status == 200 and headers["Content-Type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            assert archive.namelist() == ["document_page_001.jpg", "document_page_002.jpg"]
+
+    def test_pdf(self, server):
+        status, headers, body = _request(server, "POST", "/v1/watermark", _pdf())
+        assert status == 200 and headers["Content-Type"] == "application/pdf"
+        with fitz.open("pdf", body) as doc:
+            assert len(doc) == 2
+
+    @pytest.mark.parametrize("path, body, expected", [
+        ("/v1/watermark", b"not a document", 415),
+        ("/v1/watermark?opacity=500", _jpeg(), 400),
+        ("/v1/watermark", b"%PDF-1.7 truncated", 422),
+        ("/v1/other", b"", 404),
+    ])
+    def test_errors(self, server, path, body, expected):
+        status, headers, body = _request(server, "POST", path, body)
+        assert status == expected and "error" in json.loads(body)
+
+    def test_health(self, server):
+        status, _, body = _request(server, "GET", "/v1/health")
+        health = json.loads(body)
+        assert status == 200 and health["status"] == "ok"
+        assert health["workers"] == 1 and health["ready"] == 1 and health["queue_size"] == 4
+
+    def test_unix_socket(self, pool, tmp_path):
+        path = str(tmp_path / "filigrane.sock")
+        server = make_server(pool, unix_socket=path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            conn = _UnixConnection(path)
+            conn.request("POST", "/v1/watermark", body=_jpeg())
+            response = conn.getresponse()
+            assert response.status == 200 and response.read()[:2] == b"\xff\xd8"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_result_wait_is_bounded(self):
+        from concurrent.futures import Future
+
+        class IdlePool:
+            """Accepts jobs but never runs them."""
+            def submit(self, job):
+                self.future = Future()
+                return self.future
+
+            def max_wait(self, max_timeout):
+                return 0.1
+
+        pool = IdlePool()
+        server = make_server(pool, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            status, _, body = _request(server, "POST", "/v1/watermark", _jpeg())
+            assert status == 504 and "error" in json.loads(body)
+            assert pool.future.cancelled()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unix_socket_does_not_replace_a_regular_file(self, pool, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_text("keep me")
+        with pytest.raises(FileExistsError):
+            make_server(pool, unix_socket=str(path))
+        assert path.read_text() == "keep me"
+
+    def test_unix_socket_permissions(self, pool, tmp_path):
+        path = str(tmp_path / "filigrane.sock")
+        for _ in range(2):  # The second server replaces the stale socket.
+            server = make_server(pool, unix_socket=path)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+            server.server_close()
+
+
+class TestWorkerPool:
+    def test_queue_full_and_timeout(self):
+        from batch import BatchOptions
+        from watermark import WatermarkParams
+        options = BatchOptions(params=WatermarkParams(text="X", opacity=30, font_size=36, spacing=150),
+                               output_dir="", secure=True, dpi=600)
+        pool = WorkerPool(workers=1, queue_size=1)
+        try:
+            # The worker is still warming up, so the first job waits in the queue.
+            slow = pool.submit(Job(data=_pdf(4), options=options, timeout=0.05))
+            with pytest.raises(QueueFullError):
+                pool.submit(Job(data=_jpeg(), options=options))
+            with pytest.raises(JobTimeoutError):
+                slow.result(timeout=60)
+            # The killed worker was replaced by a warm one.
+            result = pool.submit(Job(data=_jpeg(), options=options)).result(timeout=60)
+            assert result.error is None and len(result.outputs) == 1
+            stats = pool.stats()
+            assert stats["rejected"] == 1 and stats["timed_out"] == 1 and stats["completed"] == 1
+        finally:
+            pool.close()
+
+    def test_failed_restart_does_not_block_the_job(self, monkeypatch):
+        from batch import BatchOptions
+        from watermark import WatermarkParams
+
+        class StuckWorker:
+            """Never answers; once failing is set, cannot be started."""
+            failing = False
+
+            def __init__(self, context, collect_metrics):
+                if StuckWorker.failing:
+                    raise EOFError
+                self.conn, self.peer = multiprocessing.Pipe()
+
+            def kill(self):
+                StuckWorker.failing = True
+                self.conn.close()
+                self.peer.close()
+
+            stop = kill
+
+        monkeypatch.setattr(service, "_Worker", StuckWorker)
+        monkeypatch.setattr(service, "SERVICE_RESPAWN_DELAY_SECONDS", 0.05)
+        options = BatchOptions(params=WatermarkParams(text="X", opacity=30, font_size=36, spacing=150),
+                               output_dir="")
+        pool = WorkerPool(workers=1, queue_size=1)
+        try:
+            assert pool.wait_ready(5)
+            with pytest.raises(JobTimeoutError):
+                pool.submit(Job(data=_jpeg(), options=options, timeout=0.05)).result(timeout=5)
+            deadline = time.monotonic() + 5
+            while pool.stats()["start_failed"] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert pool.stats()["start_failed"] >= 2 and pool.stats()["ready"] == 0
+            StuckWorker.failing = False  # The dispatcher keeps retrying and recovers.
+            assert pool.wait_ready(5)
+        finally:
+            pool.close()
@@ -0,0 +1,167 @@
+"""Tests for size-budgeted export (fit under N bytes)."""
+import io
+import os
+import pytest
+import fitz
+from PIL import Image, ImageFilter
+
+from encoding import fit_image, fit_pil_image
+from watermark import WatermarkParams, apply_watermark
+
+PARAMS = WatermarkParams(text="BUDGET", opacity=40, font_size=20, spacing=80)
+
+
+def _photo(size=(1200, 900)):
+    img = Image.radial_gradient("L").resize(size).convert("RGB")
+    return Image.blend(img, Image.effect_noise(size, 25).convert("RGB"), 0.25).filter(ImageFilter.SMOOTH)
+
+
+def _photo_bytes(size=(1200, 900)):
+    buf = io.BytesIO()
+    _photo(size).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _photo_pdf(pages=1):
+    buf = io.BytesIO()
+    _photo((800, 600)).save(buf, format="JPEG", quality=95)
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page(width=400, height=300).insert_image(fitz.Rect(0, 0, 400, 300), stream=buf.getvalue())
+    return doc
+
+
+class TestFitPilImage:
+    def test_lowers_quality_to_fit(self):
+        img = _photo()
+        full = len(fit_pil_image(img, 10 ** 9).data)
+        fitted = fit_pil_image(img, full // 2)
+        assert len(fitted.data) <= full // 2
+        assert fitted.quality < 90 and fitted.width == img.width
+        assert fitted.encodes <= 5
+
+    def test_under_budget_is_encoded_once(self):
+        fitted = fit_pil_image(_photo(), 10 ** 9)
+        assert (fitted.quality, fitted.encodes) == (90, 1)
+
+    def test_downscales_when_quality_is_not_enough(self):
+        img = _photo()
+        fitted = fit_pil_image(img, 20_000)
+        assert len(fitted.data) <= 20_000
+        assert fitted.width < img.width
+        assert Image.open(io.BytesIO(fitted.data)).size == (fitted.width, fitted.height)
+
+    def test_lossless_format_is_downscaled(self):
+        fitted = fit_pil_image(_photo(), 200_000, "PNG")
+        assert len(fitted.data) <= 200_000 and fitted.quality is None
+        assert Image.open(io.BytesIO(fitted.data)).format == "PNG"
+
+    def test_impossible_budget(self):
+        with pytest.raises(ValueError, match="Cannot fit"):
+            fit_pil_image(_photo(), 100)
+
+    def test_search_is_guided_by_trial_encodes(self):
+        calls = []
+
+        def encode(img, quality):
+            calls.append((img.size, quality))
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality)
+            return buf.getvalue()
+
+        img = _photo((2000, 1500))
+        fit_image(img, 150_000, encode, 90)
+        full_size = [q for size, q in calls if size == img.size]
+        assert 1 <= len(full_size) <= 4
+
+
+class TestOutputs:
+    def test_apply_watermark_max_bytes(self):
+        data = apply_watermark(_photo_bytes(), PARAMS, output_format="JPEG", max_bytes=60_000)
+        assert len(data) <= 60_000
+        assert Image.open(io.BytesIO(data)).format == "JPEG"
+
+    def test_secure_pdf_fits_budget(self, tmp_path):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf, save_watermarked_pdf
+        doc = _photo_pdf(pages=3)
+        unlimited = len(apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=300).tobytes())
+        out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=300, max_bytes=unlimited // 3)
+        path = str(tmp_path / "out.pdf")
+        save_watermarked_pdf(out, path)
+        assert os.path.getsize(path) <= unlimited // 3
+        assert len(out) == 3 and out[0].rect == doc[0].rect
+
+    def test_unused_budget_goes_to_later_pages(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        doc = fitz.open()
+        doc.new_page(width=400, height=300).insert_text((20, 40), "Blank page with one line")
+        doc.insert_pdf(_photo_pdf())
+        max_bytes = 80_000
+        # window=1: the first page is settled before the second one is granted its budget.
+        out = apply_secure_raster_watermark_to_pdf(doc, PARAMS, dpi=300, window=1, max_bytes=max_bytes)
+        sizes = [len(out.xref_stream_raw(page.get_images()[0][0])) for page in out]
+        assert sizes[0] < max_bytes // 4
+        assert sizes[1] > max_bytes // 2  # More than an even split
+        assert len(out.tobytes()) <= max_bytes
+
+    def test_secure_pdf_budget_too_small(self):
+        from pdf_processing import apply_secure_raster_watermark_to_pdf
+        with pytest.raises(ValueError, match="cannot fit"):
+            apply_secure_raster_watermark_to_pdf(_photo_pdf(), PARAMS, dpi=150, max_bytes=1000)
+
+
+class TestBatch:
+    def _options(self, tmp_path, **kwargs):
+        from batch import BatchOptions
+        return BatchOptions(params=PARAMS, output_dir=str(tmp_path / "out"), **kwargs)
+
+    def test_image_to_pdf_keeps_page_size(self, tmp_path):
+        from batch import process_file
+        source = tmp_path / "photo.png"
+        source.write_bytes(_photo_bytes((2400, 1800)))
+        os.makedirs(tmp_path / "out")
+        result = process_file(str(source), self._options(tmp_path, image_format="PDF", max_bytes=50_000))
+        assert result.ok, result.error
+        assert os.path.getsize(result.outputs[0]) <= 50_000
+        with fitz.open(result.outputs[0]) as out:
+            assert out[0].rect == fitz.Rect(0, 0, 2400, 1800)
+
+    def test_vector_pdf_over_limit_fails(self, tmp_path, sample_pdf):
+        from batch import process_file
+        os.makedirs(tmp_path / "out")
+        result = process_file(sample_pdf, self._options(tmp_path, max_bytes=100))
+        assert not result.ok and "secure mode" in result.error
+        assert os.listdir(tmp_path / "out") == []
+
+    @pytest.mark.parametrize("value, expected", [("2M", 2_000_000), ("500k", 500_000), ("1.5MB", 1_500_000),
+                                                 ("150000", 150_000)])
+    def test_cli_max_size(self, value, expected):
+        from cli import build_parser
+        args = build_parser().parse_args(["batch", "x.jpg", "-o", "out", "--max-size", value])
+        assert args.max_size == expected
+
+    def test_cli_rejects_bad_size(self):
+        from cli import build_parser
+        with pytest.raises(SystemExit):
+            build_parser().parse_args(["batch", "x.jpg", "-o", "out", "--max-size", "big"])
+
+
+class TestApp:
+    def test_max_size_field(self, app):
+        assert app._selected_max_bytes() is None
+        app.max_size_field.value = "2"
+        assert app._selected_max_bytes() == 2_000_000
+        app.max_size_field.value = "0"
+        with pytest.raises(ValueError, match="positive"):
+            app._selected_max_bytes()
+
+    def test_field_shown_with_export_options(self, app):
+        app.update_export_options("image")
+        assert app.max_size_field.visible
+        app.update_export_options(None)
+        assert not app.max_size_field.visible
+
+    def test_cache_key_depends_on_limit(self):
+        from cache import make_cache_key
+        keys = {make_cache_key("d" * 64, PARAMS, "image", "JPG", max_bytes=m) for m in (None, 10 ** 6)}
+        assert len(keys) == 2
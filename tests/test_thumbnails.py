@@ -0,0 +1,176 @@
+"""Tests for the multi-page PDF preview: thumbnail cache, background renderer and navigation."""
+import threading
+import pytest
+import fitz
+from unittest.mock import MagicMock, patch
+
+from thumbnails import ThumbnailCache, ThumbnailRenderer, prefetch_order
+from watermark import WatermarkParams
+
+
+def _make_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=200).insert_text((20, 40 + 10 * i), f"Page {i+1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+class TestThumbnailCache:
+    def test_evicts_least_recently_used_over_budget(self):
+        cache = ThumbnailCache(max_bytes=30)
+        cache.put(0, b"a" * 10)
+        cache.put(1, b"b" * 10)
+        cache.put(2, b"c" * 10)
+        cache.get(0)
+        cache.put(3, b"d" * 10)
+        assert 1 not in cache
+        assert all(n in cache for n in (0, 2, 3))
+        assert cache.size_bytes == 30
+
+    def test_replacing_entry_updates_size(self):
+        cache = ThumbnailCache(max_bytes=100)
+        cache.put(0, b"a" * 40)
+        cache.put(0, b"a" * 10)
+        assert cache.size_bytes == 10 and len(cache) == 1
+
+    def test_oversized_entry_not_stored(self):
+        cache = ThumbnailCache(max_bytes=5)
+        cache.put(0, b"too large")
+        assert 0 not in cache and cache.size_bytes == 0
+
+
+class TestPrefetchOrder:
+    def test_nearest_first(self):
+        assert prefetch_order(5, 20, radius=2) == [5, 6, 4, 7, 3]
+
+    def test_clipped_to_document(self):
+        assert prefetch_order(0, 3, radius=4) == [0, 1, 2]
+
+
+class TestThumbnailRenderer:
+    def _run(self, page_count, focus_after=None, radius=2):
+        cache, rendered = ThumbnailCache(), []
+        done = threading.Event()
+        expected = len(prefetch_order(0, page_count, radius))
+
+        def on_ready(page_num, data):
+            if len(rendered) >= expected:
+                done.set()
+
+        def render(page_num):
+            rendered.append(page_num)
+            return b"png"
+
+        renderer = ThumbnailRenderer(render, page_count, cache, threading.Lock(),
+                                     on_ready=on_ready, radius=radius)
+        renderer.start()
+        done.wait(5)
+        if focus_after is not None:
+            done.clear()
+            expected += len([n for n in prefetch_order(focus_after, page_count, radius) if n not in cache])
+            renderer.focus(focus_after)
+            done.wait(5)
+        renderer.stop(timeout=5)
+        return rendered, cache
+
+    def test_renders_around_focus_nearest_first(self):
+        rendered, cache = self._run(page_count=40)
+        assert rendered == [0, 1, 2]
+        assert len(cache) == 3
+
+    def test_refocus_renders_only_missing_pages(self):
+        rendered, _ = self._run(page_count=40, focus_after=20)
+        assert rendered == [0, 1, 2, 20, 21, 19, 22, 18]
+
+    def test_failed_page_is_skipped(self):
+        cache = ThumbnailCache()
+        finished = threading.Event()
+
+        def render(page_num):
+            if page_num == 1:
+                raise RuntimeError("broken page")
+            return b"png"
+
+        renderer = ThumbnailRenderer(render, 3, cache, threading.Lock(),
+                                     on_ready=lambda n, d: n == 2 and finished.set(), radius=2)
+        renderer.start()
+        assert finished.wait(5)
+        renderer.stop(timeout=5)
+        assert 1 not in cache and 0 in cache and 2 in cache
+
+
+class TestPreviewRendering:
+    def test_thumbnail_is_small_png(self, tmp_path):
+        from pdf_processing import render_page_thumbnail
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 1))
+        data = render_page_thumbnail(doc, 0, zoom=0.2)
+        assert data.startswith(b"\x89PNG")
+        assert fitz.Pixmap(data).width == 40
+
+    def test_preview_of_requested_page(self, tmp_path):
+        from pdf_processing import generate_pdf_preview
+        doc = fitz.open(_make_pdf(tmp_path / "doc.pdf", 3))
+        params = WatermarkParams(text="X", opacity=30, font_size=12, spacing=60)
+        assert generate_pdf_preview(doc, params, page_num=2) != generate_pdf_preview(doc, params)
+
+
+class TestAppNavigation:
+    @pytest.fixture
+    def nav_app(self, app, tmp_path):
+        event = MagicMock()
+        event.files = [MagicMock(path=_make_pdf(tmp_path / "doc.pdf", 12))]
+        app.on_file_result(event)
+        app.update_timer.join()
+        yield app
+        app._stop_thumbnails()
+
+    def test_navigation_shown_for_multi_page_pdf(self, nav_app):
+        assert nav_app.page_navigation.visible
+        assert nav_app.page_label.value == "Page 1 / 12"
+        assert nav_app.prev_page_button.disabled
+        assert [c.data for c in nav_app.thumbnail_strip.controls] == [0, 1, 2, 3]
+
+    def test_go_to_page_moves_strip_and_preview(self, nav_app):
+        first_preview = nav_app.watermarked_image_bytes
+        nav_app.go_to_page(6)
+        nav_app.update_timer.join()
+        assert nav_app.page_label.value == "Page 7 / 12"
+        assert [c.data for c in nav_app.thumbnail_strip.controls] == [3, 4, 5, 6, 7, 8, 9]
+        assert nav_app.watermarked_image_bytes != first_preview
+        nav_app.go_to_page(99)
+        assert nav_app.current_page == 11 and nav_app.next_page_button.disabled
+
+    def test_param_change_only_recomposites_visible_page(self, nav_app):
+        import pdf_processing
+        with patch.object(pdf_processing, "render_preview_base",
+                          wraps=pdf_processing.render_preview_base) as mock_render:
+            nav_app.opacity_slider.value = 80
+            nav_app.update_preview()
+            nav_app.update_timer.join()
+        mock_render.assert_not_called()
+
+    def test_thumbnails_fill_in_background(self, nav_app):
+        renderer = nav_app.thumbnail_renderer
+        assert renderer is not None
+        for _ in range(100):
+            if len(nav_app.thumbnail_cache) >= 4:
+                break
+            threading.Event().wait(0.05)
+        assert all(n in nav_app.thumbnail_cache for n in range(4))
+
+    def test_single_page_pdf_has_no_navigation(self, app, sample_pdf):
+        event = MagicMock()
+        event.files = [MagicMock(path=sample_pdf)]
+        with patch.object(app, "update_preview"):
+            app.on_file_result(event)
+        assert app.page_navigation.visible  # sample_pdf has 2 pages
+        one_page = fitz.open(sample_pdf)
+        one_page.delete_page(1)
+        path = sample_pdf.replace(".pdf", "_one.pdf")
+        one_page.save(path)
+        event.files = [MagicMock(path=path)]
+        with patch.object(app, "update_preview"):
+            app.on_file_result(event)
+        assert not app.page_navigation.visible
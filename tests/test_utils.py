@@ -49,6 +49,24 @@ class TestGetLogPath:
         assert os.path.exists(os.path.dirname(path))
 
 
+class TestGetCacheDir:
+    def test_linux_uses_xdg_cache_home(self, tmp_path):
+        from utils import get_cache_dir
+        with patch("sys.platform", "linux"):
+            with patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+                path = get_cache_dir()
+        assert path == str(tmp_path / "PassportFiligrane")
+        assert os.path.isdir(path)
+
+    def test_win32_uses_localappdata(self):
+        from utils import get_cache_dir
+        with patch("sys.platform", "win32"):
+            with patch.dict(os.environ, {"LOCALAPPDATA": "/fake/local"}):
+                with patch("os.makedirs"):
+                    path = get_cache_dir()
+        assert "PassportFiligrane" in path and path.endswith("Cache")
+
+
 class TestSanitizePathForLog:
     def test_strips_newlines(self):
         from utils import sanitize_path_for_log
@@ -126,6 +144,22 @@ class TestDetectFileType:
         assert detect_file_type("doc.PDF") == "pdf"
 
 
+class TestDetectBufferType:
+    def test_pdf(self):
+        from utils import detect_buffer_type
+        assert detect_buffer_type(b"%PDF-1.7\n...") == "pdf"
+
+    def test_images(self):
+        from utils import detect_buffer_type
+        assert detect_buffer_type(b"\xff\xd8\xff\xe0JFIF") == "image"
+        assert detect_buffer_type(memoryview(b"\x89PNG\r\n\x1a\n....")) == "image"
+
+    def test_unknown(self):
+        from utils import detect_buffer_type
+        assert detect_buffer_type(b"GIF89a...") == "unknown"
+        assert detect_buffer_type(b"") == "unknown"
+
+
 class TestValidateFileSize:
     def test_raises_for_oversized_file(self, tmp_path):
         from utils import validate_file_size
@@ -267,3 +267,81 @@ def test_vector_watermark_with_default_parameters(test_pdf):
     assert b'Tj' in content or b'TJ' in content, "Text operators should be present"
 
     doc.close()
+
+
+class TestVectorVariantGenerator:
+    """Tests for VectorVariantGenerator (one parse, per-recipient overlays)."""
+
+    @pytest.fixture
+    def mixed_pdf(self, multipage_pdf):
+        doc = fitz.open(multipage_pdf)
+        landscape = doc.new_page(width=842, height=595)
+        landscape.insert_text((50, 50), "Landscape", fontsize=24)
+        doc.new_page(width=300, height=500).set_rotation(90)
+        yield doc
+        doc.close()
+
+    @staticmethod
+    def _render(pdf_bytes, page_num):
+        doc = fitz.open("pdf", pdf_bytes)
+        samples = doc.load_page(page_num).get_pixmap().samples
+        doc.close()
+        return samples
+
+    def test_matches_vector_watermark_pixels(self, mixed_pdf):
+        from pdf_processing import VectorVariantGenerator
+        params = WatermarkParams(text="FOR ALPHA ONLY", opacity=40, font_size=30,
+                                 spacing=120, color="Gray")
+        with VectorVariantGenerator(mixed_pdf) as generator:
+            variant = generator.render(params)
+
+        reference = fitz.open("pdf", mixed_pdf.tobytes())
+        apply_vector_watermark_to_pdf(reference, params)
+        expected = reference.tobytes()
+        reference.close()
+
+        for page_num in range(mixed_pdf.page_count):
+            assert self._render(variant, page_num) == self._render(expected, page_num)
+
+    def test_each_variant_has_only_its_own_text(self, mixed_pdf):
+        from pdf_processing import iter_vector_watermark_variants
+        params_list = [
+            WatermarkParams(text=f"FOR {name} ONLY", opacity=30, font_size=36, spacing=150)
+            for name in ("ALPHA", "BRAVO", "CHARLIE")
+        ]
+        variants = list(iter_vector_watermark_variants(mixed_pdf, params_list))
+        assert len(variants) == 3
+        for params, pdf_bytes, other in zip(params_list, variants, ("BRAVO", "CHARLIE", "ALPHA")):
+            doc = fitz.open("pdf", pdf_bytes)
+            text = doc.load_page(0).get_text()
+            assert params.text in text
+            assert other not in text
+            assert "Page 1" in text
+            doc.close()
+
+    def test_source_document_is_not_modified(self, mixed_pdf):
+        from pdf_processing import VectorVariantGenerator
+        xref_count = mixed_pdf.xref_length()
+        contents = [page.read_contents() for page in mixed_pdf]
+        params = WatermarkParams(text="X", opacity=30, font_size=36, spacing=150)
+        with VectorVariantGenerator(mixed_pdf) as generator:
+            generator.render(params)
+        assert mixed_pdf.xref_length() == xref_count
+        assert [page.read_contents() for page in mixed_pdf] == contents
+
+    def test_one_overlay_per_page_geometry(self, mixed_pdf):
+        from pdf_processing import VectorVariantGenerator
+        with VectorVariantGenerator(mixed_pdf) as generator:
+            # 3 identical A4 pages, one landscape page, one rotated page
+            assert len(generator._overlays) == 3
+
+    def test_save_writes_pdf(self, mixed_pdf, tmp_path):
+        from pdf_processing import VectorVariantGenerator
+        output_path = tmp_path / "variant.pdf"
+        params = WatermarkParams(text="SAVED", opacity=30, font_size=36, spacing=150)
+        with VectorVariantGenerator(mixed_pdf) as generator:
+            generator.save(params, str(output_path))
+        doc = fitz.open(str(output_path))
+        assert doc.page_count == mixed_pdf.page_count
+        assert "SAVED" in doc.load_page(0).get_text()
+        doc.close()
@@ -53,10 +53,18 @@ class TestGetFont:
     def test_falls_back_to_default_if_no_system_font(self):
         from watermark import get_font
         from PIL import ImageFont
-        with patch("os.path.exists", return_value=False):
-            font = get_font(36)
+        get_font.cache_clear()
+        try:
+            with patch("os.path.exists", return_value=False):
+                font = get_font(36)
+        finally:
+            get_font.cache_clear()
         assert font is not None
 
+    def test_fonts_are_cached_per_size(self):
+        from watermark import get_font
+        assert get_font(36) is get_font(36)
+
 
 class TestApplyWatermarkToPilImage:
     @pytest.fixture
@@ -157,3 +165,68 @@ class TestGetFont:
         font_large = get_font(72)
         # Different sizes should return different font objects
         assert font_small.size != font_large.size
+
+
+class TestStampCache:
+    def test_stamp_rendered_once_per_params(self):
+        from watermark import WatermarkParams, _rotated_stamp, apply_watermark_to_pil_image
+        params = WatermarkParams(text="STAMP CACHE", opacity=40, font_size=20, spacing=80)
+        _rotated_stamp.cache_clear()
+        first = apply_watermark_to_pil_image(Image.new("RGB", (200, 200), "white"), params)
+        second = apply_watermark_to_pil_image(Image.new("RGB", (200, 200), "white"), params)
+        info = _rotated_stamp.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
+        assert first.tobytes() == second.tobytes()
+
+
+class TestApplyWatermarkVariants:
+    """Test apply_watermark_variants(): one decode, many recipients."""
+
+    @pytest.fixture
+    def source_bytes(self):
+        img = Image.new("RGB", (160, 120), color="white")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    @pytest.fixture
+    def params_list(self):
+        from watermark import WatermarkParams
+        return [
+            WatermarkParams(text=f"FOR {agency} ONLY", opacity=60, font_size=20, spacing=70, color="Black")
+            for agency in ("ALPHA", "BRAVO", "CHARLIE")
+        ]
+
+    def test_matches_single_apply(self, source_bytes, params_list):
+        from watermark import apply_watermark, apply_watermark_variants
+        variants = apply_watermark_variants(source_bytes, params_list, output_format="PNG")
+        expected = [apply_watermark(source_bytes, p, output_format="PNG") for p in params_list]
+        assert variants == expected
+
+    def test_decodes_source_once(self, source_bytes, params_list):
+        from watermark import apply_watermark_variants
+        with patch("watermark.Image.open", wraps=Image.open) as mock_open:
+            apply_watermark_variants(source_bytes, params_list)
+        assert mock_open.call_count == 1
+
+    def test_parallel_preserves_order(self, source_bytes, params_list):
+        from watermark import apply_watermark_variants
+        serial = apply_watermark_variants(source_bytes, params_list, output_format="PNG")
+        parallel = apply_watermark_variants(source_bytes, params_list, output_format="PNG", max_workers=3)
+        assert parallel == serial
+
+
+class TestGridOrigin:
+    """Test apply_watermark_to_pil_image(origin=...): crops stay in grid phase."""
+
+    @pytest.mark.parametrize("orientation", ["Ascending (↗)", "Descending (↘)"])
+    @pytest.mark.parametrize("box", [(0, 0, 90, 60), (37, 81, 250, 199), (199, 5, 300, 240)])
+    def test_crop_matches_full_image(self, orientation, box):
+        from PIL import ImageChops
+        from watermark import WatermarkParams, apply_watermark_to_pil_image
+        params = WatermarkParams(text="PHASE", opacity=70, font_size=18, spacing=45,
+                                 color="Black", orientation=orientation)
+        img = Image.effect_noise((300, 240), 50).convert("RGBA")
+        full = apply_watermark_to_pil_image(img, params).crop(box)
+        crop = apply_watermark_to_pil_image(img.crop(box), params, origin=box[:2])
+        assert ImageChops.difference(full, crop).getbbox() is None
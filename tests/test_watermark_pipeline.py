@@ -0,0 +1,129 @@
+"""Tests for the copy-free apply_watermark pipeline (in-place compositing, no RGBA widening)."""
+import io
+import os
+import subprocess
+import sys
+import pytest
+from PIL import Image, ImageChops
+from unittest.mock import patch
+
+from watermark import (
+    WatermarkParams, apply_watermark, apply_watermark_in_place, apply_watermark_to_pil_image,
+)
+
+PARAMS = WatermarkParams(text="PIPELINE", opacity=40, font_size=24, spacing=90, color="Black")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _encoded(img, fmt="JPEG", **kwargs):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def _noise(size=(320, 240), mode="RGB"):
+    return Image.effect_noise(size, 40).convert(mode)
+
+
+class TestInPlace:
+    @pytest.mark.parametrize("mode", ["RGB", "L"])
+    def test_matches_copying_api(self, mode):
+        img = _noise(mode=mode)
+        expected = apply_watermark_to_pil_image(img, PARAMS)
+        apply_watermark_in_place(img, PARAMS)
+        assert ImageChops.difference(img, expected).getbbox() is None
+
+    def test_rgb_matches_rgba_composite(self):
+        img = _noise()
+        rgb = apply_watermark_to_pil_image(img, PARAMS)
+        rgba = apply_watermark_to_pil_image(img.convert("RGBA"), PARAMS).convert("RGB")
+        assert ImageChops.difference(rgb, rgba).getextrema() <= ((0, 1),) * 3
+
+    def test_copying_api_leaves_input_untouched(self):
+        img = Image.new("RGB", (200, 200), (10, 20, 30))
+        out = apply_watermark_to_pil_image(img, PARAMS)
+        assert img.getcolors() == [(200 * 200, (10, 20, 30))]
+        assert out.mode == "RGB" and out.getbbox() is not None
+
+
+class TestApplyWatermark:
+    def test_rgb_input_is_never_converted(self):
+        data = _encoded(_noise())
+        with patch.object(Image.Image, "convert", side_effect=AssertionError("converted")), \
+                patch.object(Image, "alpha_composite", side_effect=AssertionError("widened")):
+            out = apply_watermark(data, PARAMS, output_format="PNG")
+        assert Image.open(io.BytesIO(out)).mode == "RGB"
+
+    def test_grayscale_input_stays_grayscale(self):
+        out = apply_watermark(_encoded(_noise(mode="L")), PARAMS)
+        assert Image.open(io.BytesIO(out)).mode == "L"
+
+    def test_transparent_input_is_composited(self):
+        img = Image.new("RGBA", (200, 150), (0, 128, 255, 255))
+        out = Image.open(io.BytesIO(apply_watermark(_encoded(img, "PNG"), PARAMS, output_format="PNG")))
+        assert out.mode == "RGB"
+        assert out.getpixel((0, 0)) == (0, 128, 255)
+        assert out.getextrema()[2][0] < 255  # Darkened under the black stamp
+
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+    def test_metadata_is_not_carried_over(self, fmt):
+        exif = Image.Exif()
+        exif[0x010F] = "SecretCam"  # Make
+        source = _encoded(_noise(), "JPEG", exif=exif, icc_profile=b"fake-icc", comment=b"secret")
+        out = Image.open(io.BytesIO(apply_watermark(source, PARAMS, output_format=fmt)))
+        assert not {"exif", "icc_profile", "comment"} & set(out.info)
+
+
+_PEAK_SCRIPT = """
+import io, resource, sys
+sys.path.insert(0, sys.argv[1])
+from PIL import Image
+from watermark import WatermarkParams, apply_watermark
+
+
+def peak_rss():
+    # VmHWM restarts at exec; on Linux ru_maxrss keeps the parent's (pytest's) peak.
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+params = WatermarkParams(text="MEMORY", opacity=40, font_size=36, spacing=150)
+data = open(sys.argv[2], "rb").read()
+warm_up = io.BytesIO()
+Image.new("RGB", (64, 64)).save(warm_up, format="JPEG")
+apply_watermark(warm_up.getvalue(), params)  # Font, codecs and allocator set up
+
+before = peak_rss()
+if sys.argv[3] == "decode":
+    Image.open(io.BytesIO(data)).load()
+else:
+    apply_watermark(data, params, output_format=sys.argv[3])
+print(peak_rss() - before)
+"""
+
+
+class TestPeakMemory:
+    """Peak RSS growth of one call, each in a fresh interpreter.
+
+    Pillow allocates pixel buffers outside the Python allocator, so tracemalloc
+    cannot see them; the peak resident set size of the process can.
+    """
+
+    @staticmethod
+    def _peak(path, what):
+        pytest.importorskip("resource")
+        result = subprocess.run(
+            [sys.executable, "-c", _PEAK_SCRIPT, REPO_DIR, path, what],
+            capture_output=True, text=True, check=True,
+        )
+        return int(result.stdout.split()[-1])
+
+    @pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+    def test_peak_at_most_twice_the_decoded_frame(self, tmp_path, fmt):
+        path = str(tmp_path / "large.jpg")
+        _noise((3000, 2000)).save(path, quality=90)
+        frame = self._peak(path, "decode")
+        assert frame > 0
+        assert self._peak(path, fmt) <= 2 * frame
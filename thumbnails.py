@@ -0,0 +1,146 @@
+"""Lazily rendered, byte-bounded page thumbnails for the PDF preview."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from constants import THUMBNAIL_CACHE_MAX_BYTES, THUMBNAIL_PREFETCH_RADIUS
+
+
+class ThumbnailCache:
+    """Thread-safe LRU cache of encoded thumbnails, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[int, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, page_num: int) -> bytes | None:
+        """Return the cached thumbnail and mark it most recently used."""
+        with self._lock:
+            data = self._entries.get(page_num)
+            if data is not None:
+                self._entries.move_to_end(page_num)
+            return data
+
+    def put(self, page_num: int, data: bytes) -> None:
+        """Store a thumbnail, evicting least recently used entries over the budget."""
+        with self._lock:
+            old = self._entries.pop(page_num, None)
+            if old is not None:
+                self._size -= len(old)
+            if len(data) > self.max_bytes:
+                return
+            self._entries[page_num] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __contains__(self, page_num: int) -> bool:
+        with self._lock:
+            return page_num in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def prefetch_order(current: int, page_count: int, radius: int = THUMBNAIL_PREFETCH_RADIUS) -> list[int]:
+    """Return page numbers within radius of current, nearest first (ahead before behind)."""
+    order = [current] if 0 <= current < page_count else []
+    for distance in range(1, radius + 1):
+        for page_num in (current + distance, current - distance):
+            if 0 <= page_num < page_count:
+                order.append(page_num)
+    return order
+
+
+class ThumbnailRenderer:
+    """Background thread filling a ThumbnailCache around the currently viewed page.
+
+    Pages are rendered one at a time, nearest to the focused page first. Each
+    render runs under `lock`, the lock guarding the shared PyMuPDF document, so
+    preview and export work can interleave between thumbnails.
+
+    Args:
+        render: Callable returning the encoded thumbnail of a page number.
+        page_count: Number of pages in the document.
+        cache: Cache receiving the thumbnails.
+        lock: Lock held while render() touches the document.
+        on_ready: Optional callback(page_num, data) run on the worker thread
+            after each new thumbnail.
+        radius: Pages rendered ahead and behind the focused page.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[int], bytes],
+        page_count: int,
+        cache: ThumbnailCache,
+        lock: threading.Lock,
+        on_ready: Callable[[int, bytes], None] | None = None,
+        radius: int = THUMBNAIL_PREFETCH_RADIUS,
+    ):
+        self._render = render
+        self._page_count = page_count
+        self._cache = cache
+        self._lock = lock
+        self._on_ready = on_ready
+        self._radius = radius
+        self._focus = 0
+        self._wake = threading.Event()
+        self._stopped = False
+        self._failed: set[int] = set()
+        self._thread = threading.Thread(target=self._run, name="thumbnails", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def focus(self, page_num: int) -> None:
+        """Re-prioritize rendering around page_num."""
+        self._focus = page_num
+        self._wake.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop the worker once the thumbnail in progress (if any) is done."""
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _next_page(self) -> int | None:
+        for page_num in prefetch_order(self._focus, self._page_count, self._radius):
+            if page_num not in self._cache and page_num not in self._failed:
+                return page_num
+        return None
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.clear()
+            page_num = self._next_page()
+            if page_num is None:
+                self._wake.wait()
+                continue
+            with self._lock:
+                if self._stopped:
+                    return
+                try:
+                    data = self._render(page_num)
+                except Exception:
+                    self._failed.add(page_num)  # Shown as a placeholder; never retried.
+                    continue
+            self._cache.put(page_num, data)
+            if self._on_ready is not None:
+                self._on_ready(page_num, data)
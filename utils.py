@@ -26,6 +26,25 @@ def get_log_path() -> str:
     return os.path.join(log_dir, "error_log.txt")
 
 
+def get_cache_dir() -> str:
+    """Return a private, platform-appropriate directory for cached results."""
+    if sys.platform == "darwin":
+        cache_dir = os.path.expanduser("~/Library/Caches/PassportFiligrane")
+    elif sys.platform == "win32":
+        cache_dir = os.path.join(
+            os.environ.get("LOCALAPPDATA", os.path.expanduser("~")),
+            "PassportFiligrane", "Cache"
+        )
+    else:
+        cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+            "PassportFiligrane"
+        )
+
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    return cache_dir
+
+
 def sanitize_path_for_log(message: str) -> str:
     """Remove potential file paths and control characters from log messages."""
     home = os.path.expanduser("~")
@@ -41,6 +60,17 @@ def strip_image_metadata(img: Image.Image) -> Image.Image:
     return clean
 
 
+def clear_image_metadata(img: Image.Image) -> Image.Image:
+    """Drop all EXIF/metadata from a PIL Image in place and return it.
+
+    Encoders write the pixels from scratch and only carry over metadata found
+    in img.info (EXIF, ICC profile, comments), so emptying it is enough: unlike
+    strip_image_metadata, no pixels are copied.
+    """
+    img.info = {}
+    return img
+
+
 def detect_file_type(file_path: str) -> str:
     """Determine whether the file is an image or a PDF."""
     ext = os.path.splitext(file_path)[1].lower()
@@ -51,9 +81,23 @@ def detect_file_type(file_path: str) -> str:
     return "unknown"
 
 
+def detect_buffer_type(data: bytes | bytearray | memoryview) -> str:
+    """Determine from its leading bytes whether an in-memory file is an image or a PDF."""
+    head = bytes(data[:8])
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"\xff\xd8\xff") or head == b"\x89PNG\r\n\x1a\n":
+        return "image"
+    return "unknown"
+
+
 def validate_file_size(file_path: str) -> None:
     """Check that a file does not exceed the maximum allowed size."""
-    size = os.path.getsize(file_path)
+    validate_data_size(os.path.getsize(file_path))
+
+
+def validate_data_size(size: int) -> None:
+    """Check that a file or buffer of size bytes does not exceed the maximum allowed size."""
     if size > MAX_FILE_SIZE_BYTES:
         size_mb = size / (1024 * 1024)
         raise ValueError(
@@ -1,12 +1,16 @@
 """PIL image watermarking logic and WatermarkParams dataclass."""
 
-import io
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 
-from constants import PIL_COLOR_MAP, WATERMARK_ORIENTATION_MAP, JPEG_EXPORT_QUALITY
-from utils import strip_image_metadata
+import metrics
+from constants import FONT_CACHE_SIZE, PIL_COLOR_MAP, STAMP_CACHE_SIZE, WATERMARK_ORIENTATION_MAP
+from encoding import EncoderProfile, encode_pil_image, fit_pil_image
+from inputs import open_image
+from utils import clear_image_metadata
 
 
 @dataclass(frozen=True)
@@ -20,8 +24,12 @@ class WatermarkParams:
     orientation: str = "Ascending (↗)"
 
 
+@lru_cache(maxsize=FONT_CACHE_SIZE)
 def get_font(size: int) -> ImageFont.FreeTypeFont:
-    """Try to load a system font, otherwise return the default font."""
+    """Try to load a system font, otherwise return the default font.
+
+    Fonts are cached per size; callers must not modify the returned font.
+    """
     font_paths = [
         "/System/Library/Fonts/Supplemental/Arial.ttf",
         "/System/Library/Fonts/Helvetica.ttc",
@@ -36,69 +44,210 @@ def get_font(size: int) -> ImageFont.FreeTypeFont:
     return ImageFont.load_default()
 
 
-def apply_watermark_to_pil_image(img: Image.Image, params: WatermarkParams) -> Image.Image:
-    """Apply a repeated diagonal watermark on a PIL image (RGBA).
+@lru_cache(maxsize=STAMP_CACHE_SIZE)
+def _rotated_stamp(text: str, font_size: int, opacity: int, orientation: str) -> Image.Image:
+    """Render one rotated text stamp as an L-mode mask, cached for reuse.
 
-    Args:
-        img: PIL Image in RGBA mode
-        params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
+    The returned image is shared between callers and must not be modified.
     """
-    if len(params.text) > 200:
-        raise ValueError("Watermark text is too long (max 200 characters).")
-
-    rgb = PIL_COLOR_MAP.get(params.color, (255, 255, 255))
-
-    txt_layer = Image.new("RGBA", img.size, (rgb[0], rgb[1], rgb[2], 0))
-    draw = ImageDraw.Draw(txt_layer)
-
-    font = get_font(params.font_size)
-    alpha = int((params.opacity / 100) * 255)
-    fill_color = (rgb[0], rgb[1], rgb[2], alpha)
+    font = get_font(font_size)
+    alpha = int((opacity / 100) * 255)
 
     # Get text bounding box with proper offset handling
     try:
-        left, top, right, bottom = font.getbbox(params.text)
+        left, top, right, bottom = font.getbbox(text)
         txt_w = right - left
         txt_h = bottom - top
     except AttributeError:
-        txt_w, txt_h = draw.textsize(params.text, font=font)
+        txt_w, txt_h = ImageDraw.Draw(Image.new("L", (1, 1))).textsize(text, font=font)
         left, top = 0, 0
 
     # Create stamp with proper size and draw text at correct position.
     # Account for bbox offsets to prevent text cutoff.
     padding = 20
-    stamp_width, stamp_height = txt_w + padding, txt_h + padding
-    stamp = Image.new("RGBA", (stamp_width, stamp_height), (255, 255, 255, 0))
+    stamp = Image.new("L", (txt_w + padding, txt_h + padding), 0)
     stamp_draw = ImageDraw.Draw(stamp)
     draw_x = padding // 2 - left
     draw_y = padding // 2 - top
-    stamp_draw.text((draw_x, draw_y), params.text, font=font, fill=fill_color)
+    stamp_draw.text((draw_x, draw_y), text, font=font, fill=alpha)
+
+    rotation_angle = WATERMARK_ORIENTATION_MAP.get(orientation, 45)
+    return stamp.rotate(rotation_angle, expand=True, resample=Image.Resampling.BICUBIC)
 
-    rotation_angle = WATERMARK_ORIENTATION_MAP.get(params.orientation, 45)
-    rotated_stamp = stamp.rotate(rotation_angle, expand=True, resample=Image.Resampling.BICUBIC)
+
+@metrics.timed("stamp_render")
+def _watermark_coverage(
+    size: tuple[int, int], params: WatermarkParams, origin: tuple[int, int] = (0, 0)
+) -> Image.Image:
+    """Draw the watermark grid as an L-mode coverage mask (0 = none, 255 = opaque).
+
+    The mask holds the watermark opacity only; the colour is applied when
+    compositing, so one single-channel layer serves RGB, RGBA and L images.
+    """
+    if len(params.text) > 200:
+        raise ValueError("Watermark text is too long (max 200 characters).")
+
+    txt_layer = Image.new("L", size, 0)
+    rotated_stamp = _rotated_stamp(params.text, params.font_size, params.opacity, params.orientation)
     rotated_width, rotated_height = rotated_stamp.size
 
-    for y in range(-rotated_height, img.height + rotated_height, params.spacing):
-        for x in range(-rotated_width, img.width + rotated_width, params.spacing):
-            offset = (params.spacing // 2) if (y // params.spacing) % 2 == 0 else 0
-            txt_layer.paste(rotated_stamp, (x + offset, y), rotated_stamp)
+    # Grid positions are in full-image coordinates; only stamps overlapping
+    # the [origin, origin + size) window are pasted.
+    width, height = size
+    spacing = params.spacing
+    x0, y0 = origin
+    first_row = max(0, y0 // spacing)
+    first_col = max(0, (x0 - spacing) // spacing)
+    pasted = 0
+    for y in range(-rotated_height + first_row * spacing, y0 + height, spacing):
+        offset = (spacing // 2) if (y // spacing) % 2 == 0 else 0
+        for x in range(-rotated_width + first_col * spacing, x0 + width - offset, spacing):
+            txt_layer.paste(rotated_stamp, (x + offset - x0, y - y0), rotated_stamp)
+            pasted += 1
+    metrics.count("tiles_pasted", pasted)
+    return txt_layer
+
+
+def apply_watermark_in_place(
+    img: Image.Image, params: WatermarkParams, origin: tuple[int, int] = (0, 0)
+) -> None:
+    """Watermark an RGB or grayscale L image in place, without copying its pixels.
+
+    The watermark colour is painted through the coverage mask (the only extra
+    buffer, one byte per pixel). Grayscale images use the colour's luminance,
+    which is exact for the neutral White/Black/Gray palette.
+
+    Args:
+        img: PIL Image in RGB or L mode; modified in place
+        params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
+        origin: Position of img's top-left pixel in the full image it was cut from
+            (see apply_watermark_to_pil_image)
+    """
+    rgb = PIL_COLOR_MAP.get(params.color, (255, 255, 255))
+    coverage = _watermark_coverage(img.size, params, origin)
+    with metrics.timer("composite"):
+        if img.mode == "L":
+            img.paste((rgb[0] * 299 + rgb[1] * 587 + rgb[2] * 114) // 1000, mask=coverage)
+        else:
+            img.paste(rgb, mask=coverage)
 
-    return Image.alpha_composite(img, txt_layer)
+
+def apply_watermark_to_pil_image(
+    img: Image.Image, params: WatermarkParams, origin: tuple[int, int] = (0, 0)
+) -> Image.Image:
+    """Apply a repeated diagonal watermark on a PIL image (RGB, RGBA or grayscale L).
+
+    img is not modified. RGB and L images are copied once and watermarked in
+    place (see apply_watermark_in_place); RGBA images are alpha-composited, which
+    keeps their transparency.
+
+    Args:
+        img: PIL Image in RGB, RGBA or L mode
+        params: WatermarkParams with text, opacity, font_size, spacing, color, orientation
+        origin: Position of img's top-left pixel in the full image it was cut from.
+            The watermark grid stays in phase with the full image, so watermarking
+            a crop gives the same pixels as cropping the watermarked image.
+    """
+    if img.mode != "RGBA":
+        out = img.copy()
+        apply_watermark_in_place(out, params, origin)
+        return out
+    coverage = _watermark_coverage(img.size, params, origin)
+    with metrics.timer("composite"):
+        layer = Image.new("RGBA", img.size, PIL_COLOR_MAP.get(params.color, (255, 255, 255)))
+        layer.putalpha(coverage)
+        return Image.alpha_composite(img, layer)
+
+
+def _open_for_watermark(image_bytes: bytes | memoryview) -> Image.Image:
+    """Decode an image in the mode it is watermarked in: RGB, L, or RGBA if transparent.
+
+    RGB and L images are decoded as-is; only images with transparency are
+    widened to RGBA, and other modes (palette, CMYK, ...) converted to RGB.
+    """
+    with metrics.timer("decode"):
+        img = open_image(image_bytes)
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            return img.convert("RGBA")
+        if img.mode not in ("RGB", "L"):
+            return img.convert("RGB")
+        # Decode now: a lazily opened image is read-only, and the first in-place
+        # paste would load it and then copy the whole frame.
+        img.load()
+        return img
+
+
+def _encode_watermarked(
+    out: Image.Image,
+    output_format: str,
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
+) -> bytes:
+    """Encode a watermarked image as metadata-free bytes (JPEG, PNG, WebP or AVIF).
+
+    out is owned by the caller's pipeline: its metadata is dropped in place and
+    only RGBA images are converted (to RGB) before encoding.
+    """
+    with metrics.timer("encode"):
+        if out.mode not in ("RGB", "L"):
+            out = out.convert("RGB")
+        clear_image_metadata(out)
+        if max_bytes is not None:
+            return fit_pil_image(out, max_bytes, output_format, profile).data
+        return encode_pil_image(out, output_format, profile)
 
 
 def apply_watermark(
-    image_bytes: bytes,
+    image_bytes: bytes | memoryview,
     params: WatermarkParams,
     output_format: str = "JPEG",
+    profile: str | EncoderProfile | None = None,
+    max_bytes: int | None = None,
 ) -> bytes:
-    """Apply a repeated diagonal watermark to image bytes and return bytes."""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
-    out = apply_watermark_to_pil_image(img, params)
-
-    output = io.BytesIO()
-    out_rgb = strip_image_metadata(out.convert("RGB"))
-    if output_format.upper() == "PNG":
-        out_rgb.save(output, format="PNG")
+    """Apply a repeated diagonal watermark to image bytes and return bytes.
+
+    image_bytes may also be a memoryview (e.g. inputs.MappedFile.buffer); it is
+    decoded in place without being copied. output_format is "JPEG", "PNG",
+    "WEBP" or "AVIF", encoded with the given encoder profile (see encoding.py).
+    With max_bytes, the output is at most that size: quality is lowered and,
+    if that is not enough, the image downscaled (see encoding.fit_pil_image).
+    """
+    img = _open_for_watermark(image_bytes)
+    if img.mode == "RGBA":
+        img = apply_watermark_to_pil_image(img, params)
     else:
-        out_rgb.save(output, format="JPEG", quality=JPEG_EXPORT_QUALITY)
-    return output.getvalue()
+        apply_watermark_in_place(img, params)  # The decoded frame is the only full-size buffer.
+    return _encode_watermarked(img, output_format, profile, max_bytes)
+
+
+def apply_watermark_variants(
+    image_bytes: bytes | memoryview,
+    params_list: list[WatermarkParams],
+    output_format: str = "JPEG",
+    max_workers: int = 1,
+    profile: str | EncoderProfile | None = None,
+) -> list[bytes]:
+    """Watermark one source image with several parameter sets.
+
+    The source is decoded once; every variant is composited and encoded from
+    the shared base pixels, which are never modified.
+
+    Args:
+        image_bytes: Encoded source image (bytes or memoryview).
+        params_list: One WatermarkParams per variant (e.g. one per recipient).
+        output_format: "JPEG", "PNG", "WEBP" or "AVIF".
+        max_workers: Number of threads compositing/encoding variants in parallel.
+        profile: Encoder profile name (see encoding.ENCODER_PROFILES).
+
+    Returns:
+        Encoded variant bytes, in the same order as params_list.
+    """
+    base = _open_for_watermark(image_bytes)
+
+    def render(params: WatermarkParams) -> bytes:
+        return _encode_watermarked(apply_watermark_to_pil_image(base, params), output_format, profile)
+
+    if max_workers <= 1 or len(params_list) <= 1:
+        return [render(p) for p in params_list]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(render, params_list))